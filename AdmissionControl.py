@@ -0,0 +1,186 @@
+import math
+import time
+import threading
+from collections import deque
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted; status is 429 (client over its share) or 503 (server full)."""
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A granted slot. release() is idempotent; hand_off() keeps the slot past the request."""
+
+    def __init__(self, limiter, client_id: str):
+        self.limiter = limiter
+        self.client_id = client_id
+        self.granted_at = time.monotonic()
+        self.handed_off = False
+        self._released = False
+
+    def hand_off(self):
+        self.handed_off = True
+        return self
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.limiter._release(self)
+
+
+class _Waiter:
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded, deadline-driven wait queue and per-client fair share.
+
+    Free slots are used by whoever asks, so a lone client can use all of them.
+    Once requests have to wait, each freed slot goes to the waiting client that
+    holds the fewest slots, and a client may only have max_queued_per_client
+    requests waiting, so one busy client cannot starve the others.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 max_queued_per_client: int = 2):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_queued_per_client = max_queued_per_client
+        self._cond = threading.Condition()
+        self._active = {}  # client id -> running requests
+        self._waiting = {}  # client id -> deque of waiters
+        self._counters = {"admitted": 0, "queued": 0, "rejected_client": 0, "rejected_full": 0,
+                          "timed_out": 0}
+        self._wait_seconds = 0.0
+        self._service_seconds = 0.0
+        self._completed = 0
+
+    def _active_total(self) -> int:
+        return sum(self._active.values())
+
+    def _queued_total(self) -> int:
+        return sum(len(q) for q in self._waiting.values())
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from the average service time."""
+        average = self._service_seconds / self._completed if self._completed else 5.0
+        backlog = self._queued_total() + 1
+        return max(1, math.ceil(average * backlog / self.max_concurrent))
+
+    def _grant(self, client_id: str) -> Ticket:
+        self._active[client_id] = self._active.get(client_id, 0) + 1
+        self._counters["admitted"] += 1
+        return Ticket(self, client_id)
+
+    def acquire(self, client_id: str) -> Ticket:
+        """Admit now, wait in the queue until the deadline, or raise Rejected."""
+        with self._cond:
+            # Waiters exist only while every slot is taken, so they are never overtaken
+            if not self._waiting and self._active_total() < self.max_concurrent:
+                return self._grant(client_id)
+
+            if len(self._waiting.get(client_id, ())) >= self.max_queued_per_client:
+                self._counters["rejected_client"] += 1
+                raise Rejected("Too many requests from this client", 429, self.retry_after())
+            if self._queued_total() >= self.max_queue:
+                self._counters["rejected_full"] += 1
+                raise Rejected("Server is busy", 503, self.retry_after())
+
+            waiter = _Waiter(client_id)
+            self._waiting.setdefault(client_id, deque()).append(waiter)
+            self._counters["queued"] += 1
+            deadline = waiter.enqueued_at + self.queue_timeout
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting[client_id].remove(waiter)
+                    if not self._waiting[client_id]:
+                        del self._waiting[client_id]
+                    self._counters["timed_out"] += 1
+                    # Another waiter may fit in the slot this one gave up
+                    self._dispatch()
+                    raise Rejected("Timed out waiting for capacity", 503, self.retry_after())
+                self._cond.wait(remaining)
+
+            self._wait_seconds += time.monotonic() - waiter.enqueued_at
+            return Ticket(self, client_id)
+
+    def try_acquire(self, client_id: str):
+        """Admit only if a slot is free right now; returns a Ticket or None and never queues.
+
+        For optional background work that should not wait in front of requests.
+        """
+        with self._cond:
+            if not self._waiting and self._active_total() < self.max_concurrent:
+                return self._grant(client_id)
+            return None
+
+    def _dispatch(self):
+        """Hand free slots to waiting clients, fewest running slots first, oldest request first."""
+        while self._waiting and self._active_total() < self.max_concurrent:
+            client_id = min(self._waiting,
+                            key=lambda c: (self._active.get(c, 0), self._waiting[c][0].enqueued_at))
+            waiter = self._waiting[client_id].popleft()
+            if not self._waiting[client_id]:
+                del self._waiting[client_id]
+            self._grant(client_id)
+            waiter.granted = True
+        self._cond.notify_all()
+
+    def _release(self, ticket: Ticket):
+        with self._cond:
+            count = self._active.get(ticket.client_id, 0) - 1
+            if count > 0:
+                self._active[ticket.client_id] = count
+            else:
+                self._active.pop(ticket.client_id, None)
+            self._service_seconds += time.monotonic() - ticket.granted_at
+            self._completed += 1
+            self._dispatch()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "endpoint": self.name,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self._active_total(),
+                "queue_depth": self._queued_total(),
+                "clients_active": len(self._active),
+                **self._counters,
+                "avg_wait_seconds": round(self._wait_seconds / self._counters["queued"], 3)
+                if self._counters["queued"] else 0.0,
+                "avg_service_seconds": round(self._service_seconds / self._completed, 3)
+                if self._completed else 0.0
+            }
+
+
+def prometheus_text(limiters: list) -> str:
+    """Render limiter stats in the Prometheus text exposition format."""
+    metrics = [
+        ("admission_active", "gauge", "Requests currently running", "active"),
+        ("admission_queue_depth", "gauge", "Requests waiting for a slot", "queue_depth"),
+        ("admission_admitted_total", "counter", "Requests admitted", "admitted"),
+        ("admission_queued_total", "counter", "Requests that had to wait", "queued"),
+        ("admission_rejected_total", "counter", "Requests rejected with 429 (over fair share)", "rejected_client"),
+        ("admission_overloaded_total", "counter", "Requests rejected with 503 (queue full)", "rejected_full"),
+        ("admission_timed_out_total", "counter", "Requests that hit the queue deadline", "timed_out"),
+    ]
+    stats = [limiter.stats() for limiter in limiters]
+    lines = []
+    for metric, kind, help_text, key in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for s in stats:
+            lines.append(f'{metric}{{endpoint="{s["endpoint"]}"}} {s[key]}')
+    return "\n".join(lines) + "\n"
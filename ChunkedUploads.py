@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import time
+import uuid
+import threading
+import contextvars
+
+# A chunk or a whole recording larger than this is rejected
+MAX_CHUNK_BYTES = 5 * 1024 * 1024
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+# Finished or abandoned uploads are forgotten after this many seconds
+UPLOAD_TTL = 3600
+
+UPLOAD_ID_RE = re.compile(r"^[a-f0-9]{32}$")
+
+
+class UploadError(Exception):
+    """An upload request the client has to correct; status is the HTTP code to answer with."""
+
+    def __init__(self, message: str, status: int = 400, offset: int = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUpload:
+    """One recording arriving as ordered byte ranges.
+
+    The offset the server expects next is the size of the .part file on disk,
+    so an upload survives dropped connections and can be resumed from
+    whatever the server last stored.
+    """
+
+    def __init__(self, upload_id: str, folder: str, filename: str):
+        self.upload_id = upload_id
+        self.folder = folder
+        self.filename = filename
+        self.state = "receiving"  # receiving -> processing -> done | failed
+        self.result = None
+        self.error = None
+        self.size = None  # set once the last chunk has arrived
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    @property
+    def part_path(self) -> str:
+        return os.path.join(self.folder, f"{self.upload_id}.part")
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.folder, f"{self.upload_id}.json")
+
+    def offset(self) -> int:
+        if self.size is not None:
+            return self.size
+        try:
+            return os.path.getsize(self.part_path)
+        except FileNotFoundError:
+            return 0
+
+    def to_dict(self) -> dict:
+        data = {"upload_id": self.upload_id, "offset": self.offset(), "state": self.state}
+        if self.state == "done":
+            data["result"] = self.result
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class ChunkedUploads:
+    """Registry of resumable uploads that hands each finished recording to process(path, **options)."""
+
+    def __init__(self, folder: str, process, reporter=None):
+        self.folder = folder
+        self.process = process
+        self.reporter = reporter
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _report(self, operation: str, details: dict, status: str = "success"):
+        if self.reporter:
+            self.reporter(operation, details, status)
+
+    def create(self, filename: str) -> ChunkedUpload:
+        upload = ChunkedUpload(uuid.uuid4().hex, self.folder, filename)
+        open(upload.part_path, "wb").close()
+        with open(upload.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"filename": filename, "created_at": upload.updated_at}, f)
+        with self._lock:
+            self._prune()
+            self._uploads[upload.upload_id] = upload
+        self._report("chunked_upload_start", {"upload_id": upload.upload_id, "filename": filename})
+        return upload
+
+    def get(self, upload_id: str):
+        """Return the upload, reloading one that was interrupted by a restart."""
+        if not UPLOAD_ID_RE.match(upload_id or ""):
+            return None
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                meta_path = os.path.join(self.folder, f"{upload_id}.json")
+                if not os.path.exists(meta_path) or not os.path.exists(
+                        os.path.join(self.folder, f"{upload_id}.part")):
+                    return None
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        filename = json.load(f)["filename"]
+                except (json.JSONDecodeError, KeyError, FileNotFoundError):
+                    return None
+                upload = ChunkedUpload(upload_id, self.folder, filename)
+                self._uploads[upload_id] = upload
+            return upload
+
+    def _prune(self):
+        now = time.time()
+        for upload_id, upload in list(self._uploads.items()):
+            if upload.state != "processing" and now - upload.updated_at > UPLOAD_TTL:
+                del self._uploads[upload_id]
+                for path in (upload.part_path, upload.meta_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def append(self, upload: ChunkedUpload, offset: int, stream, final: bool = False,
+               options: dict = None) -> ChunkedUpload:
+        """Write the bytes of stream at offset; on the final chunk start processing.
+
+        A chunk at the wrong offset raises UploadError(409) carrying the offset
+        the server has, so the client can resend from there.
+        """
+        with upload.lock:
+            if upload.state != "receiving":
+                # A retried final chunk whose answer was lost
+                if final:
+                    return upload
+                raise UploadError("Upload is already complete", 409, upload.offset())
+
+            current = upload.offset()
+            if offset != current:
+                raise UploadError("Unexpected offset", 409, current)
+
+            written = 0
+            with open(upload.part_path, "ab") as f:
+                while True:
+                    chunk = stream.read(64 * 1024)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > MAX_CHUNK_BYTES or current + written > MAX_UPLOAD_BYTES:
+                        f.truncate(current)
+                        raise UploadError("Chunk too large", 413, current)
+                    f.write(chunk)
+            upload.updated_at = time.time()
+
+            if final:
+                if current + written == 0:
+                    raise UploadError("Recording is empty", 400, 0)
+                upload.state = "processing"
+                upload.size = current + written
+                audio_path = os.path.join(self.folder, f"{upload.upload_id}_{upload.filename}")
+                os.replace(upload.part_path, audio_path)
+                os.remove(upload.meta_path)
+                self._report("chunked_upload_complete", {
+                    "upload_id": upload.upload_id,
+                    "bytes": upload.size
+                })
+                context = contextvars.copy_context()
+                threading.Thread(target=context.run, args=(self._run, upload, audio_path, options or {}),
+                                 name=f"upload-{upload.upload_id}", daemon=True).start()
+        return upload
+
+    def _run(self, upload: ChunkedUpload, audio_path: str, options: dict):
+        try:
+            result = self.process(audio_path, **options)
+            with upload.lock:
+                upload.result = result
+                upload.state = "done"
+        except Exception as e:
+            with upload.lock:
+                upload.error = str(e)
+                upload.state = "failed"
+            self._report("chunked_upload_processing", {"upload_id": upload.upload_id, "error": str(e)}, "error")
+        finally:
+            upload.updated_at = time.time()
+            upload.finished.set()
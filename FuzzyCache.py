@@ -0,0 +1,332 @@
+import os
+import re
+import json
+import zlib
+import time
+import uuid
+import atexit
+import threading
+import contextlib
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are kept apart
+    fcntl = None
+
+CACHE_FOLDER = "cache"
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.6 similarity almost always collide
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+_PRIME = (1 << 61) - 1
+# Fixed coefficients so signatures are identical across processes and restarts
+_COEFFICIENTS = [((i * 0x9E3779B97F4A7C15 + 1) % _PRIME, (i * 0xBF58476D1CE4E5B9 + 7) % _PRIME)
+                 for i in range(1, NUM_PERM + 1)]
+
+FILLER_WORDS = {"um", "uh", "erm", "hmm", "please", "okay", "ok"}
+# Hit counters are written in batches; added and dropped entries are written at once
+STATS_FLUSH_EVERY = 20
+STATS_FLUSH_SECONDS = 30
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and filler words, collapse whitespace."""
+    words = re.findall(r"[\w']+", text.lower())
+    return " ".join(w for w in words if w not in FILLER_WORDS)
+
+
+def shingles(normalized: str) -> set:
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set: set) -> list:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _COEFFICIENTS]
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    """Exclusive lock shared with the other processes using the same cache."""
+    with open(path, "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class FuzzyCache:
+    """Near-duplicate cache: MinHash/LSH finds candidates, exact Jaccard confirms them.
+
+    Entry texts and stats live in cache/<name>/index.json, values in one file per
+    entry so large results (generated pages) never bloat the index. The web app
+    and its generator processes share the index: each merges its own changes
+    into it under a file lock and picks up the others' when the file changes.
+    """
+
+    def __init__(self, name: str, threshold: float = 0.9, max_entries: int = 500, exact: bool = False):
+        self.name = name
+        # exact: only texts with the same words after normalize() match, for results
+        # where one changed word ("not", a name, a number) changes the answer
+        self.exact = exact
+        self.threshold = 1.0 if exact else threshold
+        self.max_entries = max_entries
+        self.folder = os.path.join(CACHE_FOLDER, name)
+        self._lock = threading.Lock()
+        self._entries = {}  # entry_id -> {"text", "created_at", "last_used", "hits"}
+        self._shingles = {}  # entry_id -> shingle set
+        self._buckets = {}  # (band, band hash) -> set of entry ids
+        self._by_text = {}  # normalized text -> entry id
+        self._stats = {"lookups": 0, "hits": 0, "exact_hits": 0, "misses": 0,
+                       "rejected_candidates": 0, "false_hits": 0}
+        # Changes not yet merged into index.json
+        self._added = set()
+        self._removed = set()
+        self._used = {}  # entry_id -> (hits, last_used)
+        self._stat_changes = {}
+        self._pending = 0
+        self._saved_at = time.monotonic()
+        self._index_mtime = None
+        self._load()
+        atexit.register(self.flush)
+
+    def _index_path(self) -> str:
+        return os.path.join(self.folder, "index.json")
+
+    def _index_changed(self) -> bool:
+        try:
+            mtime = os.stat(self._index_path()).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        return mtime != self._index_mtime
+
+    def _read_index(self):
+        """The shared index as stored, or None when there is none yet (or it is unreadable)."""
+        try:
+            self._index_mtime = os.stat(self._index_path()).st_mtime_ns
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return None
+
+    def _adopt(self, entries: dict, stats: dict):
+        """Take over the stored entries: other processes may have added, used or dropped some."""
+        for entry_id in set(self._entries) - set(entries) - self._added:
+            self._forget(entry_id)
+        for entry_id, entry in entries.items():
+            if entry_id in self._removed:
+                continue
+            if entry_id in self._entries:
+                self._entries[entry_id] = entry
+            elif os.path.exists(self._value_path(entry_id)):
+                self._add(entry_id, entry)
+        for key in self._stats:
+            self._stats[key] = stats.get(key, 0) + self._stat_changes.get(key, 0)
+
+    def _load(self):
+        data = self._read_index()
+        if data:
+            self._adopt(data.get("entries", {}), data.get("stats", {}))
+
+    def _save(self):
+        """Merge this process's changes into the shared index."""
+        os.makedirs(self.folder, exist_ok=True)
+        with _file_lock(f"{self._index_path()}.lock"):
+            data = self._read_index()
+            if data is None:
+                entries, stats = dict(self._entries), dict(self._stats)
+            else:
+                entries, stats = data.get("entries", {}), data.get("stats", {})
+                for entry_id in self._removed:
+                    entries.pop(entry_id, None)
+                for entry_id in self._added:
+                    if entry_id in self._entries:
+                        entries[entry_id] = self._entries[entry_id]
+                for entry_id, (hits, last_used) in self._used.items():
+                    entry = entries.get(entry_id)
+                    if entry and entry_id not in self._added:
+                        entry["hits"] = entry.get("hits", 0) + hits
+                        entry["last_used"] = max(entry.get("last_used", ""), last_used)
+                for key, change in self._stat_changes.items():
+                    stats[key] = stats.get(key, 0) + change
+
+            # Evict least recently used entries
+            if len(entries) > self.max_entries:
+                by_use = sorted(entries, key=lambda e: entries[e]["last_used"])
+                for old_id in by_use[:len(entries) - self.max_entries]:
+                    del entries[old_id]
+                    self._delete_value(old_id)
+
+            tmp_path = f"{self._index_path()}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": entries, "stats": stats}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._index_path())
+            self._index_mtime = os.stat(self._index_path()).st_mtime_ns
+
+        self._added.clear()
+        self._removed.clear()
+        self._used.clear()
+        self._stat_changes.clear()
+        self._pending = 0
+        self._saved_at = time.monotonic()
+        self._adopt(entries, stats)
+
+    def flush(self):
+        """Write counters that are still waiting for the next batch."""
+        with self._lock:
+            if self._pending:
+                self._save()
+
+    def _count(self, key: str, amount: int = 1):
+        self._stats[key] += amount
+        self._stat_changes[key] = self._stat_changes.get(key, 0) + amount
+
+    def _value_path(self, entry_id: str) -> str:
+        return os.path.join(self.folder, f"{entry_id}.txt")
+
+    def _bands(self, signature: list) -> list:
+        return [(band, hash(tuple(signature[band * ROWS:(band + 1) * ROWS]))) for band in range(BANDS)]
+
+    def _add(self, entry_id: str, entry: dict):
+        shingle_set = shingles(entry["text"])
+        self._entries[entry_id] = entry
+        self._by_text[entry["text"]] = entry_id
+        self._shingles[entry_id] = shingle_set
+        for key in self._bands(minhash(shingle_set)):
+            self._buckets.setdefault(key, set()).add(entry_id)
+
+    def _forget(self, entry_id: str):
+        entry = self._entries.pop(entry_id, None)
+        if entry and self._by_text.get(entry["text"]) == entry_id:
+            del self._by_text[entry["text"]]
+        shingle_set = self._shingles.pop(entry_id, None)
+        if shingle_set is not None:
+            for key in self._bands(minhash(shingle_set)):
+                bucket = self._buckets.get(key)
+                if bucket:
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def _delete_value(self, entry_id: str):
+        try:
+            os.remove(self._value_path(entry_id))
+        except FileNotFoundError:
+            pass
+
+    def _remove(self, entry_id: str):
+        self._forget(entry_id)
+        self._delete_value(entry_id)
+        self._added.discard(entry_id)
+        self._removed.add(entry_id)
+
+    def get(self, text: str):
+        """Return (value, info) for a near-duplicate of text (the same text when exact), or None."""
+        normalized = normalize(text)
+        if not normalized:
+            return None
+        query_shingles = shingles(normalized)
+
+        with self._lock:
+            # A generator process may have added entries since the last look
+            if self._index_changed():
+                self._load()
+            self._count("lookups")
+            candidates = set()
+            if self.exact:
+                if normalized in self._by_text:
+                    candidates.add(self._by_text[normalized])
+            else:
+                for key in self._bands(minhash(query_shingles)):
+                    candidates |= self._buckets.get(key, set())
+
+            best_id, best_score = None, 0.0
+            for entry_id in candidates:
+                score = jaccard(query_shingles, self._shingles[entry_id])
+                if score >= self.threshold and score > best_score:
+                    best_id, best_score = entry_id, score
+                elif score < self.threshold:
+                    # LSH collision that the exact check rejected
+                    self._count("rejected_candidates")
+
+            value = None
+            if best_id is not None:
+                try:
+                    with open(self._value_path(best_id), "r", encoding="utf-8") as f:
+                        value = f.read()
+                except FileNotFoundError:
+                    self._remove(best_id)
+
+            if value is None:
+                self._count("misses")
+                self._note_use()
+                return None
+
+            entry = self._entries[best_id]
+            entry["hits"] = entry.get("hits", 0) + 1
+            entry["last_used"] = datetime.utcnow().isoformat()
+            hits, _ = self._used.get(best_id, (0, ""))
+            self._used[best_id] = (hits + 1, entry["last_used"])
+            self._count("hits")
+            if entry["text"] == normalized:
+                self._count("exact_hits")
+            self._note_use()
+
+        return value, {"entry_id": best_id, "similarity": round(best_score, 4)}
+
+    def _note_use(self):
+        """Save now when entries were dropped or the batch of counters is due."""
+        self._pending += 1
+        if (self._removed or self._pending >= STATS_FLUSH_EVERY
+                or time.monotonic() - self._saved_at >= STATS_FLUSH_SECONDS):
+            self._save()
+
+    def put(self, text: str, value: str) -> str:
+        """Store a result and return its entry id."""
+        normalized = normalize(text)
+        if not normalized:
+            return ""
+        entry_id = uuid.uuid4().hex[:16]
+        now = datetime.utcnow().isoformat()
+
+        with self._lock:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(self._value_path(entry_id), "w", encoding="utf-8") as f:
+                f.write(value)
+            self._add(entry_id, {"text": normalized, "created_at": now, "last_used": now, "hits": 0})
+            self._added.add(entry_id)
+            self._save()
+        return entry_id
+
+    def report_false_hit(self, entry_id: str) -> bool:
+        """Drop an entry that was reused for a request it did not fit."""
+        with self._lock:
+            if entry_id not in self._entries and self._index_changed():
+                self._load()
+            if entry_id not in self._entries:
+                return False
+            self._remove(entry_id)
+            self._count("false_hits")
+            self._save()
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["threshold"] = self.threshold
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0
+        stats["false_hit_rate"] = round(stats["false_hits"] / stats["hits"], 4) if stats["hits"] else 0.0
+        return stats
@@ -0,0 +1,192 @@
+import os
+import threading
+import contextvars
+import time
+
+# Finished jobs nobody attached to are forgotten after this many seconds
+JOB_TTL = 3600
+
+
+class GenerationJob:
+    """One background website generation for an improved text file."""
+
+    def __init__(self, text_file: str, output_path: str = None, owner: str = None):
+        self.text_file = text_file
+        self.output_path = output_path
+        self.owner = owner  # session whose workspace the page is written to
+        self.state = "running"  # running -> done | failed | cancelled
+        self.html_path = None
+        self.ticket = None  # admission slot held while the job runs
+        self.cache_hit = None  # set when the page came from the generation cache
+        self.error = None
+        self.attached = False  # set when the user asked for the site
+        self.launched = False
+        self.started_at = time.time()
+        self.finished_at = None
+        self.finished = threading.Event()  # set when the job stops, whatever its outcome
+
+    def to_dict(self) -> dict:
+        return {
+            "text_file": self.text_file,
+            "state": self.state,
+            "html_file": os.path.basename(self.html_path) if self.html_path else None,
+            "cache_hit": self.cache_hit,
+            "error": self.error,
+            "attached": self.attached,
+            "elapsed": round((self.finished_at or time.time()) - self.started_at, 2)
+        }
+
+
+class GenerationJobs:
+    """Registry of speculative generation jobs keyed by text file name.
+
+    generate(idea) returns HTML (or (HTML, cache hit info)), save(html, output_path)
+    stores it and returns the path, launch(path) (optional) shows a finished site,
+    fallback(text_file_path) regenerates when a job the user is waiting for fails,
+    and reporter(operation, details, status) receives log events. With a limiter
+    (AdmissionLimiter) a job starts only when a slot is free and holds it while
+    it runs.
+    """
+
+    def __init__(self, generate, save, launch=None, fallback=None, reporter=None, limiter=None):
+        self.generate = generate
+        self.save = save
+        self.launch = launch
+        self.fallback = fallback
+        self.reporter = reporter
+        self.limiter = limiter
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _report(self, operation: str, details: dict, status: str = "success"):
+        if self.reporter:
+            self.reporter(operation, details, status)
+
+    def start(self, text_file_path: str, output_path: str = None, owner: str = None,
+              client_id: str = "speculative"):
+        """Start generating in the background unless a live job already exists.
+
+        Returns the job, or None when the limiter has no free slot; speculative
+        work never queues in front of requests.
+        """
+        key = os.path.basename(text_file_path)
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            if job and job.state in ("running", "done"):
+                return job
+            ticket = self.limiter.try_acquire(client_id) if self.limiter else None
+            if self.limiter and ticket is None:
+                job = None
+            else:
+                job = GenerationJob(key, output_path, owner)
+                job.ticket = ticket
+                self._jobs[key] = job
+
+        if job is None:
+            self._report("speculative_generation_skipped", {"text_file": key, "reason": "no free slot"})
+            return None
+
+        # The job keeps the caller's context (e.g. its trace id)
+        context = contextvars.copy_context()
+        thread = threading.Thread(target=context.run, args=(self._run, job, text_file_path),
+                                  name=f"generate-{key}", daemon=True)
+        thread.start()
+        self._report("speculative_generation_start", {"text_file": key})
+        return job
+
+    def _prune(self):
+        now = time.time()
+        for key, job in list(self._jobs.items()):
+            if job.finished_at and now - job.finished_at > JOB_TTL:
+                del self._jobs[key]
+
+    def _run(self, job: GenerationJob, text_file_path: str):
+        try:
+            self._generate(job, text_file_path)
+        finally:
+            if job.ticket:
+                job.ticket.release()
+            job.finished.set()
+
+    def _generate(self, job: GenerationJob, text_file_path: str):
+        try:
+            with open(text_file_path, "r", encoding="utf-8") as f:
+                idea = f.read().strip()
+            result = self.generate(idea)
+            html_code, job.cache_hit = result if isinstance(result, tuple) else (result, None)
+        except Exception as e:
+            with self._lock:
+                failed = job.state == "running"
+                if failed:
+                    job.state = "failed"
+                    job.error = str(e)
+                job.finished_at = time.time()
+            self._report("speculative_generation", {"text_file": job.text_file, "error": str(e)}, "error")
+            if failed and job.attached and self.fallback:
+                self.fallback(text_file_path)
+            return
+
+        with self._lock:
+            job.finished_at = time.time()
+            cancelled = job.state == "cancelled"
+            if not cancelled:
+                job.html_path = self.save(html_code, job.output_path)
+                job.state = "done"
+                should_launch = job.attached and not job.launched
+                job.launched = job.launched or should_launch
+
+        if cancelled:
+            # The model call cannot be interrupted; its result is simply dropped
+            self._report("speculative_generation", {"text_file": job.text_file, "discarded": True})
+            return
+
+        self._report("speculative_generation", {
+            "text_file": job.text_file,
+            "html_file": os.path.basename(job.html_path),
+            "seconds": round(job.finished_at - job.started_at, 2),
+            "attached_before_finish": should_launch
+        })
+        if should_launch and self.launch:
+            self.launch(job.html_path)
+
+    def attach(self, text_file: str, owner: str = None):
+        """Claim the job for an explicit generate request.
+
+        Returns the job when it is running or finished (launching the site now
+        or as soon as it is ready), or None when the caller must generate itself,
+        which includes jobs writing into another session's workspace.
+        """
+        key = os.path.basename(text_file)
+        with self._lock:
+            job = self._jobs.get(key)
+            if not job or job.state not in ("running", "done") or job.owner != owner:
+                return None
+            job.attached = True
+            should_launch = job.state == "done" and not job.launched
+            job.launched = job.launched or should_launch
+
+        if should_launch and self.launch:
+            self.launch(job.html_path)
+        self._report("speculative_generation_attach", job.to_dict())
+        return job
+
+    def cancel(self, text_file: str) -> bool:
+        """Cancel the job for a text that was edited or discarded."""
+        key = os.path.basename(text_file)
+        with self._lock:
+            job = self._jobs.pop(key, None)
+            if not job:
+                return False
+            was_running = job.state == "running"
+            job.state = "cancelled"
+            unused_path = job.html_path if not job.launched else None
+
+        if unused_path and os.path.exists(unused_path):
+            os.remove(unused_path)
+        self._report("speculative_generation_cancel", {"text_file": key, "was_running": was_running})
+        return True
+
+    def get(self, text_file: str):
+        with self._lock:
+            return self._jobs.get(os.path.basename(text_file))
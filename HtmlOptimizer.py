@@ -0,0 +1,302 @@
+import os
+import re
+import time
+import base64
+import hashlib
+import binascii
+from html.parser import HTMLParser
+from urllib.parse import unquote_to_bytes
+
+import HtmlSections
+
+# Set HTML_OPTIMIZE=0 to store pages exactly as the model wrote them
+ENABLED = os.getenv("HTML_OPTIMIZE", "1") == "1"
+ASSETS_FOLDER = "site_assets"
+# Root-relative, so pages work on any host the app runs on; downloads get their assets inlined
+ASSET_BASE_URL = os.getenv("ASSET_BASE_URL", "/assets/")
+# Smaller data URIs are cheaper inline than as an extra request
+ASSET_MIN_BYTES = int(os.getenv("ASSET_MIN_BYTES", str(4 * 1024)))
+ASSET_NAME_RE = re.compile(r"^[0-9a-f]{16}\.[a-z0-9]+$")
+ASSET_EXTENSIONS = {
+    "image/png": "png", "image/jpeg": "jpg", "image/jpg": "jpg", "image/gif": "gif",
+    "image/webp": "webp", "image/avif": "avif", "image/svg+xml": "svg", "image/x-icon": "ico",
+    "font/woff2": "woff2", "font/woff": "woff", "font/ttf": "ttf", "font/otf": "otf",
+    "application/font-woff2": "woff2", "application/font-woff": "woff",
+}
+# Links to extracted assets, also those written with an earlier base URL (http://host/assets/...)
+ASSET_REF_RE = re.compile(r"(?:{}|(?:https?://[^\s\"'()<>/]+)?/assets/)([0-9a-f]{{16}}\.[a-z0-9]+)".format(
+    re.escape(ASSET_BASE_URL)))
+
+DATA_URI_RE = re.compile(r"data:([\w.+-]+/[\w.+-]+)((?:;[\w.-]+=[\w.-]+)*)(;base64)?,([^\"')\s>]+)", re.IGNORECASE)
+STYLE_BLOCK_RE = re.compile(r"<style\b[^>]*>(.*?)</style\s*>", re.IGNORECASE | re.DOTALL)
+# Elements whose text is kept byte for byte by the HTML minifier
+PROTECTED_RE = re.compile(r"<(pre|textarea|script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+HTML_COMMENT_RE = re.compile(r"<!--(?!\[if|<!|>).*?-->", re.DOTALL)
+CSS_STRING_RE = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')")
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+# Groups that hold rules rather than declarations; other @-blocks are kept whole
+NESTED_AT_RULES = ("@media", "@supports", "@container", "@layer")
+# LocalEdit keys its overrides by CSS comments, so its block is kept byte for byte
+MANAGED_STYLE_RE = re.compile(
+    r"<style\b[^>]*\bid=[\"']({})[\"']".format("|".join(map(re.escape, HtmlSections.MANAGED_STYLE_IDS))),
+    re.IGNORECASE
+)
+
+
+class _UsageParser(HTMLParser):
+    """Collects the tags, classes and ids a page uses, and the words its scripts mention."""
+
+    def __init__(self):
+        super().__init__()
+        self.tags = {"html", "body", "head"}
+        self.classes = set()
+        self.ids = set()
+        self.script_words = set()
+        self._in_script = False
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.add(tag)
+        for name, value in attrs:
+            if name == "class" and value:
+                self.classes.update(value.split())
+            elif name == "id" and value:
+                self.ids.add(value)
+            elif name.startswith("on") and value:
+                self.script_words.update(re.findall(r"[\w-]+", value))
+        self._in_script = tag == "script"
+
+    def handle_endtag(self, tag):
+        if tag == "script":
+            self._in_script = False
+
+    def handle_data(self, data):
+        if self._in_script:
+            # Scripts may add classes or build elements at runtime
+            self.script_words.update(re.findall(r"[\w-]+", data))
+
+
+def _size(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _css_rules(css: str) -> list:
+    """Top-level rules of a CSS string, with offsets relative to it."""
+    wrapper = "<style>"
+    rules = HtmlSections.parse_css_rules(f"{wrapper}{css}</style>")
+    for rule in rules:
+        rule.start -= len(wrapper)
+        rule.end -= len(wrapper)
+    return rules
+
+
+def _replace_spans(text: str, replacements: list) -> str:
+    for start, end, value in sorted(replacements, key=lambda r: r[0], reverse=True):
+        text = text[:start] + value + text[end:]
+    return text
+
+
+def extract_assets(page: str) -> str:
+    """Move large inline data URIs into content-addressed files the browser can cache."""
+    def replace(match):
+        mime, _, is_base64, payload = match.groups()
+        extension = ASSET_EXTENSIONS.get(mime.lower())
+        if not extension or len(match.group(0)) < ASSET_MIN_BYTES:
+            return match.group(0)
+        try:
+            data = base64.b64decode(payload, validate=True) if is_base64 else unquote_to_bytes(payload)
+        except (binascii.Error, ValueError):
+            return match.group(0)
+
+        name = f"{hashlib.sha256(data).hexdigest()[:16]}.{extension}"
+        path = os.path.join(ASSETS_FOLDER, name)
+        if not os.path.exists(path):
+            os.makedirs(ASSETS_FOLDER, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return f"{ASSET_BASE_URL}{name}"
+
+    return DATA_URI_RE.sub(replace, page)
+
+
+def asset_names(page: str) -> set:
+    """Names of the extracted assets a page links to."""
+    return set(ASSET_REF_RE.findall(page))
+
+
+def inline_assets(page: str) -> str:
+    """Turn links to extracted assets back into data URIs, for pages opened away from the app."""
+    mimes = {}
+    for mime, extension in ASSET_EXTENSIONS.items():
+        mimes.setdefault(extension, mime)
+
+    def replace(match):
+        path = os.path.join(ASSETS_FOLDER, match.group(1))
+        extension = match.group(1).rsplit(".", 1)[1]
+        if extension not in mimes or not os.path.exists(path):
+            return match.group(0)
+        with open(path, "rb") as f:
+            data = base64.b64encode(f.read()).decode("ascii")
+        return f"data:{mimes[extension]};base64,{data}"
+
+    return ASSET_REF_RE.sub(replace, page)
+
+
+def dedupe_css(page: str) -> str:
+    """Drop repeated CSS rules and style blocks, keeping the last copy so the cascade is unchanged."""
+    rules = HtmlSections.parse_css_rules(page)
+    last_seen = {}
+    for rule in rules:
+        last_seen[" ".join(rule.text.split())] = rule
+    page = _replace_spans(page, [(rule.start, rule.end, "") for rule in rules
+                                 if last_seen[" ".join(rule.text.split())] is not rule])
+    # Blocks that held only duplicates are now empty
+    return STYLE_BLOCK_RE.sub(
+        lambda m: "" if not MANAGED_STYLE_RE.match(m.group(0)) and not CSS_COMMENT_RE.sub("", m.group(1)).strip()
+        else m.group(0), page)
+
+
+def _selector_used(selector: str, usage: _UsageParser) -> bool:
+    """False only when the selector names a class, id or tag the page certainly lacks."""
+    if "(" in selector:
+        return True
+    plain = re.sub(r"\[[^\]]*\]", "", selector)
+    plain = re.sub(r"::?[\w-]+", "", plain)
+    for class_name in re.findall(r"\.(-?[_a-zA-Z][\w-]*)", plain):
+        if class_name not in usage.classes and class_name not in usage.script_words:
+            return False
+    for element_id in re.findall(r"#(-?[_a-zA-Z][\w-]*)", plain):
+        if element_id not in usage.ids and element_id not in usage.script_words:
+            return False
+    for tag in re.findall(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)", plain):
+        tag = tag.lower()
+        if tag not in usage.tags and tag not in usage.script_words:
+            return False
+    return True
+
+
+def _prune_css(css: str, usage: _UsageParser, page: str = None) -> str:
+    """Drop unused rules, or with page given only animations nothing in the page refers to."""
+    replacements = []
+    for rule in _css_rules(css):
+        selector = rule.selector
+        lowered = selector.lower()
+        if lowered.startswith(NESTED_AT_RULES):
+            body_start = rule.text.index("{") + 1
+            inner = _prune_css(rule.text[body_start:-1], usage, page)
+            value = "" if not CSS_COMMENT_RE.sub("", inner).strip() else rule.text[:body_start] + inner + "}"
+            replacements.append((rule.start, rule.end, value))
+        elif page is not None:
+            if lowered.startswith(("@keyframes", "@-webkit-keyframes")):
+                name = selector.split(None, 1)[1].strip() if " " in selector else ""
+                # Keep the animation if anything else on the page mentions its name
+                if name and len(re.findall(rf"(?<![\w-]){re.escape(name)}(?![\w-])", page)) <= 1:
+                    replacements.append((rule.start, rule.end, ""))
+        elif not selector.startswith("@"):
+            selectors = [s.strip() for s in selector.split(",")]
+            used = [s for s in selectors if _selector_used(s, usage)]
+            if not used:
+                replacements.append((rule.start, rule.end, ""))
+            elif len(used) < len(selectors):
+                replacements.append((rule.start, rule.end, ", ".join(used) + rule.text[len(selector):].lstrip()))
+    return _replace_spans(css, replacements)
+
+
+def drop_unused_css(page: str) -> str:
+    """Remove rules whose selectors match nothing in the page or its scripts."""
+    usage = _UsageParser()
+    usage.feed(page)
+    usage.close()
+
+    def pruner(animations_in: str = None):
+        def prune(match):
+            block, offset = match.group(0), match.start(1) - match.start(0)
+            if MANAGED_STYLE_RE.match(block):
+                return block
+            css = match.group(1)
+            return block[:offset] + _prune_css(css, usage, animations_in) + block[offset + len(css):]
+        return prune
+
+    page = STYLE_BLOCK_RE.sub(pruner(), page)
+    # Animations are checked once the rules that used them may be gone
+    return STYLE_BLOCK_RE.sub(pruner(page), page)
+
+
+def minify_css(css: str) -> str:
+    parts = CSS_STRING_RE.split(css)
+    for i in range(0, len(parts), 2):  # odd positions are string literals
+        text = CSS_COMMENT_RE.sub("", parts[i])
+        text = re.sub(r"\s+", " ", text)
+        text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+        text = re.sub(r":\s+", ":", text)
+        parts[i] = text.replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def minify(page: str) -> str:
+    """Collapse whitespace and drop comments outside <pre>, <textarea> and scripts; minify CSS."""
+    pieces = []
+    position = 0
+    for match in PROTECTED_RE.finditer(page):
+        pieces.append(_minify_markup(page[position:match.start()]))
+        block = match.group(0)
+        if match.group(1).lower() == "style" and not MANAGED_STYLE_RE.match(block):
+            css_start = block.index(">") + 1
+            css_end = block.lower().rindex("</style")
+            block = block[:css_start] + minify_css(block[css_start:css_end]) + block[css_end:]
+        pieces.append(block)
+        position = match.end()
+    pieces.append(_minify_markup(page[position:]))
+    return "".join(pieces).strip()
+
+
+def _minify_markup(text: str) -> str:
+    text = HTML_COMMENT_RE.sub("", text)
+    # A newline keeps the page readable line by line and renders the same as a space
+    text = re.sub(r"[ \t\r\f\v]*\n\s*", "\n", text)
+    return re.sub(r"[ \t\r\f\v]{2,}", " ", text)
+
+
+# Assets are extracted after pruning so images of dropped rules are never written
+STAGES = [
+    ("dedupe_css", dedupe_css),
+    ("drop_unused_css", drop_unused_css),
+    ("extract_assets", extract_assets),
+    ("minify", minify),
+]
+
+
+def optimize(page: str, stages: list = None) -> tuple:
+    """Run the page through each stage in turn. Returns (page, report).
+
+    A stage that fails is skipped and reported, so a page the optimizer does
+    not understand is still saved.
+    """
+    report = {"bytes_in": _size(page), "stages": []}
+    started = time.perf_counter()
+    for name, stage in STAGES:
+        if stages is not None and name not in stages:
+            continue
+        stage_started = time.perf_counter()
+        before = _size(page)
+        entry = {"stage": name}
+        try:
+            page = stage(page)
+        except Exception as e:
+            entry["error"] = str(e)
+        after = _size(page)
+        entry.update({"ms": round((time.perf_counter() - stage_started) * 1000, 2),
+                      "bytes_saved": before - after})
+        report["stages"].append(entry)
+
+    report["bytes_out"] = _size(page)
+    report["bytes_saved"] = report["bytes_in"] - report["bytes_out"]
+    report["ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return page, report
+
+
+def format_report(report: dict) -> str:
+    stages = ", ".join(f"{s['stage']} -{s['bytes_saved']}B {s['ms']}ms" + (" (failed)" if "error" in s else "")
+                       for s in report["stages"])
+    return f"{report['bytes_in']} -> {report['bytes_out']} bytes in {report['ms']}ms ({stages})"
@@ -0,0 +1,333 @@
+import re
+from html.parser import HTMLParser
+
+from LocalEdit import OVERRIDES_STYLE_ID
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+             "param", "source", "track", "wbr"}
+# Wrappers whose children are the real sections of the page
+WRAPPER_TAGS = {"main", "div"}
+# Spoken words that point at a kind of section even when the markup does not repeat them
+SECTION_HINTS = {
+    "header": {"header", "top", "logo", "brand"},
+    "nav": {"menu", "navigation", "nav", "navbar", "links"},
+    "hero": {"hero", "banner", "headline", "title", "heading", "intro", "tagline", "cta"},
+    "footer": {"footer", "bottom", "copyright", "social"},
+}
+# Instructions about the whole page cannot be narrowed to a few sections
+GLOBAL_WORDS = {"whole", "entire", "everything", "everywhere", "theme", "all", "page", "site",
+                "website", "layout", "responsive", "mobile", "dark", "mode", "scheme"}
+STOP_WORDS = {"the", "a", "an", "to", "of", "and", "in", "on", "for", "with", "make", "change",
+              "set", "add", "please", "it", "this", "that", "be", "more", "some", "new", "is",
+              "section", "part", "area", "block", "my", "our", "into", "from", "by", "at"}
+
+# Style blocks other code maintains by key; their rules are never offered to the model
+MANAGED_STYLE_IDS = {OVERRIDES_STYLE_ID}
+
+# Section ids carry the element id, which may hold any character but whitespace (e.g. div#w-1/2)
+MARKER_RE = re.compile(r"<!--\s*section:\s*([^\s<>]+?)\s*-->(.*?)<!--\s*/section\s*-->", re.DOTALL)
+
+
+class Section:
+    """A top-level region of the page addressed by a stable id."""
+
+    def __init__(self, section_id: str, kind: str, start: int, end: int, html: str):
+        self.id = section_id
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.html = html
+
+
+class CssRule:
+    """One top-level CSS rule (or @-block) inside a <style> element."""
+
+    def __init__(self, rule_id: str, selector: str, start: int, end: int, text: str):
+        self.id = rule_id
+        self.selector = selector
+        self.start = start
+        self.end = end
+        self.text = text
+
+
+class _OutlineParser(HTMLParser):
+    """Records absolute offsets of <style> blocks and of body children up to depth 2."""
+
+    def __init__(self, source: str):
+        super().__init__(convert_charrefs=False)
+        self.source = source
+        self._line_starts = [0]
+        for match in re.finditer("\n", source):
+            self._line_starts.append(match.end())
+        self.stack = []  # (tag, attrs, start offset, start tag text)
+        self.elements = []  # (tag, attrs, start, end, depth below <body>) for depth 1 and 2
+        self.styles = []  # (content start, content end, attrs)
+        self.body_depth = None
+
+    def _offset(self) -> int:
+        line, col = self.getpos()
+        return self._line_starts[line - 1] + col
+
+    def _record(self, tag, attrs, start, end, depth):
+        if self.body_depth is not None and depth - self.body_depth in (1, 2):
+            self.elements.append((tag, attrs, start, end, depth - self.body_depth))
+
+    def handle_starttag(self, tag, attrs):
+        start = self._offset()
+        text = self.get_starttag_text()
+        if tag in VOID_TAGS:
+            self._record(tag, dict(attrs), start, start + len(text), len(self.stack) + 1)
+            return
+        if tag == "body":
+            self.body_depth = len(self.stack) + 1
+        self.stack.append((tag, dict(attrs), start, text))
+
+    def handle_startendtag(self, tag, attrs):
+        start = self._offset()
+        self._record(tag, dict(attrs), start, start + len(self.get_starttag_text()), len(self.stack) + 1)
+
+    def handle_endtag(self, tag):
+        # Tolerate unclosed children the way browsers do
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                break
+        else:
+            return
+        end_tag_start = self._offset()
+        end = self.source.find(">", end_tag_start) + 1 or len(self.source)
+        while len(self.stack) > i:
+            open_tag, attrs, start, start_text = self.stack.pop()
+            depth = len(self.stack) + 1
+            element_end = end if len(self.stack) == i else end_tag_start
+            if open_tag == "style":
+                self.styles.append((start + len(start_text), end_tag_start, attrs))
+            self._record(open_tag, attrs, start, element_end, depth)
+            if open_tag == "body":
+                self.body_depth = None
+
+
+def _base_id(tag: str, attrs: dict) -> str:
+    # Only used in the section markers, which cannot hold whitespace or angle brackets
+    if (attrs.get("id") or "").strip():
+        return re.sub(r"[\s<>]+", "_", f"{tag}#{attrs['id'].strip()}")
+    classes = (attrs.get("class") or "").split()
+    if classes:
+        return re.sub(r"[<>]+", "_", f"{tag}.{classes[0]}")
+    return tag
+
+
+def _kind(tag: str, attrs: dict) -> str:
+    names = f"{attrs.get('id', '')} {attrs.get('class', '')}".lower()
+    if tag == "nav" or re.search(r"\bnav", names):
+        return "nav"
+    if tag == "header" or "header" in names:
+        return "header"
+    if tag == "footer" or "footer" in names:
+        return "footer"
+    if "hero" in names or "banner" in names:
+        return "hero"
+    return "section"
+
+
+def parse_sections(page: str) -> list:
+    """Split the body into top-level sections with ids that stay stable across edits."""
+    parser = _OutlineParser(page)
+    parser.feed(page)
+    parser.close()
+
+    top = sorted((e for e in parser.elements if e[4] == 1), key=lambda e: e[2])
+    children = sorted((e for e in parser.elements if e[4] == 2), key=lambda e: e[2])
+
+    body_size = sum(e[3] - e[2] for e in top) or 1
+    regions = []
+    for tag, attrs, start, end, _ in top:
+        inner = [c for c in children if start < c[2] and c[3] <= end]
+        # A single wrapper holding most of the page is split into its children
+        if tag in WRAPPER_TAGS and len(inner) >= 2 and (end - start) / body_size > 0.5:
+            regions.extend((c[0], c[1], c[2], c[3]) for c in inner)
+        else:
+            regions.append((tag, attrs, start, end))
+
+    sections = []
+    seen = {}
+    hero_assigned = False
+    for tag, attrs, start, end in regions:
+        if tag in ("script", "style", "noscript"):
+            continue
+        kind = _kind(tag, attrs)
+        # The first plain section after the header is the hero
+        if kind == "section" and not hero_assigned and sections and all(
+                s.kind in ("header", "nav") for s in sections):
+            kind = "hero"
+        hero_assigned = hero_assigned or kind == "hero"
+
+        base = _base_id(tag, attrs)
+        seen[base] = seen.get(base, 0) + 1
+        section_id = base if seen[base] == 1 else f"{base}:{seen[base]}"
+        sections.append(Section(section_id, kind, start, end, page[start:end]))
+    return sections
+
+
+def style_blocks(page: str) -> list:
+    """(content start, content end) of every <style> block except the managed ones."""
+    parser = _OutlineParser(page)
+    parser.feed(page)
+    parser.close()
+    return sorted((start, end) for start, end, attrs in parser.styles
+                  if attrs.get("id") not in MANAGED_STYLE_IDS)
+
+
+def parse_css_rules(page: str) -> list:
+    """Return the top-level rules of every <style> block with absolute offsets.
+
+    Managed blocks (LocalEdit's overrides) are left out.
+    """
+    rules = []
+    for block_start, block_end in style_blocks(page):
+        css = page[block_start:block_end]
+        depth = 0
+        rule_start = None
+        boundary = 0  # where the next top-level selector can begin
+        i = 0
+        while i < len(css):
+            if css.startswith("/*", i):
+                close = css.find("*/", i + 2)
+                i = len(css) if close == -1 else close + 2
+                if depth == 0:
+                    boundary = i
+                continue
+            char = css[i]
+            if char == ";" and depth == 0:
+                boundary = i + 1
+            elif char == "{":
+                if depth == 0:
+                    rule_start = boundary
+                    while rule_start < i and css[rule_start].isspace():
+                        rule_start += 1
+                depth += 1
+            elif char == "}" and depth:
+                depth -= 1
+                if depth == 0 and rule_start is not None:
+                    text = css[rule_start:i + 1]
+                    selector = text[:text.index("{")].strip()
+                    rules.append(CssRule(f"css-{len(rules)}", selector,
+                                         block_start + rule_start, block_start + i + 1, text))
+                    rule_start = None
+                    boundary = i + 1
+            i += 1
+    return rules
+
+
+def _words(text: str) -> set:
+    return {w for w in re.findall(r"[a-z][a-z0-9]+", text.lower()) if w not in STOP_WORDS}
+
+
+def _visible_words(section_html: str) -> set:
+    text = re.sub(r"<(script|style)[^>]*>.*?</\1>", " ", section_html, flags=re.DOTALL | re.IGNORECASE)
+    return _words(re.sub(r"<[^>]+>", " ", text))
+
+
+def _names(section_html: str) -> set:
+    """Class names, ids and tag names used inside a section."""
+    names = set(re.findall(r"<([a-zA-Z][\w-]*)", section_html))
+    names.update(re.findall(r'\bid=["\']([^"\']+)["\']', section_html))
+    for classes in re.findall(r'\bclass=["\']([^"\']+)["\']', section_html):
+        names.update(classes.split())
+    return {n.lower() for n in names}
+
+
+def select_relevant(page: str, instruction: str, max_sections: int = 3):
+    """Pick the sections and CSS rules an instruction is about.
+
+    Returns (sections, css_rules) or None when the instruction concerns the
+    whole page or cannot be tied to specific sections.
+    """
+    words = _words(instruction)
+    if not words or words & GLOBAL_WORDS:
+        return None
+
+    sections = parse_sections(page)
+    if len(sections) < 2:
+        return None
+
+    scored = []
+    for section in sections:
+        names = _names(section.html)
+        name_words = set()
+        for name in names | {section.id.lower()}:
+            name_words.update(re.split(r"[^a-z0-9]+", name))
+        score = 3 * len(words & name_words)
+        score += 2 * len(words & SECTION_HINTS.get(section.kind, set()))
+        score += len(words & _visible_words(section.html))
+        if score:
+            scored.append((score, section))
+
+    if not scored:
+        return None
+    scored.sort(key=lambda x: -x[0])
+    best = scored[0][0]
+    # Keep sections that score close to the best match only
+    chosen = [s for score, s in scored[:max_sections] if score * 2 >= best]
+    chosen.sort(key=lambda s: s.start)
+
+    used_names = set()
+    for section in chosen:
+        used_names |= _names(section.html)
+
+    css_rules = []
+    for rule in parse_css_rules(page):
+        if rule.selector.startswith("@") and not rule.selector.startswith("@media"):
+            continue
+        selector_names = {n.lower() for n in re.findall(r"[.#]?([a-zA-Z][\w-]*)", rule.selector)}
+        if selector_names & used_names:
+            css_rules.append(rule)
+
+    return chosen, css_rules
+
+
+def build_region_prompt(sections: list, css_rules: list) -> str:
+    """Render the selected regions in the marker format the model must answer in.
+
+    Every CSS rule is its own part so it can be put back where it was; the
+    trailing "css" part takes rules that are new.
+    """
+    parts = [f"<!-- section: {s.id} -->\n{s.html}\n<!-- /section -->" for s in sections]
+    parts.extend(f"<!-- section: {rule.id} -->\n{rule.text}\n<!-- /section -->" for rule in css_rules)
+    parts.append("<!-- section: css -->\n\n<!-- /section -->")
+    return "\n\n".join(parts)
+
+
+def splice_regions(page: str, sections: list, css_rules: list, answer: str):
+    """Put the model's updated regions back into the page.
+
+    Each CSS rule is replaced where it stands (an empty part deletes it), so
+    the cascade order is kept. New rules go at the end of the last generated
+    style block. Returns the new page, or None if the answer is missing a
+    section so the caller can fall back to a full-page edit.
+    """
+    updated = {section_id: body.strip("\n") for section_id, body in MARKER_RE.findall(answer)}
+    if any(s.id not in updated for s in sections):
+        return None
+
+    replacements = [(s.start, s.end, updated[s.id]) for s in sections]
+    # A rule the answer left out is kept as it is
+    replacements.extend((rule.start, rule.end, updated[rule.id].strip())
+                        for rule in css_rules if rule.id in updated)
+
+    new_css = (updated.get("css") or "").strip()
+    if new_css:
+        blocks = style_blocks(page)
+        if blocks:
+            close = blocks[-1][1]
+            replacements.append((close, close, f"\n{new_css}\n"))
+        else:
+            # Before any managed block, which must stay last to win the cascade
+            managed = re.search(rf'<style\b[^>]*\bid=["\']({"|".join(map(re.escape, MANAGED_STYLE_IDS))})["\']', page, re.IGNORECASE)
+            head_close = managed.start() if managed else page.lower().find("</head>")
+            if head_close == -1:
+                return None
+            replacements.append((head_close, head_close, f"<style>\n{new_css}\n</style>\n"))
+
+    for start, end, text in sorted(replacements, key=lambda r: r[0], reverse=True):
+        page = page[:start] + text + page[end:]
+    return page
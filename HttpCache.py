@@ -0,0 +1,130 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+# File responses larger than this are passed through untouched
+MAX_BUFFERED_BYTES = 10 * 1024 * 1024
+COMPRESSIBLE_TYPES = {"application/json", "application/javascript", "text/javascript", "image/svg+xml"}
+# Static URLs carry a content hash, so a matching URL never changes
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+_digests = {}  # static path -> ((mtime_ns, size), digest)
+_compressed = OrderedDict()  # (etag, encoding) -> compressed body
+_COMPRESSED_CACHE_SIZE = 128
+_lock = threading.Lock()
+
+
+def static_digest(path: str):
+    """Short content hash of a static file, recomputed only when the file changes."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _digests.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    _digests[path] = (key, digest.hexdigest()[:12])
+    return _digests[path][1]
+
+
+def add_static_version(static_folder: str, endpoint: str, values: dict):
+    """url_defaults hook: url_for('static', ...) gets ?v=<content hash>."""
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        digest = static_digest(os.path.join(static_folder, values["filename"]))
+        if digest:
+            values["v"] = digest
+
+
+def _choose_encoding(accept_encodings) -> str:
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compress(data: bytes, encoding: str, etag: str = None) -> bytes:
+    """Compress a body; bodies with an ETag are kept so polling does not recompress them."""
+    key = (etag, encoding)
+    with _lock:
+        if etag and key in _compressed:
+            _compressed.move_to_end(key)
+            return _compressed[key]
+    if encoding == "br":
+        body = brotli.compress(data, quality=5)
+    else:
+        body = gzip.compress(data, compresslevel=6, mtime=0)
+    if not etag:
+        return body
+    with _lock:
+        _compressed[key] = body
+        while len(_compressed) > _COMPRESSED_CACHE_SIZE:
+            _compressed.popitem(last=False)
+    return body
+
+
+def _is_compressible(mimetype: str) -> bool:
+    return bool(mimetype) and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES)
+
+
+def finalize_response(response, request, static_folder: str = None):
+    """after_request hook: ETag/conditional 304s, cache headers and gzip/brotli.
+
+    Streamed responses (archives, generators) and anything already encoded are
+    left alone. The ETag names the representation actually sent, so a gzip
+    and an identity copy of the same body never share a validator.
+    """
+    if response.headers.get("Content-Encoding") or response.status_code != 200:
+        return response
+    if response.direct_passthrough:
+        # send_file responses: buffer small text files so they can be compressed
+        if not _is_compressible(response.mimetype) or (response.content_length or 0) > MAX_BUFFERED_BYTES:
+            return response
+        response.direct_passthrough = False
+    elif response.is_streamed:
+        return response
+
+    is_static = request.endpoint == "static"
+    if is_static:
+        filename = (request.view_args or {}).get("filename", "")
+        version = request.args.get("v")
+        if version and static_folder and version == static_digest(os.path.join(static_folder, filename)):
+            response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+    elif request.method in ("GET", "HEAD") and "Cache-Control" not in response.headers:
+        # Let browsers keep the body but ask every time; unchanged data costs a 304
+        response.headers["Cache-Control"] = "no-cache"
+
+    data = response.get_data()
+    encoding = None
+    if len(data) >= COMPRESS_MIN_BYTES and _is_compressible(response.mimetype):
+        encoding = _choose_encoding(request.accept_encodings)
+        response.vary.add("Accept-Encoding")
+
+    etag = None
+    if request.method in ("GET", "HEAD"):
+        etag = hashlib.sha1(data).hexdigest()
+        response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    if encoding:
+        response.set_data(_compress(data, encoding, etag))
+        response.headers["Content-Encoding"] = encoding
+    return response
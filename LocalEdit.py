@@ -0,0 +1,283 @@
+import re
+import html as html_lib
+
+# Overrides live in one managed style block so repeated edits replace each other
+OVERRIDES_STYLE_ID = "local-edits"
+
+CSS_COLOR_NAMES = {
+    "aliceblue", "antiquewhite", "aqua", "aquamarine", "azure", "beige", "bisque", "black",
+    "blanchedalmond", "blue", "blueviolet", "brown", "burlywood", "cadetblue", "chartreuse",
+    "chocolate", "coral", "cornflowerblue", "cornsilk", "crimson", "cyan", "darkblue", "darkcyan",
+    "darkgoldenrod", "darkgray", "darkgreen", "darkgrey", "darkkhaki", "darkmagenta",
+    "darkolivegreen", "darkorange", "darkorchid", "darkred", "darksalmon", "darkseagreen",
+    "darkslateblue", "darkslategray", "darkslategrey", "darkturquoise", "darkviolet", "deeppink",
+    "deepskyblue", "dimgray", "dimgrey", "dodgerblue", "firebrick", "floralwhite", "forestgreen",
+    "fuchsia", "gainsboro", "ghostwhite", "gold", "goldenrod", "gray", "green", "greenyellow",
+    "grey", "honeydew", "hotpink", "indianred", "indigo", "ivory", "khaki", "lavender",
+    "lavenderblush", "lawngreen", "lemonchiffon", "lightblue", "lightcoral", "lightcyan",
+    "lightgoldenrodyellow", "lightgray", "lightgreen", "lightgrey", "lightpink", "lightsalmon",
+    "lightseagreen", "lightskyblue", "lightslategray", "lightslategrey", "lightsteelblue",
+    "lightyellow", "lime", "limegreen", "linen", "magenta", "maroon", "mediumaquamarine",
+    "mediumblue", "mediumorchid", "mediumpurple", "mediumseagreen", "mediumslateblue",
+    "mediumspringgreen", "mediumturquoise", "mediumvioletred", "midnightblue", "mintcream",
+    "mistyrose", "moccasin", "navajowhite", "navy", "oldlace", "olive", "olivedrab", "orange",
+    "orangered", "orchid", "palegoldenrod", "palegreen", "paleturquoise", "palevioletred",
+    "papayawhip", "peachpuff", "peru", "pink", "plum", "powderblue", "purple", "rebeccapurple",
+    "red", "rosybrown", "royalblue", "saddlebrown", "salmon", "sandybrown", "seagreen",
+    "seashell", "sienna", "silver", "skyblue", "slateblue", "slategray", "slategrey", "snow",
+    "springgreen", "steelblue", "tan", "teal", "thistle", "tomato", "turquoise", "violet",
+    "wheat", "white", "whitesmoke", "yellow", "yellowgreen",
+}
+
+FONT_SCALE_STEP = 1.15
+
+_POLITE_PREFIX = re.compile(
+    r"^(please\s+|could you\s+|can you\s+|would you\s+|i want you to\s+|i'd like you to\s+|now\s+)+",
+    re.IGNORECASE
+)
+_COLOR_VALUE = r"(?P<color>#[0-9a-f]{3,8}|rgba?\([^)]*\)|[a-z][a-z ]*?)"
+_PATTERNS = [
+    ("background", re.compile(
+        r"^(?:make|change|set|turn|paint)\s+(?:the\s+)?(?:page\s+|site\s+|website\s+)?"
+        r"background(?:\s+colou?r)?\s+(?:to\s+|into\s+)?(?:be\s+)?" + _COLOR_VALUE + r"(?:\s+colou?r)?$", re.IGNORECASE)),
+    ("text_color", re.compile(
+        r"^(?:make|change|set|turn)\s+(?:the\s+|all\s+(?:the\s+)?)?(?:text|font)(?:\s+colou?r)?\s+"
+        r"(?:to\s+|into\s+)?(?:be\s+)?" + _COLOR_VALUE + r"(?:\s+colou?r)?$", re.IGNORECASE)),
+    ("title", re.compile(
+        r"^(?:change|set|rename|update|make)\s+(?:the\s+)?(?:page\s+|site\s+|website\s+|main\s+)?"
+        r"(?:title|heading|headline)\s+(?:to\s+|as\s+)(?:say\s+|read\s+)?(?P<text>.+)$", re.IGNORECASE)),
+    ("font_bigger", re.compile(
+        r"^(?:make\s+(?:the\s+|all\s+(?:the\s+)?)?(?:font|text|font size|text size)\s+(?:a\s+(?:little\s+|bit\s+)?)?"
+        r"(?:bigger|larger)|increase\s+(?:the\s+)?(?:font|text)(?:\s+size)?)$", re.IGNORECASE)),
+    ("font_smaller", re.compile(
+        r"^(?:make\s+(?:the\s+|all\s+(?:the\s+)?)?(?:font|text|font size|text size)\s+(?:a\s+(?:little\s+|bit\s+)?)?"
+        r"smaller|decrease\s+(?:the\s+)?(?:font|text)(?:\s+size)?|reduce\s+(?:the\s+)?(?:font|text)(?:\s+size)?)$", re.IGNORECASE)),
+    ("hide", re.compile(r"^(?:hide|remove|get rid of)\s+(?:the\s+)?(?P<target>[\w -]+?)(?:\s+section|\s+block)?$", re.IGNORECASE)),
+    ("show", re.compile(r"^(?:show|unhide|bring back|restore)\s+(?:the\s+)?(?P<target>[\w -]+?)(?:\s+section|\s+block)?$", re.IGNORECASE)),
+    ("replace_text", re.compile(
+        r"^(?:replace|change)\s+(?:the\s+(?:text|word|words|phrase)\s+)?[\"'“](?P<old>[^\"'”]+)[\"'”]\s+"
+        r"(?:with|to|into)\s+[\"'“](?P<new>[^\"'”]+)[\"'”]$", re.IGNORECASE)),
+]
+
+
+def _normalize_instruction(instruction: str) -> str:
+    # Case is kept: new titles and replacement text must keep the spoken casing
+    text = re.sub(r"\s+", " ", instruction.strip())
+    text = text.rstrip(".!? ")
+    return _POLITE_PREFIX.sub("", text)
+
+
+def _split_instruction(instruction: str) -> list:
+    """Split compound instructions like "make the background black and the text white"."""
+    # Quoted phrases may contain "and" or commas, so never split those
+    if re.search(r"[\"'“”]", instruction):
+        return [instruction]
+    parts = [p.strip() for p in re.split(r",\s*(?:and\s+)?|\s+and\s+(?:then\s+)?", instruction, flags=re.IGNORECASE)
+             if p.strip()]
+    # "make the background black and the text white": carry the verb into the second part
+    for i in range(1, len(parts)):
+        if parts[i].lower().startswith(("the ", "all ")):
+            verb = parts[0].split(" ", 1)[0]
+            parts[i] = f"{verb} {parts[i]}"
+    return parts
+
+
+def _parse_color(value: str):
+    value = value.strip().lower()
+    if re.fullmatch(r"#[0-9a-f]{3}|#[0-9a-f]{6}|#[0-9a-f]{8}|rgba?\([\d\s.,%]+\)", value):
+        return value
+    words = value.split()
+    if words and words[-1] == "color":
+        words = words[:-1]
+    name = "".join(words)
+    if name in CSS_COLOR_NAMES:
+        return name
+    # "dark blue" -> darkblue only when CSS knows it; anything else is not confident
+    return None
+
+
+def _read_overrides(page: str) -> dict:
+    match = re.search(
+        rf'<style id="{OVERRIDES_STYLE_ID}">(.*?)</style>', page, re.DOTALL | re.IGNORECASE
+    )
+    rules = {}
+    if match:
+        for key, rule in re.findall(r"/\* (\S+) \*/ ([^\n]*)", match.group(1)):
+            rules[key] = rule
+    return rules
+
+
+def _write_overrides(page: str, rules: dict) -> str:
+    pattern = re.compile(rf'<style id="{OVERRIDES_STYLE_ID}">.*?</style>\n?', re.DOTALL | re.IGNORECASE)
+    if not rules:
+        return pattern.sub("", page, count=1)
+    body = "\n".join(f"/* {key} */ {rule}" for key, rule in rules.items())
+    block = f'<style id="{OVERRIDES_STYLE_ID}">\n{body}\n</style>\n'
+    if pattern.search(page):
+        return pattern.sub(lambda _: block, page, count=1)
+    # Last in <head> so the overrides win over the generated styles
+    if re.search(r"</head>", page, re.IGNORECASE):
+        return re.sub(r"</head>", lambda _: f"{block}</head>", page, count=1, flags=re.IGNORECASE)
+    return block + page
+
+
+def _find_section_selector(page: str, target: str):
+    """Map a spoken section name to a CSS selector that exists in the page."""
+    slug = re.sub(r"\s+", "-", target.strip().lower())
+    compact = slug.replace("-", "")
+    if slug in ("header", "footer", "nav", "aside", "main") and re.search(rf"<{slug}[\s>]", page, re.IGNORECASE):
+        return slug
+    if slug == "navigation" and re.search(r"<nav[\s>]", page, re.IGNORECASE):
+        return "nav"
+    candidates = list(dict.fromkeys((slug, compact, slug.replace("-", "_"))))
+    # Whole ids and class tokens only: "hero" must not pick up hero-title or data-id
+    ids = {value.lower(): value for value in
+           re.findall(r'(?<![\w-])id=["\']([^"\']+)["\']', page, re.IGNORECASE)}
+    for candidate in candidates:
+        if candidate in ids:
+            return f"#{ids[candidate]}"
+    classes = {}
+    for value in re.findall(r'(?<![\w-])class=["\']([^"\']*)["\']', page, re.IGNORECASE):
+        for token in value.split():
+            classes.setdefault(token.lower(), token)
+    for candidate in candidates:
+        if candidate in classes:
+            return f".{classes[candidate]}"
+    return None
+
+
+def _scale_font_sizes(page: str, factor: float) -> tuple:
+    """Scale px/rem font sizes in style blocks and style attributes; return (page, changes)."""
+    count = 0
+
+    def scale(match):
+        nonlocal count
+        count += 1
+        value = float(match.group(2)) * factor
+        formatted = f"{value:.0f}" if match.group(3) == "px" else f"{value:.2f}".rstrip("0").rstrip(".")
+        return f"{match.group(1)}{formatted}{match.group(3)}"
+
+    size_pattern = re.compile(r"(font-size\s*:\s*)(\d+(?:\.\d+)?)(px|rem)\b", re.IGNORECASE)
+
+    def scale_block(match):
+        return size_pattern.sub(scale, match.group(0))
+
+    page = re.sub(r"<style(?![^>]*id=\"" + OVERRIDES_STYLE_ID + r"\")[^>]*>.*?</style>", scale_block, page,
+                  flags=re.DOTALL | re.IGNORECASE)
+    page = re.sub(r"\bstyle=(\"[^\"]*\"|'[^']*')", scale_block, page, flags=re.IGNORECASE)
+    return page, count
+
+
+def _replace_visible_text(page: str, old: str, new: str) -> tuple:
+    """Replace text outside tags, scripts and styles; return (page, replacements)."""
+    parts = re.split(r"(<[^>]+>)", page)
+    in_raw = False
+    count = 0
+    pattern = re.compile(re.escape(old), re.IGNORECASE)
+    for i, part in enumerate(parts):
+        if part.startswith("<"):
+            tag = part.lower()
+            if re.match(r"<(script|style)[\s>]", tag):
+                in_raw = True
+            elif re.match(r"</(script|style)\s*>", tag):
+                in_raw = False
+            continue
+        if in_raw or not part:
+            continue
+        parts[i], n = pattern.subn(lambda _: html_lib.escape(new, quote=False), part)
+        count += n
+    return "".join(parts), count
+
+
+def _apply_one(page: str, rules: dict, instruction: str):
+    """Apply a single simple instruction; return (page, description) or None.
+
+    A pattern that matches but cannot be applied confidently (unknown color,
+    missing section) passes the instruction on to the next pattern.
+    """
+    for kind, pattern in _PATTERNS:
+        match = pattern.match(instruction)
+        if not match:
+            continue
+
+        if kind in ("background", "text_color"):
+            color = _parse_color(match.group("color"))
+            if not color:
+                continue
+            if kind == "background":
+                rules["background"] = f"html, body {{ background: {color} !important; }}"
+            else:
+                rules["text-color"] = f"body, body * {{ color: {color} !important; }}"
+            return page, f"{kind} -> {color}"
+
+        if kind == "title":
+            # Spoken titles often come back quoted
+            text = match.group("text").strip(" \"'“”")
+            if not text:
+                continue
+            escaped = html_lib.escape(text, quote=False)
+            page, titles = re.subn(r"(<title[^>]*>).*?(</title>)", lambda m: m.group(1) + escaped + m.group(2),
+                                   page, count=1, flags=re.DOTALL | re.IGNORECASE)
+            page, headings = re.subn(r"(<h1[^>]*>).*?(</h1>)", lambda m: m.group(1) + escaped + m.group(2),
+                                     page, count=1, flags=re.DOTALL | re.IGNORECASE)
+            if not titles and not headings:
+                continue
+            return page, f"title -> {text}"
+
+        if kind in ("font_bigger", "font_smaller"):
+            factor = FONT_SCALE_STEP if kind == "font_bigger" else 1 / FONT_SCALE_STEP
+            page, count = _scale_font_sizes(page, factor)
+            if not count:
+                # No absolute sizes in the page: scale the root size instead
+                scale = 1.0
+                current = re.search(r"font-size: ([\d.]+)%", rules.get("font-scale", ""))
+                if current:
+                    scale = float(current.group(1)) / 100
+                rules["font-scale"] = f"html {{ font-size: {scale * factor * 100:.1f}% !important; }}"
+            return page, f"font size x{factor:.2f}"
+
+        if kind in ("hide", "show"):
+            selector = _find_section_selector(page, match.group("target"))
+            if not selector:
+                continue
+            key = f"hide:{selector}"
+            if kind == "hide":
+                rules[key] = f"{selector} {{ display: none !important; }}"
+            elif key in rules:
+                del rules[key]
+            else:
+                continue
+            return page, f"{kind} {selector}"
+
+        if kind == "replace_text":
+            page, count = _replace_visible_text(page, match.group("old"), match.group("new"))
+            if not count:
+                continue
+            return page, f"replaced {count} occurrence(s)"
+
+    return None
+
+
+def apply_local_edit(page: str, instruction: str):
+    """Apply a simple edit instruction without the LLM.
+
+    Returns (updated_html, [applied changes]) when every part of the instruction
+    was understood, otherwise None so the caller can fall back to Gemini.
+    """
+    normalized = _normalize_instruction(instruction)
+    if not normalized or len(normalized) > 200:
+        return None
+
+    rules = _read_overrides(page)
+    original_rules = dict(rules)
+    applied = []
+    for part in _split_instruction(normalized):
+        result = _apply_one(page, rules, part)
+        if result is None:
+            return None
+        page, description = result
+        applied.append(description)
+
+    if rules != original_rules:
+        page = _write_overrides(page, rules)
+    return page, applied
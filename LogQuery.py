@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import atexit
+import base64
+import threading
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+# Hourly rollups older than this are dropped
+ROLLUP_RETENTION_DAYS = 30
+# Rollups are written after this many records or seconds, and at exit
+ROLLUP_FLUSH_EVERY = 50
+ROLLUP_FLUSH_SECONDS = 10
+
+
+def parse_time(value: str) -> datetime:
+    """Parse a log timestamp or an ISO 8601 string into a naive UTC datetime."""
+    value = value.strip()
+    if value.endswith(" UTC"):
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+    if value.endswith("Z"):
+        value = value[:-1]
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo:
+        parsed = parsed.replace(tzinfo=None) - parsed.utcoffset()
+    return parsed
+
+
+def encode_cursor(timestamp: str, skip: int) -> str:
+    raw = json.dumps({"ts": timestamp, "skip": skip}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return raw["ts"], int(raw["skip"])
+
+
+def _load_day(folder: str, day: datetime) -> list:
+    log_file_path = os.path.join(folder, f"log_{day.strftime('%Y%m%d')}.json")
+    if not os.path.exists(log_file_path):
+        return []
+    try:
+        with open(log_file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return []
+
+
+def query_logs(folder: str, operation: str = None, status: str = None,
+               since: datetime = None, until: datetime = None,
+               cursor: str = None, limit: int = 50, trace_id: str = None) -> dict:
+    """Return log entries newest first, filtered and paginated with an opaque cursor."""
+    now = datetime.utcnow()
+    until = until or now
+    since = since or (until - timedelta(days=7))
+
+    after_ts, skip = decode_cursor(cursor) if cursor else (None, 0)
+    results = []
+
+    # Only the daily files inside the time range are opened, newest first
+    day = until.replace(hour=0, minute=0, second=0, microsecond=0)
+    if after_ts is not None:
+        day = min(day, parse_time(after_ts).replace(hour=0, minute=0, second=0, microsecond=0))
+    while day >= since.replace(hour=0, minute=0, second=0, microsecond=0) and len(results) <= limit:
+        # Entries are appended in time order, so reversing gives newest first
+        for entry in reversed(_load_day(folder, day)):
+            timestamp = entry.get("timestamp", "")
+            if operation and entry.get("operation") != operation:
+                continue
+            if status and entry.get("status") != status:
+                continue
+            if trace_id and entry.get("trace_id") != trace_id:
+                continue
+            try:
+                entry_time = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+            except ValueError:
+                continue
+            if entry_time < since or entry_time > until:
+                continue
+            if after_ts is not None:
+                if timestamp > after_ts:
+                    continue
+                if timestamp == after_ts and skip:
+                    skip -= 1
+                    continue
+            results.append(entry)
+            if len(results) > limit:
+                break
+        day -= timedelta(days=1)
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last_ts = results[-1]["timestamp"]
+        # Entries sharing the last timestamp that were already returned
+        same = sum(1 for e in results if e["timestamp"] == last_ts)
+        if after_ts == last_ts:
+            same += decode_cursor(cursor)[1]
+        next_cursor = encode_cursor(last_ts, same)
+
+    return {"logs": results, "next_cursor": next_cursor}
+
+
+class LogRollups:
+    """Per-hour, per-operation counters kept current as entries are logged.
+
+    Counters are updated in memory and written to rollups.json in batches.
+    """
+
+    def __init__(self, folder: str):
+        # Resolved now: the atexit flush must not depend on the working directory at exit
+        self.folder = os.path.abspath(folder)
+        self.path = os.path.join(self.folder, "rollups.json")
+        self._lock = threading.Lock()
+        self._hours = None  # {"YYYY-mm-dd HH:00": {operation: {"total": n, "errors": n}}}
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def _load(self):
+        if self._hours is not None:
+            return
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._hours = json.load(f)
+                return
+            except (json.JSONDecodeError, FileNotFoundError):
+                pass
+        self._hours = self._rebuild()
+
+    def _rebuild(self) -> dict:
+        """Bootstrap rollups from the raw daily files once, when none are stored yet."""
+        hours = {}
+        if not os.path.isdir(self.folder):
+            return hours
+        for name in sorted(os.listdir(self.folder)):
+            if not (name.startswith("log_") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.folder, name), "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                continue
+            for entry in entries:
+                self._add(hours, entry.get("timestamp", ""), entry.get("operation", ""), entry.get("status", ""))
+        return hours
+
+    @staticmethod
+    def _add(hours: dict, timestamp: str, operation: str, status: str):
+        hour = timestamp[:13] + ":00"
+        counters = hours.setdefault(hour, {}).setdefault(operation, {"total": 0, "errors": 0})
+        counters["total"] += 1
+        if status == "error":
+            counters["errors"] += 1
+
+    def _prune(self):
+        cutoff = (datetime.utcnow() - timedelta(days=ROLLUP_RETENTION_DAYS)).strftime("%Y-%m-%d %H:00")
+        for hour in [h for h in self._hours if h < cutoff]:
+            del self._hours[hour]
+
+    def _save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._hours, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    def record(self, timestamp: str, operation: str, status: str):
+        """Count one log entry; the rollups are persisted once a batch is due."""
+        with self._lock:
+            self._load()
+            is_new_hour = timestamp[:13] + ":00" not in self._hours
+            self._add(self._hours, timestamp, operation, status)
+            if is_new_hour:
+                self._prune()
+            self._unsaved += 1
+            if (self._unsaved >= ROLLUP_FLUSH_EVERY
+                    or time.monotonic() - self._saved_at >= ROLLUP_FLUSH_SECONDS):
+                self._save()
+
+    def flush(self):
+        """Persist counters recorded since the last write."""
+        with self._lock:
+            if self._unsaved:
+                self._save()
+
+    def summary(self, since: datetime = None, until: datetime = None, operation: str = None) -> dict:
+        """Return hourly counts and error rates plus per-operation totals for the range."""
+        until = until or datetime.utcnow()
+        since = since or (until - timedelta(hours=24))
+        start = since.strftime("%Y-%m-%d %H:00")
+        end = until.strftime("%Y-%m-%d %H:00")
+
+        hourly = []
+        totals = {}
+        with self._lock:
+            self._load()
+            for hour in sorted(self._hours):
+                if hour < start or hour > end:
+                    continue
+                for op, counters in self._hours[hour].items():
+                    if operation and op != operation:
+                        continue
+                    hourly.append({
+                        "hour": hour,
+                        "operation": op,
+                        "total": counters["total"],
+                        "errors": counters["errors"],
+                        "error_rate": round(counters["errors"] / counters["total"], 4)
+                    })
+                    op_totals = totals.setdefault(op, {"total": 0, "errors": 0})
+                    op_totals["total"] += counters["total"]
+                    op_totals["errors"] += counters["errors"]
+
+        for op_totals in totals.values():
+            op_totals["error_rate"] = round(op_totals["errors"] / op_totals["total"], 4)
+
+        return {"since": start, "until": end, "hourly": hourly, "operations": totals}
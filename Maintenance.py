@@ -0,0 +1,137 @@
+import os
+import fnmatch
+import threading
+import time
+
+
+class RetentionPolicy:
+    """Retention rules for one folder. Any limit left as None is not enforced."""
+
+    def __init__(self, folder: str, pattern: str = "*", max_files: int = None,
+                 max_age_seconds: float = None, max_bytes: int = None):
+        self.folder = folder
+        self.pattern = pattern
+        self.max_files = max_files
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+
+
+class MaintenanceScheduler:
+    """Background thread that applies retention policies off the request path."""
+
+    def __init__(self, policies: list, interval: float = 300, reporter=None, tasks: list = None):
+        self.policies = policies
+        self.tasks = tasks or []  # extra (name, callable) jobs run after the policies
+        self.interval = interval
+        self.reporter = reporter  # called as reporter(operation, details, status)
+        self._scan_cache = {}  # folder -> (dir mtime, {name: (size, mtime)})
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def _report(self, operation: str, details: dict, status: str = "success"):
+        if self.reporter:
+            self.reporter(operation, details, status)
+        else:
+            print(f"[MAINTENANCE] {operation}: {details}")
+
+    def _scan(self, folder: str) -> dict:
+        """Return {name: (size, mtime)}, rescanning only when the folder itself changed."""
+        dir_mtime = os.stat(folder).st_mtime_ns
+        cached = self._scan_cache.get(folder)
+        if cached and cached[0] == dir_mtime:
+            return cached[1]
+
+        entries = {}
+        with os.scandir(folder) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries[entry.name] = (stat.st_size, stat.st_mtime)
+                except FileNotFoundError:
+                    continue
+        self._scan_cache[folder] = (dir_mtime, entries)
+        return entries
+
+    def apply_policy(self, policy: RetentionPolicy) -> dict:
+        """Delete files that fall outside the policy and return what was reclaimed."""
+        if not os.path.isdir(policy.folder):
+            return {"deleted_files": 0, "reclaimed_bytes": 0, "errors": []}
+
+        entries = self._scan(policy.folder)
+        # Newest first, so count and size limits keep the most recent files
+        files = sorted(
+            ((name, size, mtime) for name, (size, mtime) in entries.items()
+             if fnmatch.fnmatch(name, policy.pattern)),
+            key=lambda x: x[2], reverse=True
+        )
+
+        now = time.time()
+        kept_bytes = 0
+        to_delete = []
+        for position, (name, size, mtime) in enumerate(files):
+            expired = policy.max_age_seconds is not None and now - mtime > policy.max_age_seconds
+            over_count = policy.max_files is not None and position >= policy.max_files
+            over_bytes = policy.max_bytes is not None and kept_bytes + size > policy.max_bytes
+            if expired or over_count or over_bytes:
+                to_delete.append((name, size))
+            else:
+                kept_bytes += size
+
+        deleted, reclaimed, errors = 0, 0, []
+        for name, size in to_delete:
+            try:
+                os.remove(os.path.join(policy.folder, name))
+                deleted += 1
+                reclaimed += size
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                errors.append(f"{name}: {e}")
+
+        if to_delete:
+            # Files may have appeared while we were deleting, so rescan next time
+            self._scan_cache.pop(policy.folder, None)
+
+        return {"deleted_files": deleted, "reclaimed_bytes": reclaimed, "errors": errors}
+
+    def run_once(self) -> list:
+        """Apply every policy once and report the results."""
+        results = []
+        for policy in self.policies:
+            try:
+                result = self.apply_policy(policy)
+            except Exception as e:
+                self._report("maintenance", {"folder": policy.folder, "error": str(e)}, "error")
+                continue
+
+            result["folder"] = policy.folder
+            result["pattern"] = policy.pattern
+            results.append(result)
+
+            if result.get("errors"):
+                self._report("maintenance", result, "error")
+            elif result["deleted_files"]:
+                self._report("maintenance", result)
+
+        for name, task in self.tasks:
+            try:
+                task()
+            except Exception as e:
+                self._report("maintenance", {"task": name, "error": str(e)}, "error")
+        return results
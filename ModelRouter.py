@@ -0,0 +1,196 @@
+import os
+import json
+import math
+import threading
+import time
+import contextlib
+from datetime import datetime
+
+import google.generativeai as genai
+
+import Tracing
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are kept apart
+    fcntl = None
+
+USAGE_FILE = os.path.join("logs", "token_usage.json")
+
+# Ordered fastest first. Limits are for the prompt; prices are USD per 1M tokens.
+MODEL_TIERS = [
+    {
+        "tier": "fast",
+        "model": os.getenv("GEMINI_MODEL_FAST", "gemini-2.5-flash-lite"),
+        "max_prompt_tokens": 32000,
+        "typical_latency": 2,
+        "input_price": 0.10,
+        "output_price": 0.40,
+    },
+    {
+        "tier": "standard",
+        "model": os.getenv("GEMINI_MODEL_STANDARD", "gemini-2.5-flash"),
+        "max_prompt_tokens": 200000,
+        "typical_latency": 10,
+        "input_price": 0.30,
+        "output_price": 2.50,
+    },
+    {
+        "tier": "large",
+        "model": os.getenv("GEMINI_MODEL_LARGE", "gemini-2.5-pro"),
+        "max_prompt_tokens": 1000000,
+        "typical_latency": 30,
+        "input_price": 1.25,
+        "output_price": 10.00,
+    },
+]
+
+# Cheapest tier each task may use and how many output tokens it usually needs
+TASKS = {
+    "cleanup": {"tier": "fast", "expected_output_ratio": 1.2},
+    "generate": {"tier": "standard", "expected_output_ratio": 20},
+    "edit": {"tier": "standard", "expected_output_ratio": 1.1},
+}
+
+PER_CALL_TOKEN_LIMIT = int(os.getenv("GEMINI_PER_CALL_TOKEN_LIMIT", "300000"))
+DAILY_TOKEN_BUDGET = int(os.getenv("GEMINI_DAILY_TOKEN_BUDGET", "5000000"))
+
+_lock = threading.Lock()
+
+
+class BudgetExceeded(Exception):
+    """Raised before a call that would break the per-call or daily token budget."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough local token estimate (about 4 characters per token for Gemini)."""
+    return math.ceil(len(text) / 4)
+
+
+def _load_usage() -> dict:
+    if os.path.exists(USAGE_FILE):
+        try:
+            with open(USAGE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            pass
+    return {}
+
+
+@contextlib.contextmanager
+def _usage_lock():
+    """Exclusive access to the usage file for this process's threads and the generator processes."""
+    with _lock:
+        os.makedirs(os.path.dirname(USAGE_FILE), exist_ok=True)
+        with open(f"{USAGE_FILE}.lock", "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _save_usage(usage: dict):
+    os.makedirs(os.path.dirname(USAGE_FILE), exist_ok=True)
+    tmp_path = f"{USAGE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(usage, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, USAGE_FILE)
+
+
+def get_usage(day: str = None) -> dict:
+    """Return token and cost counters per operation for a day (default today, UTC)."""
+    day = day or datetime.utcnow().strftime("%Y-%m-%d")
+    with _lock:
+        usage = _load_usage().get(day, {})
+    total = sum(op["prompt_tokens"] + op["output_tokens"] for op in usage.values())
+    return {
+        "day": day,
+        "operations": usage,
+        "total_tokens": total,
+        "daily_budget": DAILY_TOKEN_BUDGET,
+        "remaining": max(DAILY_TOKEN_BUDGET - total, 0)
+    }
+
+
+def _record(operation: str, tier: dict, prompt_tokens: int, output_tokens: int,
+            seconds: float, error: bool = False):
+    day = datetime.utcnow().strftime("%Y-%m-%d")
+    cost = (prompt_tokens * tier["input_price"] + output_tokens * tier["output_price"]) / 1_000_000
+    with _usage_lock():
+        # Re-read so counters written by TextToCode subprocesses are kept
+        usage = _load_usage()
+        # Only the last week of counters is kept
+        for old_day in sorted(usage)[:-7]:
+            del usage[old_day]
+        counters = usage.setdefault(day, {}).setdefault(operation, {
+            "calls": 0, "errors": 0, "prompt_tokens": 0, "output_tokens": 0,
+            "cost_usd": 0.0, "seconds": 0.0, "models": {}
+        })
+        counters["calls"] += 1
+        counters["errors"] += int(error)
+        counters["prompt_tokens"] += prompt_tokens
+        counters["output_tokens"] += output_tokens
+        counters["cost_usd"] = round(counters["cost_usd"] + cost, 6)
+        counters["seconds"] = round(counters["seconds"] + seconds, 2)
+        counters["models"][tier["model"]] = counters["models"].get(tier["model"], 0) + 1
+        _save_usage(usage)
+
+
+def choose_tier(task: str, prompt_tokens: int, latency_target: float = None) -> dict:
+    """Pick the fastest tier allowed for the task that fits the prompt and latency target."""
+    names = [t["tier"] for t in MODEL_TIERS]
+    start = names.index(TASKS.get(task, {"tier": "standard"})["tier"])
+    candidates = [t for t in MODEL_TIERS[start:] if t["max_prompt_tokens"] >= prompt_tokens]
+    if not candidates:
+        raise BudgetExceeded(
+            f"Prompt of ~{prompt_tokens} tokens is larger than any model accepts"
+        )
+    if latency_target is not None:
+        fast_enough = [t for t in candidates if t["typical_latency"] <= latency_target]
+        if fast_enough:
+            return fast_enough[0]
+    return candidates[0]
+
+
+def generate(task: str, prompt: str, operation: str, latency_target: float = None) -> str:
+    """Route a prompt to a model tier, enforce budgets and record usage. Returns the text."""
+    prompt_tokens = estimate_tokens(prompt)
+    expected_output = int(prompt_tokens * TASKS.get(task, {}).get("expected_output_ratio", 1))
+
+    if prompt_tokens + expected_output > PER_CALL_TOKEN_LIMIT:
+        raise BudgetExceeded(
+            f"Request needs ~{prompt_tokens + expected_output} tokens, "
+            f"per-call limit is {PER_CALL_TOKEN_LIMIT}"
+        )
+    if get_usage()["remaining"] < prompt_tokens + expected_output:
+        raise BudgetExceeded(f"Daily token budget of {DAILY_TOKEN_BUDGET} is used up")
+
+    tier = choose_tier(task, prompt_tokens, latency_target)
+
+    gemini_key = os.getenv("GEMINI_API_KEY")
+    if gemini_key:
+        genai.configure(api_key=gemini_key)
+
+    started = time.time()
+    with Tracing.span("model_call", task=task, model=tier["model"], prompt_tokens=prompt_tokens):
+        try:
+            resp = genai.GenerativeModel(tier["model"]).generate_content(prompt)
+        except Exception:
+            _record(operation, tier, prompt_tokens, 0, time.time() - started, error=True)
+            raise
+
+    text = resp.text if hasattr(resp, "text") else str(resp)
+
+    # Prefer the counts reported by the API over the local estimate
+    usage_metadata = getattr(resp, "usage_metadata", None)
+    if usage_metadata and getattr(usage_metadata, "prompt_token_count", None):
+        prompt_tokens = usage_metadata.prompt_token_count
+        output_tokens = getattr(usage_metadata, "candidates_token_count", 0) or 0
+    else:
+        output_tokens = estimate_tokens(text)
+
+    _record(operation, tier, prompt_tokens, output_tokens, time.time() - started)
+    return text
@@ -0,0 +1,102 @@
+import json
+import queue
+import threading
+
+# Comment lines keep proxies and the browser from closing an idle stream
+HEARTBEAT_SECONDS = 15
+RECONNECT_MILLISECONDS = 2000
+
+
+def format_event(update: dict) -> str:
+    """One server-sent event; the id lets a reconnecting page skip what it already shows."""
+    return f"id: {update['version']}\nevent: update\ndata: {json.dumps(update)}\n\n"
+
+
+class PreviewHub:
+    """Pushes each session's current website to the preview pages it has open.
+
+    Every open page holds a one-slot mailbox: only the newest page matters, so
+    an update that arrives before the previous one was sent replaces it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # session id -> set of mailboxes
+        self._versions = {}  # session id -> number of the last update
+        self._published = 0
+
+    def has_subscribers(self, session_id: str) -> bool:
+        with self._lock:
+            return bool(self._subscribers.get(session_id))
+
+    def version(self, session_id: str) -> int:
+        with self._lock:
+            return self._versions.get(session_id, 0)
+
+    def mark_changed(self, session_id: str) -> int:
+        """Count a change nobody was watching, so a page that reconnects later still gets it."""
+        with self._lock:
+            self._versions[session_id] = self._versions.get(session_id, 0) + 1
+            return self._versions[session_id]
+
+    def subscribe(self, session_id: str) -> queue.Queue:
+        mailbox = queue.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers.setdefault(session_id, set()).add(mailbox)
+        return mailbox
+
+    def unsubscribe(self, session_id: str, mailbox: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(session_id)
+            if subscribers:
+                subscribers.discard(mailbox)
+                if not subscribers:
+                    del self._subscribers[session_id]
+
+    def publish(self, session_id: str, html: str, file: str) -> dict:
+        """Send a new version of the page to every open preview of the session."""
+        with self._lock:
+            version = self._versions.get(session_id, 0) + 1
+            self._versions[session_id] = version
+            self._published += 1
+            mailboxes = list(self._subscribers.get(session_id, ()))
+        update = {"version": version, "file": file, "html": html}
+        for mailbox in mailboxes:
+            try:
+                mailbox.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                mailbox.put_nowait(update)
+            except queue.Full:
+                pass  # a concurrent publish already put a newer version there
+        return {"version": version, "subscribers": len(mailboxes)}
+
+    def stream(self, session_id: str, initial: dict = None, last_event_id: str = None):
+        """Generator of server-sent events for one preview page.
+
+        initial is the page as it is now; it is skipped when the browser
+        reconnects already showing that version.
+        """
+        mailbox = self.subscribe(session_id)
+        try:
+            yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+            if initial and str(initial["version"]) != (last_event_id or ""):
+                yield format_event(initial)
+            while True:
+                try:
+                    update = mailbox.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(update)
+        finally:
+            self.unsubscribe(session_id, mailbox)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._subscribers),
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "published": self._published
+            }
@@ -0,0 +1,94 @@
+import os
+import io
+import pstats
+import cProfile
+import threading
+from datetime import datetime
+
+PROFILES_FOLDER = os.path.join("logs", "profiles")
+
+
+class RequestProfiler:
+    """Captures a cProfile of the next N requests into one downloadable stats file.
+
+    cProfile sees only the thread it runs in and only one profiler can be
+    active per process, so concurrent requests are skipped rather than
+    counted while another request is being profiled.
+    """
+
+    def __init__(self, folder: str = PROFILES_FOLDER):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._requested = 0
+        self._stats = None
+        self._active = None  # profile of the request being captured
+        self._captured = []  # "METHOD path" of profiled requests
+        self.last_file = None
+
+    def arm(self, requests: int):
+        with self._lock:
+            self._remaining = requests
+            self._requested = requests
+            self._stats = None
+            self._captured = []
+            self.last_file = None
+
+    def start(self, label: str) -> bool:
+        """Start profiling this request if a capture is armed and no other request is profiled."""
+        with self._lock:
+            if self._remaining <= 0 or self._active is not None:
+                return False
+            self._active = cProfile.Profile()
+            self._captured.append(label)
+            profile = self._active
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool holds the interpreter hook
+            with self._lock:
+                self._active = None
+                self._captured.pop()
+            return False
+        return True
+
+    def stop(self):
+        """Stop the running capture and write the stats file once N requests were profiled."""
+        with self._lock:
+            profile = self._active
+            if profile is None:
+                return
+            profile.disable()
+            self._active = None
+            if self._stats is None:
+                self._stats = pstats.Stats(profile, stream=io.StringIO())
+            else:
+                self._stats.add(profile)
+            self._remaining -= 1
+            if self._remaining > 0:
+                return
+            stats = self._stats
+
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f"profile_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.prof")
+        stats.dump_stats(path)
+        with self._lock:
+            self.last_file = path
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "requested": self._requested,
+                "remaining": max(self._remaining, 0),
+                "captured": list(self._captured),
+                "ready": self.last_file is not None,
+                "file": os.path.basename(self.last_file) if self.last_file else None
+            }
+
+    def top(self, limit: int = 20) -> str:
+        """Text summary of the captured stats sorted by cumulative time."""
+        if not self.last_file:
+            return ""
+        out = io.StringIO()
+        pstats.Stats(self.last_file, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
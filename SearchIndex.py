@@ -0,0 +1,269 @@
+import os
+import re
+import html
+import sqlite3
+import threading
+from contextlib import contextmanager
+from html.parser import HTMLParser
+
+SEARCH_DB = "search_index.db"
+# Snippets are highlighted with control characters, then escaped, then given <mark> tags
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+_write_lock = threading.Lock()
+
+
+class _VisibleTextParser(HTMLParser):
+    """Collects text a visitor would actually see on the page."""
+
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth and data.strip():
+            self.parts.append(data.strip())
+
+
+def extract_visible_text(html: str) -> str:
+    """Return the visible text of an HTML page as one whitespace-normalized string."""
+    parser = _VisibleTextParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # Malformed markup: fall back to stripping tags
+        return re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", html)).strip()
+    return re.sub(r"\s+", " ", " ".join(parser.parts)).strip()
+
+
+@contextmanager
+def _connect():
+    """Open a connection that commits on success and is always closed."""
+    conn = sqlite3.connect(SEARCH_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def init_index():
+    """Create the index tables if they do not exist yet."""
+    with _write_lock, _connect() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL UNIQUE,
+                kind TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                title TEXT,
+                mtime REAL,
+                size INTEGER
+            )
+        """)
+        # The FTS rowid mirrors documents.id so updates never scan the text table
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                kind UNINDEXED, title, body,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """)
+
+
+def _delete(conn: sqlite3.Connection, doc_id: str):
+    row = conn.execute("SELECT id FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+    if row:
+        conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row["id"],))
+        conn.execute("DELETE FROM documents WHERE id = ?", (row["id"],))
+
+
+def _write(conn: sqlite3.Connection, doc_id: str, kind: str, ref: str, title: str, body: str,
+           mtime: float, size: int):
+    _delete(conn, doc_id)
+    cursor = conn.execute(
+        "INSERT INTO documents (doc_id, kind, ref, title, mtime, size) VALUES (?, ?, ?, ?, ?, ?)",
+        (doc_id, kind, ref, title, mtime, size)
+    )
+    conn.execute(
+        "INSERT INTO documents_fts (rowid, kind, title, body) VALUES (?, ?, ?, ?)",
+        (cursor.lastrowid, kind, title, body)
+    )
+
+
+def _read_text_file(file_path: str) -> tuple:
+    filename = os.path.basename(file_path)
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    stat = os.stat(file_path)
+    return f"text:{filename}", "text", filename, filename, content, stat.st_mtime, stat.st_size
+
+
+def _read_saved_website(website: dict, folder: str) -> tuple:
+    file_path = os.path.join(folder, website["file_path"])
+    with open(file_path, "r", encoding="utf-8") as f:
+        html = f.read()
+    stat = os.stat(file_path)
+    body = extract_visible_text(html)
+    if website.get("idea"):
+        body = f"{website['idea']} {body}"
+    return (f"site:{website['id']}", "site", website["id"], website["name"], body,
+            stat.st_mtime, stat.st_size)
+
+
+def index_document(doc_id: str, kind: str, ref: str, title: str, body: str,
+                   mtime: float = 0, size: int = 0):
+    """Add or replace one document in the index."""
+    with _write_lock, _connect() as conn:
+        _write(conn, doc_id, kind, ref, title, body, mtime, size)
+
+
+def remove_document(doc_id: str):
+    """Drop one document from the index."""
+    with _write_lock, _connect() as conn:
+        _delete(conn, doc_id)
+
+
+def stored_body(doc_id: str):
+    """Return the indexed text of a document, or None if it is not indexed."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT f.body FROM documents d JOIN documents_fts f ON f.rowid = d.id WHERE d.doc_id = ?",
+            (doc_id,)
+        ).fetchone()
+    return row["body"] if row else None
+
+
+def index_text_file(file_path: str):
+    """Index an improved text file under its file name."""
+    index_document(*_read_text_file(file_path))
+
+
+def index_saved_website(website: dict, folder: str):
+    """Index a saved website by its name, original idea and the visible text of its HTML."""
+    index_document(*_read_saved_website(website, folder))
+
+
+def index_saved_websites(websites: list, folder: str) -> int:
+    """Index many saved websites in a single transaction. Returns how many were indexed."""
+    with _write_lock, _connect() as conn:
+        for website in websites:
+            _write(conn, *_read_saved_website(website, folder))
+    return len(websites)
+
+
+def sync(improved_texts_folder: str, saved_websites_folder: str, websites: list) -> dict:
+    """Bring the index in line with the folders, touching only changed documents.
+
+    Texts removed by retention stay searchable, since the index keeps their
+    content (stored_body serves it); a discarded text is removed with
+    remove_document.
+    """
+    with _write_lock, _connect() as conn:
+        known = {row["doc_id"]: (row["mtime"], row["size"])
+                 for row in conn.execute("SELECT doc_id, mtime, size FROM documents")}
+
+        seen = set()
+        added = 0
+
+        if os.path.isdir(improved_texts_folder):
+            with os.scandir(improved_texts_folder) as it:
+                for entry in it:
+                    if not entry.name.endswith(".txt") or not entry.is_file():
+                        continue
+                    doc_id = f"text:{entry.name}"
+                    seen.add(doc_id)
+                    stat = entry.stat()
+                    if known.get(doc_id) != (stat.st_mtime, stat.st_size):
+                        _write(conn, *_read_text_file(entry.path))
+                        added += 1
+
+        for website in websites:
+            doc_id = f"site:{website['id']}"
+            file_path = os.path.join(saved_websites_folder, website["file_path"])
+            if not os.path.exists(file_path):
+                continue
+            seen.add(doc_id)
+            stat = os.stat(file_path)
+            if known.get(doc_id) != (stat.st_mtime, stat.st_size):
+                _write(conn, *_read_saved_website(website, saved_websites_folder))
+                added += 1
+
+        stale = {doc_id for doc_id in known.keys() - seen if not doc_id.startswith("text:")}
+        for doc_id in stale:
+            _delete(conn, doc_id)
+
+    return {"indexed": added, "removed": len(stale), "total": len(known.keys() - stale | seen)}
+
+
+def _to_match_query(query: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]]
+    terms.append(f'"{words[-1]}"*')
+    return " ".join(terms)
+
+
+def _highlight(snippet: str) -> str:
+    """Escape the indexed text so only the <mark> tags are markup."""
+    text = html.escape(snippet or "")
+    return text.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def search(query: str, kind: str = None, page: int = 1, per_page: int = 20) -> dict:
+    """Return ranked, paginated matches with highlighted snippets."""
+    match = _to_match_query(query)
+    if not match:
+        return {"results": [], "total": 0, "page": page, "per_page": per_page}
+
+    where = "documents_fts MATCH ?"
+    params = [match]
+    if kind:
+        where += " AND d.kind = ?"
+        params.append(kind)
+
+    with _connect() as conn:
+        total = conn.execute(
+            f"SELECT count(*) FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid WHERE {where}",
+            params
+        ).fetchone()[0]
+        # Title matches weigh more than body matches
+        rows = conn.execute(
+            f"""
+            SELECT d.doc_id, d.kind, d.ref, d.title, d.mtime,
+                   bm25(documents_fts, 0, 5.0, 1.0) AS score,
+                   snippet(documents_fts, 2, ?, ?, '...', 12) AS snippet
+            FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+            WHERE {where}
+            ORDER BY score
+            LIMIT ? OFFSET ?
+            """,
+            [_MARK_START, _MARK_END] + params + [per_page, (page - 1) * per_page]
+        ).fetchall()
+
+    results = [{
+        "doc_id": row["doc_id"],
+        "kind": row["kind"],
+        "ref": row["ref"],
+        "title": row["title"],
+        "snippet": _highlight(row["snippet"]),
+        "score": round(-row["score"], 4),
+        "modified": row["mtime"]
+    } for row in rows]
+
+    return {"results": results, "total": total, "page": page, "per_page": per_page}
@@ -0,0 +1,379 @@
+import io
+import os
+import re
+import json
+import time
+import queue
+import hashlib
+import tarfile
+import tempfile
+import threading
+import zipfile
+from datetime import datetime
+
+CHUNK_SIZE = 64 * 1024
+MANIFEST_NAME = "metadata.json"
+SITES_PREFIX = "sites/"
+# Images and fonts the pages link to; named by content hash, so they are shared between sites
+ASSETS_PREFIX = "assets/"
+ASSET_NAME_RE = re.compile(r"^([0-9a-f]{16})\.[a-z0-9]+$")
+ARCHIVE_FORMATS = {
+    "zip": ("application/zip", "zip"),
+    "tar": ("application/gzip", "tar.gz"),
+}
+# Imports beyond these are refused before anything is extracted
+MAX_IMPORT_MEMBERS = int(os.getenv("MAX_IMPORT_MEMBERS", "2000"))
+MAX_IMPORT_BYTES = int(os.getenv("MAX_IMPORT_BYTES", str(512 * 1024 * 1024)))
+# Size of the upload itself; a zip is spooled to disk before its directory can be read
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_IMPORT_UPLOAD_BYTES", str(256 * 1024 * 1024)))
+
+
+class ArchiveTooLarge(ValueError):
+    """The uploaded archive is larger than MAX_UPLOAD_BYTES."""
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only sink the archive writers fill and the response generator drains."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _LimitedStream(io.RawIOBase):
+    """Reads through to a stream and raises ArchiveTooLarge past MAX_UPLOAD_BYTES."""
+
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+        self._read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        self._read += len(data)
+        if self._read > MAX_UPLOAD_BYTES:
+            raise ArchiveTooLarge(f"Archive is larger than {MAX_UPLOAD_BYTES} bytes")
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _PrefixedStream(io.RawIOBase):
+    """Replays bytes already read for format detection before the rest of the stream."""
+
+    def __init__(self, prefix: bytes, stream):
+        super().__init__()
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest(websites: list) -> bytes:
+    return json.dumps({
+        "format": 1,
+        "exported_at": datetime.utcnow().isoformat(),
+        "websites": websites
+    }, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+class _QueueSink(io.RawIOBase):
+    """Write-only sink that hands chunks to a reader thread, blocking while it is behind."""
+
+    def __init__(self, chunks: queue.Queue, stopped: threading.Event):
+        super().__init__()
+        self._chunks = chunks
+        self._stopped = stopped
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.put(bytes(data))
+        return len(data)
+
+    def put(self, item):
+        while True:
+            if self._stopped.is_set():
+                raise OSError("Export was abandoned by the reader")
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+def _stream_tar(manifest: bytes, files: list):
+    """Yield a tar.gz of the manifest and the (archive name, path) files as it is written.
+
+    TarFile.addfile copies a whole member in one call, so the archive is
+    written on a thread and handed over through a bounded queue; memory stays
+    at a few chunks however large a site is.
+    """
+    chunks = queue.Queue(maxsize=16)
+    stopped = threading.Event()
+    sink = _QueueSink(chunks, stopped)
+    done = object()
+    errors = []
+
+    def write():
+        try:
+            with tarfile.open(fileobj=sink, mode="w|gz") as archive:
+                info = tarfile.TarInfo(MANIFEST_NAME)
+                info.size = len(manifest)
+                info.mtime = int(time.time())
+                archive.addfile(info, io.BytesIO(manifest))
+                for name, path in files:
+                    with open(path, "rb") as src:
+                        info = archive.gettarinfo(arcname=name, fileobj=src)
+                        archive.addfile(info, src)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            try:
+                sink.put(done)
+            except OSError:
+                pass
+
+    writer = threading.Thread(target=write, name="tar-export", daemon=True)
+    writer.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is done:
+                break
+            yield chunk
+        if errors:
+            raise errors[0]
+    finally:
+        # Also reached when the client goes away mid-download
+        stopped.set()
+        writer.join()
+
+
+def stream_export(websites: list, folder: str, archive_format: str = "zip", assets: list = ()):
+    """Yield an archive of the given sites and their metadata chunk by chunk.
+
+    The manifest comes first so importers reading a stream know the catalog
+    entries before the files arrive. Site files are read in CHUNK_SIZE pieces,
+    so memory use does not grow with the size of the catalog. assets are
+    paths of files the pages link to, stored under assets/.
+    """
+    websites = [w for w in websites if os.path.exists(os.path.join(folder, w["file_path"]))]
+    manifest = _manifest(websites)
+    files = [(SITES_PREFIX + w["file_path"], os.path.join(folder, w["file_path"])) for w in websites]
+    files += [(ASSETS_PREFIX + os.path.basename(path), path) for path in assets if os.path.exists(path)]
+
+    if archive_format == "zip":
+        sink = _ChunkBuffer()
+        # A non-seekable sink makes zipfile write data descriptors instead of seeking back
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(MANIFEST_NAME, manifest)
+            yield sink.drain()
+            for name, path in files:
+                info = zipfile.ZipInfo(name, time.localtime(os.path.getmtime(path))[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with open(path, "rb") as src, archive.open(info, "w") as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        dst.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+        yield sink.drain()
+        return
+
+    yield from _stream_tar(manifest, files)
+
+
+def _check_limits(members: int, total_bytes: int):
+    if members > MAX_IMPORT_MEMBERS:
+        raise ValueError(f"Archive has more than {MAX_IMPORT_MEMBERS} entries")
+    if total_bytes > MAX_IMPORT_BYTES:
+        raise ValueError(f"Archive unpacks to more than {MAX_IMPORT_BYTES} bytes")
+
+
+def _iter_members(stream):
+    """Yield (name, file object) for every regular file in a zip or tar.gz stream.
+
+    Sizes are checked against the import limits before any member is read:
+    all at once for zip, from each header for tar. The upload itself is cut
+    off at MAX_UPLOAD_BYTES while it is read.
+    """
+    stream = _LimitedStream(stream)
+    prefix = stream.read(4)
+    if prefix.startswith(b"PK"):
+        # The zip directory sits at the end, so the upload is spooled to disk first
+        with tempfile.TemporaryFile() as spool:
+            spool.write(prefix)
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                spool.write(chunk)
+            spool.seek(0)
+            with zipfile.ZipFile(spool) as archive:
+                # zipfile stops each member at its declared size, so the directory can be trusted
+                infos = archive.infolist()
+                _check_limits(len(infos), sum(info.file_size for info in infos))
+                for info in infos:
+                    if not info.is_dir():
+                        with archive.open(info) as member:
+                            yield info.filename, member
+        return
+
+    # Tar archives are read strictly front to back without buffering the upload
+    with tarfile.open(fileobj=_PrefixedStream(prefix, stream), mode="r|*") as archive:
+        members = total_bytes = 0
+        for info in archive:
+            members += 1
+            total_bytes += info.size
+            _check_limits(members, total_bytes)
+            if info.isfile():
+                yield info.name, archive.extractfile(info)
+
+
+def _import_asset(name: str, member, assets_folder: str) -> bool:
+    """Store one assets/ member unless it is there already; returns whether it was added."""
+    match = ASSET_NAME_RE.match(os.path.basename(name))
+    if not match or os.path.exists(os.path.join(assets_folder, match.group(0))):
+        return False
+    os.makedirs(assets_folder, exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile("wb", delete=False, dir=assets_folder, suffix=".part") as tmp:
+        for chunk in iter(lambda: member.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            tmp.write(chunk)
+    # Names are content hashes; a file that does not match its name is dropped
+    if digest.hexdigest()[:16] != match.group(1):
+        os.remove(tmp.name)
+        return False
+    os.replace(tmp.name, os.path.join(assets_folder, match.group(0)))
+    return True
+
+
+def import_archive(stream, folder: str, websites: list, assets_folder: str = None) -> tuple:
+    """Read an exported archive into folder, skipping sites whose content is already saved.
+
+    websites is the current catalog; entries missing a "sha256" get one filled
+    in. Files under assets/ go to assets_folder when it is given. Returns (new
+    catalog entries, report). Nothing is added to the catalog here so the
+    caller can save it in one batch.
+    """
+    known_hashes = {}
+    for website in websites:
+        path = os.path.join(folder, website["file_path"])
+        if not website.get("sha256") and os.path.exists(path):
+            website["sha256"] = file_sha256(path)
+        if website.get("sha256"):
+            known_hashes[website["sha256"]] = website["id"]
+    known_ids = {website["id"] for website in websites}
+
+    manifest = None
+    staged = {}  # file name in archive -> (temp path, sha256)
+    duplicates = []
+    imported = []
+    assets = 0
+    try:
+        for name, member in _iter_members(stream):
+            if name == MANIFEST_NAME:
+                manifest = json.load(member)
+                continue
+            if name.startswith(ASSETS_PREFIX) and assets_folder:
+                assets += _import_asset(name, member, assets_folder)
+                continue
+            if not name.startswith(SITES_PREFIX):
+                continue
+            file_name = os.path.basename(name)
+
+            digest = hashlib.sha256()
+            with tempfile.NamedTemporaryFile("wb", delete=False, dir=folder, suffix=".part") as tmp:
+                for chunk in iter(lambda: member.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            sha256 = digest.hexdigest()
+
+            if sha256 in known_hashes:
+                os.remove(tmp.name)
+                duplicates.append({"file": file_name, "existing_id": known_hashes[sha256]})
+            else:
+                known_hashes[sha256] = None
+                staged[file_name] = (tmp.name, sha256)
+
+        if manifest is None:
+            raise ValueError(f"Archive has no {MANIFEST_NAME}")
+
+        duplicate_files = {d["file"] for d in duplicates}
+        missing = []
+        now = datetime.utcnow()
+        for entry in manifest.get("websites", []):
+            file_name = os.path.basename(entry.get("file_path", ""))
+            if file_name not in staged:
+                if file_name not in duplicate_files:
+                    missing.append(entry.get("id"))
+                continue
+            tmp_path, sha256 = staged.pop(file_name)
+
+            website_id = entry.get("id")
+            if not website_id or website_id in known_ids or not website_id.replace("_", "").isalnum():
+                website_id = f"site_{now.strftime('%Y%m%d_%H%M%S_%f')}_{len(imported)}"
+            known_ids.add(website_id)
+
+            os.replace(tmp_path, os.path.join(folder, f"{website_id}.html"))
+            website = {
+                "id": website_id,
+                "name": entry.get("name") or website_id,
+                "created_at": entry.get("created_at") or now.isoformat(),
+                "file_path": f"{website_id}.html",
+                "sha256": sha256,
+                "imported_at": now.isoformat()
+            }
+            if entry.get("idea"):
+                website["idea"] = entry["idea"]
+            imported.append(website)
+    except Exception:
+        for website in imported:
+            os.remove(os.path.join(folder, website["file_path"]))
+        raise
+    finally:
+        # Files without a catalog entry (or left by a failed read) are dropped
+        for tmp_path, _ in staged.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return imported, {
+        "imported": len(imported),
+        "duplicates": len(duplicates),
+        "duplicate_of": duplicates,
+        "missing_files": missing,
+        "assets": assets
+    }
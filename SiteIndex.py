@@ -0,0 +1,160 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+
+from SearchIndex import extract_visible_text
+
+INDEX_FILE = os.path.join("cache", "site_index.json")
+# Field weights: the spoken idea says most about what a site is for, page text the least
+FIELD_WEIGHTS = {"idea": 3, "name": 2, "text": 1}
+STOP_WORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "be", "it",
+    "this", "that", "my", "our", "your", "we", "you", "i", "me", "us", "at", "by", "from", "as",
+    "make", "create", "build", "want", "need", "please", "website", "site", "page", "web", "like",
+    "should", "would", "could", "have", "has", "will", "can", "all", "some", "more", "about",
+}
+
+
+def tokenize(text: str) -> list:
+    return [w for w in re.findall(r"[a-z0-9]{2,}", (text or "").lower()) if w not in STOP_WORDS]
+
+
+class SiteIndex:
+    """TF-IDF cosine similarity over saved sites (name, original idea, visible text).
+
+    Term counts per site are cached in cache/site_index.json keyed by the
+    file's mtime and size, so only new or changed sites are parsed again; the
+    TF-IDF weights are recomputed in memory, which is cheap.
+    """
+
+    def __init__(self, folder: str, index_file: str = INDEX_FILE):
+        self.folder = folder
+        self.index_file = index_file
+        self._lock = threading.Lock()
+        self._terms = {}  # site id -> {"key": [mtime, size, name, idea], "counts": {term: weighted count}}
+        self._vectors = {}  # site id -> ({term: weight}, norm)
+        self._idf = {}
+        self._websites = {}
+        self._signature = None
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    self._terms = json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                self._terms = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+        tmp_path = f"{self.index_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._terms, f)
+        os.replace(tmp_path, self.index_file)
+
+    def _catalog(self) -> list:
+        metadata_file = os.path.join(self.folder, "metadata.json")
+        try:
+            with open(metadata_file, "r", encoding="utf-8") as f:
+                return json.load(f).get("websites", [])
+        except (json.JSONDecodeError, FileNotFoundError):
+            return []
+
+    def _site_counts(self, website: dict, html: str) -> dict:
+        counts = Counter()
+        fields = {
+            "idea": website.get("idea", ""),
+            "name": website.get("name", ""),
+            "text": extract_visible_text(html)
+        }
+        for field, text in fields.items():
+            for term in tokenize(text):
+                counts[term] += FIELD_WEIGHTS[field]
+        return dict(counts)
+
+    def refresh(self):
+        """Bring the index in line with the catalog; unchanged sites are not re-read."""
+        with self._lock:
+            websites = {}
+            changed = False
+            for website in self._catalog():
+                path = os.path.join(self.folder, website.get("file_path", ""))
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                key = [stat.st_mtime, stat.st_size, website.get("name", ""), website.get("idea", "")]
+                websites[website["id"]] = website
+                entry = self._terms.get(website["id"])
+                if entry is None or entry["key"] != key:
+                    with open(path, "r", encoding="utf-8") as f:
+                        html = f.read()
+                    self._terms[website["id"]] = {"key": key, "counts": self._site_counts(website, html)}
+                    changed = True
+
+            for site_id in list(self._terms):
+                if site_id not in websites:
+                    del self._terms[site_id]
+                    changed = True
+            if changed:
+                self._save()
+
+            # Names and ideas are part of the vectors, so any change to the key rebuilds them
+            signature = tuple(sorted((i, tuple(self._terms[i]["key"])) for i in websites))
+            if signature != self._signature:
+                self._build_vectors()
+                self._signature = signature
+            self._websites = websites
+
+    def _build_vectors(self):
+        document_count = len(self._terms)
+        document_frequency = Counter()
+        for entry in self._terms.values():
+            document_frequency.update(entry["counts"].keys())
+        idf = {term: math.log((1 + document_count) / (1 + df)) + 1
+               for term, df in document_frequency.items()}
+        vectors = {}
+        for site_id, entry in self._terms.items():
+            vector = {term: (1 + math.log(count)) * idf[term] for term, count in entry["counts"].items()}
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            vectors[site_id] = (vector, norm)
+        # New objects rather than in-place updates, so snapshots taken by similar() stay whole
+        self._idf, self._vectors = idf, vectors
+
+    def similar(self, idea: str, limit: int = 5) -> list:
+        """Return [(website, score)] for the saved sites closest to the idea, best first."""
+        self.refresh()
+        # refresh() in another thread replaces these together
+        with self._lock:
+            vectors, idf, websites = self._vectors, self._idf, self._websites
+        counts = Counter(tokenize(idea))
+        if not counts or not vectors:
+            return []
+        query = {term: (1 + math.log(count)) * idf[term] for term, count in counts.items() if term in idf}
+        query_norm = math.sqrt(sum(w * w for w in query.values()))
+        if not query_norm:
+            return []
+
+        scored = []
+        for site_id, (vector, norm) in vectors.items():
+            dot = sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            if dot and site_id in websites:
+                scored.append((websites[site_id], round(dot / (query_norm * norm), 4)))
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+    def best_match(self, idea: str, min_similarity: float):
+        """Return (website, html, score) for the closest site at or above min_similarity, or None."""
+        matches = self.similar(idea, limit=1)
+        if not matches or matches[0][1] < min_similarity:
+            return None
+        website, score = matches[0]
+        try:
+            with open(os.path.join(self.folder, website["file_path"]), "r", encoding="utf-8") as f:
+                return website, f.read(), score
+        except FileNotFoundError:
+            return None
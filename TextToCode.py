@@ -1,22 +1,36 @@
 import os
 import re
+import json
+import contextlib
 import subprocess
 import sys
 import tempfile
-import webbrowser
 import http.server
 import socketserver
 import threading
 import time
 from textwrap import dedent
-import google.generativeai as genai
 from dotenv import load_dotenv
 load_dotenv()
+import ModelRouter
+import Tracing
+import HtmlSections
+import HtmlOptimizer
+from FuzzyCache import FuzzyCache
+from SiteIndex import SiteIndex
 API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
 SAVE_DIR = "generated_websites" # websites will be saved here
-# Model initialization
-model = genai.GenerativeModel('gemini-2.5-flash')
+SAVED_WEBSITES_FOLDER = "saved_websites"
+# Near-identical ideas reuse an earlier page instead of a new generation
+generation_cache = FuzzyCache("generate", threshold=float(os.getenv("FUZZY_CACHE_THRESHOLD", "0.9")))
+# Ideas close to a saved site are generated as an edit of that site
+RETRIEVAL_SEEDING = os.getenv("RETRIEVAL_SEEDING", "1") == "1"
+RETRIEVAL_MIN_SIMILARITY = float(os.getenv("RETRIEVAL_MIN_SIMILARITY", "0.5"))
+site_index = SiteIndex(SAVED_WEBSITES_FOLDER)
+# Printed once the page is on disk; the web app frees the generation slot when it sees it
+SAVED_MESSAGE = "Website saved to"
+# Prefixes a finished trace printed as JSON; the web app writes it to its logs
+TRACE_MESSAGE = "Trace:"
 
 def _extract_html_code(text: str) -> str:
     """Extracts the first HTML code block from the model response.
@@ -37,12 +51,85 @@ def _extract_html_code(text: str) -> str:
     return dedent(code_blocks[0].strip())
 
 
-def generate_html_website(idea: str) -> str:
-    """Requests HTML/CSS code from Gemini for the idea and returns the page text."""
+def _generate_from_seed(idea: str, seed_html: str):
+    """Adapt a saved site to the idea by rewriting its sections, keeping its stylesheet.
+
+    Only the body sections and the title are sent back by the model, so the
+    CSS (often half the page) is never regenerated. Returns the new page, or
+    None when the seed cannot be split or the answer does not splice.
+    """
+    sections = HtmlSections.parse_sections(seed_html)
+    if not sections:
+        return None
+    title_match = re.search(r"<title[^>]*>(.*?)</title>", seed_html, re.DOTALL | re.IGNORECASE)
+    title = title_match.group(1).strip() if title_match else ""
+    selectors = ", ".join(dict.fromkeys(rule.selector for rule in HtmlSections.parse_css_rules(seed_html)))
+    regions = HtmlSections.build_region_prompt(sections, [])
+    regions += f"\n\n<!-- section: title -->\n{title}\n<!-- /section -->"
+
+    prompt = f"""You are an experienced web developer. The user describes a website idea. An existing website is close to it, so adapt that website instead of starting over.
+Below are the parts of the existing page. Each part is wrapped in <!-- section: ID --> and <!-- /section --> markers; the "title" part is the page title. The page stylesheet stays as it is and defines these selectors: {selectors}
+
+Page parts:
+```html
+{regions}
+```
+
+User idea: {idea}
+
+Rewrite the parts so the page fits the idea: replace texts, names, links and images, and add or drop elements inside a part where needed. Reuse the existing classes. Return every part listed above with exactly the same markers and ids. Put CSS rules for any new classes in the "css" part and leave it empty otherwise. Respond only with the marked parts wrapped in ```html ... ``` block."""
+
+    raw_answer = ModelRouter.generate("edit", prompt, "generate_website_seeded")
+    answer = _extract_html_code(raw_answer) or raw_answer
+    page = HtmlSections.splice_regions(seed_html, sections, [], answer)
+    if page is None:
+        return None
+
+    new_title = dict(HtmlSections.MARKER_RE.findall(answer)).get("title", "").strip()
+    if title_match and new_title:
+        page = re.sub(r"(<title[^>]*>).*?(</title>)", lambda m: f"{m.group(1)}{new_title}{m.group(2)}",
+                      page, count=1, flags=re.DOTALL | re.IGNORECASE)
+    return page
+
+
+def generate_html_website_with_cache_info(idea: str) -> tuple:
+    """Like generate_html_website; returns (page text, cache hit info or None)."""
+    cached = generation_cache.get(idea)
+    if cached:
+        code, info = cached
+        print(f"\nReusing cached website (similarity {info['similarity']}, entry {info['entry_id']})\n")
+        return code, {"cache": "generate", **info}
+    return generate_html_website(idea, cache_lookup=False), None
+
+
+def generate_html_website(idea: str, cache_lookup: bool = True) -> str:
+    """Requests HTML/CSS code from Gemini for the idea and returns the page text.
+
+    cache_lookup=False is for callers that already looked the idea up; the
+    result is stored in the cache either way.
+    """
+    if cache_lookup:
+        return generate_html_website_with_cache_info(idea)[0]
+
     # Get key from environment variable (or specify directly as string)
     if not API_KEY:
         raise EnvironmentError("Environment variable GEMINI_API_KEY is not set")
 
+    if RETRIEVAL_SEEDING:
+        match = site_index.best_match(idea, RETRIEVAL_MIN_SIMILARITY)
+        if match:
+            website, seed_html, score = match
+            print(f"\nStarting from saved website '{website['name']}' ({website['id']}, similarity {score})\n")
+            try:
+                code = _generate_from_seed(idea, seed_html)
+            except ModelRouter.BudgetExceeded as e:
+                print(f"Seeded generation skipped: {e}")
+                code = None
+            if code:
+                generation_cache.put(idea, code)
+                return code
+            print("Seeded generation did not splice, generating from scratch")
+
 
     system_prompt = (
         "You are an experienced web developer. The user describes a website idea. "
@@ -55,13 +142,13 @@ def generate_html_website(idea: str) -> str:
     full_prompt = f"{system_prompt}\n\nUser idea: {idea}"
 
     print("\nSending request to Gemini...\n")
-    resp = model.generate_content(full_prompt)
-    raw_answer = resp.text if hasattr(resp, "text") else str(resp)
+    raw_answer = ModelRouter.generate("generate", full_prompt, "generate_website")
 
     code = _extract_html_code(raw_answer)
     if not code:
         raise ValueError("Model did not return HTML code block")
 
+    generation_cache.put(idea, code)
     return code
 
 
@@ -80,6 +167,9 @@ def start_local_server(html_file_path: str, port: int = 8000):
                 except Exception as e:
                     self.wfile.write(f"File loading error: {e}".encode('utf-8'))
             else:
+                if self.path.startswith("/assets/"):
+                    # Images and fonts HtmlOptimizer moved out of the page
+                    self.path = f"/{HtmlOptimizer.ASSETS_FOLDER}{self.path[len('/assets'):]}"
                 super().do_GET()
     
     try:
@@ -93,13 +183,103 @@ def start_local_server(html_file_path: str, port: int = 8000):
         print(f"Server startup error: {e}")
 
 
+def save_generated_website(html_code: str, output_path: str = None, optimize: bool = None) -> str:
+    """Saves generated code to output_path (or a new file in SAVE_DIR) and returns its path.
+
+    The page goes through HtmlOptimizer first unless optimize is False
+    (None follows HTML_OPTIMIZE).
+    """
+    if optimize if optimize is not None else HtmlOptimizer.ENABLED:
+        html_code, report = HtmlOptimizer.optimize(html_code)
+        print(f"Optimized website: {HtmlOptimizer.format_report(report)}")
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(html_code)
+        return output_path
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", delete=False, suffix=".html", encoding="utf-8", dir=SAVE_DIR) as tmp:
+        tmp.write(html_code)
+        return tmp.name
+
+
+def serve_website(html_file_path: str, port: int = 8000):
+    """Serves an HTML file locally and blocks until the server stops."""
+    # Start HTTP server in separate thread
+    server_thread = threading.Thread(
+        target=start_local_server, 
+        args=(html_file_path, port), 
+        daemon=True
+    )
+    server_thread.start()
+    
+    # Give server time to start
+    time.sleep(2)
+    
+    print("Starting generated website...\n")
+    print(f"Website available at: http://localhost:{port}")
+    
+    # Wait for server completion
+    server_thread.join()
+
+
+def _report_trace(operation: str, details: dict, status: str):
+    print(f"{TRACE_MESSAGE} {json.dumps({'operation': operation, 'details': details, 'status': status})}",
+          flush=True)
+
+
+@contextlib.contextmanager
+def _resumed_trace():
+    """Continue the trace of the web request that started this process (TRACE_ID).
+
+    Spans opened here, model calls included, are handed back to the app on stdout.
+    """
+    trace_id = os.getenv("TRACE_ID")
+    if not Tracing.is_valid_trace_id(trace_id):
+        yield
+        return
+    Tracing.set_reporter(_report_trace)
+    attrs = {"parent_span_id": os.environ["TRACE_PARENT_SPAN_ID"]} if os.getenv("TRACE_PARENT_SPAN_ID") else {}
+    with Tracing.span("text_to_code", trace_id=trace_id, **attrs):
+        yield
+
+
 def main():
+    # Optional "--output path" chooses where the generated page is written
+    output_path = None
+    if "--output" in sys.argv[:-1]:
+        position = sys.argv.index("--output")
+        output_path = sys.argv[position + 1]
+        del sys.argv[position:position + 2]
+    # "--no-optimize" saves the page exactly as the model wrote it
+    optimize = None
+    if "--no-optimize" in sys.argv:
+        sys.argv.remove("--no-optimize")
+        optimize = False
+    # "--no-cache-lookup": the web app looked the idea up in the generation cache already
+    cache_lookup = "--no-cache-lookup" not in sys.argv
+    if not cache_lookup:
+        sys.argv.remove("--no-cache-lookup")
+    # "--no-serve" only writes the page; the web app shows it in its live preview
+    serve = "--no-serve" not in sys.argv
+    if not serve:
+        sys.argv.remove("--no-serve")
+
     if len(sys.argv) < 2:
         print("Usage:")
         print('  python TextToCode.py "Your website idea"')
-        print('  python TextToCode.py --file path/to/textfile.txt')
+        print('  python TextToCode.py --file path/to/textfile.txt [--output path/to/website.html] [--no-optimize] [--no-serve] [--no-cache-lookup]')
+        print('  python TextToCode.py --serve path/to/website.html')
         sys.exit(1)
 
+    # Serve an already generated website without calling the model
+    if sys.argv[1] == "--serve" and len(sys.argv) >= 3:
+        try:
+            serve_website(sys.argv[2])
+        except Exception as err:
+            print("Website startup error:", err)
+        return
+
     # Check if user wants to read from file
     if sys.argv[1] == "--file" and len(sys.argv) >= 3:
         file_path = sys.argv[2]
@@ -123,42 +303,22 @@ def main():
         sys.exit(1)
 
     try:
-        html_code = generate_html_website(idea)
+        with _resumed_trace():
+            html_code = generate_html_website(idea, cache_lookup)
     except Exception as err:
         print("Code generation error:", err)
         sys.exit(1)
 
     # Create temporary file for code
-    os.makedirs(SAVE_DIR, exist_ok=True)
-    with tempfile.NamedTemporaryFile("w", delete=False, suffix=".html", encoding="utf-8", dir=SAVE_DIR) as tmp:
-        tmp.write(html_code)
-        tmp_path = tmp.name
+    tmp_path = save_generated_website(html_code, output_path, optimize)
 
-    print(f"\nWebsite saved to temporary file: {tmp_path}\n")
+    print(f"\n{SAVED_MESSAGE}: {tmp_path}\n", flush=True)
+    if not serve:
+        return
 
     try:
-        # Open website in browser
         time.sleep(1)  # Small pause for file creation
-        
-        # Start HTTP server in separate thread
-        server_thread = threading.Thread(
-            target=start_local_server, 
-            args=(tmp_path, 8000), 
-            daemon=True
-        )
-        server_thread.start()
-        
-        # Give server time to start
-        time.sleep(2)
-        
-        # Open browser
-        webbrowser.open("http://localhost:8000")
-        
-        print("Starting generated website...\n")
-        print("Website available at: http://localhost:8000")
-        
-        # Wait for server completion
-        server_thread.join()
+        serve_website(tmp_path)
         
     except Exception as err:
         print("Website startup error:", err)
@@ -0,0 +1,143 @@
+import re
+import time
+import uuid
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+TRACE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+# Traces without child spans are only logged when they took at least this long
+SLOW_TRACE_MS = 500
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_reporter = None
+
+
+def set_reporter(reporter):
+    """reporter(operation, details, status) receives one "trace" entry per finished root span."""
+    global _reporter
+    _reporter = reporter
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def is_valid_trace_id(trace_id: str) -> bool:
+    return bool(trace_id) and bool(TRACE_ID_RE.match(trace_id))
+
+
+class Span:
+    """A timed step of a trace; children are the steps it called."""
+
+    def __init__(self, name: str, trace_id: str, parent=None, attrs: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.attrs = attrs or {}
+        self.children = []
+        self.status = "success"
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+        self.thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.duration_ms is not None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, root_start: float = None) -> dict:
+        root_start = self.started_at if root_start is None else root_start
+        data = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "offset_ms": round((self.started_at - root_start) * 1000, 1),
+            "duration_ms": self.duration_ms,
+            "status": self.status
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        with self._lock:
+            children = list(self.children)
+        if children:
+            data["children"] = [child.to_dict(root_start) for child in children]
+        return data
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def start_span(name: str, trace_id: str = None, **attrs):
+    """Open a span under the current one and make it current. Returns (span, token)."""
+    parent = _current_span.get()
+    # Work on another thread can outlive the span that started it, so it becomes
+    # its own root in the same trace and is logged when it finishes
+    if parent is not None and (parent.finished or parent.thread_id != threading.get_ident()):
+        attrs.setdefault("parent_span_id", parent.span_id)
+        trace_id = trace_id or parent.trace_id
+        parent = None
+    if parent is not None:
+        span = Span(name, parent.trace_id, parent, attrs)
+        with parent._lock:
+            parent.children.append(span)
+    else:
+        span = Span(name, trace_id or new_trace_id(), None, attrs)
+    return span, _current_span.set(span)
+
+
+def finish_span(span: Span, token, status: str = None):
+    """Close a span; a finished root span is written to the logs with its whole tree."""
+    span.duration_ms = round((time.perf_counter() - span._start) * 1000, 1)
+    if status:
+        span.status = status
+
+    if span.parent is None and _reporter is not None:
+        if span.children or span.duration_ms >= SLOW_TRACE_MS or span.status != "success":
+            _reporter("trace", {"trace_id": span.trace_id, "root": span.to_dict()}, span.status)
+
+    try:
+        _current_span.reset(token)
+    except (ValueError, RuntimeError):
+        # Token from another context (e.g. a copied one) or already used; just detach
+        _current_span.set(span.parent)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block as a child of the current span."""
+    current, token = start_span(name, **attrs)
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=str(e))
+        finish_span(current, token, "error")
+        raise
+    finish_span(current, token)
+
+
+def traced(name: str = None):
+    """Decorator that runs a function inside a span named after it."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__) as current:
+                result = func(*args, **kwargs)
+                # Functions here report failures as {"error": ...} instead of raising
+                if isinstance(result, dict) and result.get("error"):
+                    current.status = "error"
+                    current.set(error=str(result["error"])[:200])
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,145 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import assemblyai as aai
+
+try:
+    from faster_whisper import WhisperModel, BatchedInferencePipeline
+except ImportError:  # the local backend is optional: pip install faster-whisper
+    WhisperModel = None
+    BatchedInferencePipeline = None
+
+DEFAULT_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "assemblyai")
+
+
+class TranscriptionError(Exception):
+    """A backend could not produce a transcript."""
+
+
+class AssemblyAIBackend:
+    """Cloud transcription: uploads the file and polls until AssemblyAI is done."""
+
+    name = "assemblyai"
+
+    def is_available(self) -> bool:
+        return bool(os.getenv("ASSEMBLYAI_API_KEY"))
+
+    def transcribe(self, file_path: str) -> str:
+        api_key = os.getenv("ASSEMBLYAI_API_KEY")
+        if not api_key:
+            raise TranscriptionError("AssemblyAI API key is not set")
+        aai.settings.api_key = api_key
+
+        # Model settings - by default we take the best available.
+        config = aai.TranscriptionConfig(speech_model=aai.SpeechModel.best)
+        try:
+            transcript = aai.Transcriber(config=config).transcribe(file_path)
+        except Exception as err:
+            raise TranscriptionError(f"AssemblyAI request error: {err}") from err
+
+        if transcript.status == "error":
+            raise TranscriptionError(transcript.error)
+        return transcript.text or ""
+
+
+class LocalWhisperBackend:
+    """Offline CPU transcription with faster-whisper.
+
+    The model is loaded once and kept in the process. A single worker thread
+    owns it: files queued while it is busy are drained together and run back
+    to back on the warm model. Batched inference happens inside one file, over
+    its voice-activity chunks; faster-whisper's pipeline takes one audio at a
+    time, so queued files share the loaded model and the queue wait but are
+    not decoded in the same forward pass.
+    """
+
+    name = "local"
+
+    def __init__(self, model_size: str = None, compute_type: str = None, cpu_threads: int = None,
+                 batch_size: int = None, max_queued: int = 32):
+        self.model_size = model_size or os.getenv("LOCAL_ASR_MODEL", "base")
+        self.compute_type = compute_type or os.getenv("LOCAL_ASR_COMPUTE_TYPE", "int8")
+        self.cpu_threads = cpu_threads or int(os.getenv("LOCAL_ASR_THREADS", str(os.cpu_count() or 4)))
+        self.batch_size = batch_size or int(os.getenv("LOCAL_ASR_BATCH_SIZE", "8"))
+        self.language = os.getenv("LOCAL_ASR_LANGUAGE") or None
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._pipeline = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        return WhisperModel is not None
+
+    def warm_up(self):
+        """Load the model and start the worker so the first request does not pay for it."""
+        if not self.is_available():
+            raise TranscriptionError("Local transcription needs the faster-whisper package")
+        with self._lock:
+            if self._pipeline is None:
+                model = WhisperModel(self.model_size, device="cpu", compute_type=self.compute_type,
+                                     cpu_threads=self.cpu_threads)
+                self._pipeline = BatchedInferencePipeline(model=model)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="local-asr", daemon=True)
+                self._worker.start()
+
+    def transcribe(self, file_path: str, timeout: float = 600) -> str:
+        self.warm_up()
+        future = Future()
+        try:
+            self._queue.put_nowait((file_path, future))
+        except queue.Full:
+            raise TranscriptionError("Local transcription queue is full")
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # A file still waiting is skipped by the worker; one already running finishes unused
+            future.cancel()
+            raise TranscriptionError(f"Local transcription timed out after {timeout:g} seconds")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._queue.maxsize:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for file_path, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self._transcribe_file(file_path))
+                except Exception as e:
+                    future.set_exception(TranscriptionError(f"Local transcription failed: {e}"))
+
+    def _transcribe_file(self, file_path: str) -> str:
+        segments, _ = self._pipeline.transcribe(file_path, batch_size=self.batch_size,
+                                                language=self.language)
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+BACKENDS = {
+    AssemblyAIBackend.name: AssemblyAIBackend(),
+    LocalWhisperBackend.name: LocalWhisperBackend(),
+}
+
+
+def get_backend(name: str = None):
+    """Return the named backend, or the configured default."""
+    name = (name or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise TranscriptionError(f"Unknown transcription backend: {name}")
+    return BACKENDS[name]
+
+
+def transcribe(file_path: str, backend: str = None) -> tuple:
+    """Transcribe a file. Returns (text, backend name)."""
+    selected = get_backend(backend)
+    return selected.transcribe(file_path), selected.name
+
+
+def available_backends() -> dict:
+    return {name: backend.is_available() for name, backend in BACKENDS.items()}
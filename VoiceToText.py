@@ -1,12 +1,38 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, g, Response, stream_with_context, url_for
+import io
 import os
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-import assemblyai as aai
-import google.generativeai as genai
 import sys
 import subprocess
+import hmac
+import functools
+import threading
+import contextvars
 import json
+import tarfile
+import zipfile
+import WebsiteHistory
+import SearchIndex
+import SiteArchive
+import HttpCache
+import Tracing
+from Profiling import RequestProfiler
+import Transcription
+from Transcription import TranscriptionError
+from AdmissionControl import AdmissionLimiter, Rejected, prometheus_text
+from LogQuery import LogRollups, query_logs, parse_time
+from LocalEdit import apply_local_edit
+from GenerationJobs import GenerationJobs
+from ChunkedUploads import ChunkedUploads, UploadError
+import HtmlSections
+import HtmlOptimizer
+import ModelRouter
+from FuzzyCache import FuzzyCache
+from Workspaces import WorkspaceManager, new_session_id, is_valid_session_id
+from Preview import PreviewHub
+import TextToCode
+from Maintenance import MaintenanceScheduler, RetentionPolicy
 
 
 app = Flask(__name__)
@@ -17,11 +43,19 @@ LOGS_FOLDER = "logs"
 WEBSITES_FOLDER = "generated_websites"
 SAVED_WEBSITES_FOLDER = "saved_websites"
 
+# Smaller pages are cheap enough to send whole
+SECTION_EDIT_MIN_CHARS = 4000
+
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(IMPROVED_TEXTS_FOLDER, exist_ok=True)
 os.makedirs(LOGS_FOLDER, exist_ok=True)
 os.makedirs(WEBSITES_FOLDER, exist_ok=True)
 os.makedirs(SAVED_WEBSITES_FOLDER, exist_ok=True)
+os.makedirs(WebsiteHistory.HISTORY_FOLDER, exist_ok=True)
+
+log_rollups = LogRollups(LOGS_FOLDER)
+
+SearchIndex.init_index()
 
 
 def log_operation(operation: str, details: dict = None, status: str = "success"):
@@ -34,6 +68,10 @@ def log_operation(operation: str, details: dict = None, status: str = "success")
             "status": status,
             "details": details or {}
         }
+        # Ties together every entry written while handling one request
+        trace_id = Tracing.current_trace_id()
+        if trace_id:
+            log_entry["trace_id"] = trace_id
         
         # Save to daily log file
         date_str = datetime.utcnow().strftime("%Y%m%d")
@@ -58,6 +96,8 @@ def log_operation(operation: str, details: dict = None, status: str = "success")
         # Save updated logs
         with open(log_file_path, "w", encoding="utf-8") as f:
             json.dump(logs, f, indent=2, ensure_ascii=False)
+        
+        log_rollups.record(timestamp, operation, status)
             
         print(f"[LOG] {operation}: {status}")
         
@@ -65,6 +105,9 @@ def log_operation(operation: str, details: dict = None, status: str = "success")
         print(f"Failed to log operation: {e}")
 
 
+Tracing.set_reporter(log_operation)
+
+
 def get_recent_logs(days: int = 7) -> list:
     """Get recent logs from the last N days."""
     all_logs = []
@@ -92,6 +135,7 @@ def get_recent_logs(days: int = 7) -> list:
         return []
 
 
+@Tracing.traced()
 def save_improved_text(improved_text: str) -> str:
     """Save only the improved text to a file and return the file path."""
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
@@ -103,6 +147,11 @@ def save_improved_text(improved_text: str) -> str:
         with open(file_path, "w", encoding="utf-8") as f:
             f.write(improved_text)
         
+        try:
+            SearchIndex.index_text_file(file_path)
+        except Exception as index_err:
+            print(f"Failed to index improved text: {index_err}")
+        
         log_operation("save_text", {
             "filename": filename,
             "text_length": len(improved_text),
@@ -116,15 +165,33 @@ def save_improved_text(improved_text: str) -> str:
         return ""
 
 
-def ask_gemini(user_text: str) -> str:
-    """Send text to Google Gemini to improve dictated text quality."""
+# Dictations that differ only in punctuation, casing or filler words reuse the cleanup
+# ("do include" and "do not include" are close as text, so near matches are not enough)
+cleanup_cache = FuzzyCache("cleanup", exact=True)
+
+
+@Tracing.traced()
+def ask_gemini(user_text: str) -> tuple:
+    """Send text to Google Gemini to improve dictated text quality.
+
+    Returns (improved text, cache hit info or None); the entry id in the info
+    lets the client report a reused cleanup that does not fit.
+    """
+    cached = cleanup_cache.get(user_text)
+    if cached:
+        improved_text, info = cached
+        log_operation("gemini_request", {
+            "cache_hit": info["entry_id"],
+            "similarity": info["similarity"],
+            "original_length": len(user_text)
+        })
+        return improved_text, {"cache": "cleanup", **info}
+
     gemini_key = os.getenv("GEMINI_API_KEY")
     if not gemini_key:
         log_operation("gemini_request", {"error": "API key not set"}, "error")
         print("GEMINI_API_KEY is not set")
-        return user_text  # Return original text if Gemini is not available
-
-    genai.configure(api_key=gemini_key)
+        return user_text, None  # Return original text if Gemini is not available
 
     try:
         with open("prompt.txt", "r", encoding="utf-8") as f:
@@ -139,9 +206,8 @@ def ask_gemini(user_text: str) -> str:
         final_prompt = f"{base_prompt}\n\nText to improve: {user_text}"
 
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        resp = model.generate_content(final_prompt)
-        improved_text = resp.text if hasattr(resp, "text") else str(resp)
+        # Cleanup is short and latency-sensitive, so it goes to the fastest tier
+        improved_text = ModelRouter.generate("cleanup", final_prompt, "gemini_request", latency_target=5)
         
         log_operation("gemini_request", {
             "original_length": len(user_text),
@@ -149,11 +215,12 @@ def ask_gemini(user_text: str) -> str:
             "original_preview": user_text[:50] + "..." if len(user_text) > 50 else user_text
         })
         
-        return improved_text.strip()
+        cleanup_cache.put(user_text, improved_text.strip())
+        return improved_text.strip(), None
     except Exception as err:
         log_operation("gemini_request", {"error": str(err)}, "error")
         print("Gemini error:", err)
-        return user_text  # Return original text if error occurs
+        return user_text, None  # Return original text if error occurs
 
 
 def _extract_html_code(text: str) -> str:
@@ -172,15 +239,62 @@ def _extract_html_code(text: str) -> str:
     return dedent(code_blocks[0].strip())
 
 
-def edit_website(website_path: str, edit_instructions: str) -> dict:
-    """Edit existing website using Gemini with new instructions."""
+def _edit_sections_with_gemini(current_html: str, edit_instructions: str):
+    """Send only the sections the instruction touches and splice the answer back.
+
+    Returns the updated page, or None when the page cannot be narrowed down.
+    """
+    if len(current_html) < SECTION_EDIT_MIN_CHARS:
+        return None
+    selection = HtmlSections.select_relevant(current_html, edit_instructions)
+    if not selection:
+        return None
+    sections, css_rules = selection
+    regions = HtmlSections.build_region_prompt(sections, css_rules)
+
+    edit_prompt = f"""You are an experienced web developer. I need to modify part of an existing website.
+Below are only the parts of the page affected by the change. Each part is wrapped in <!-- section: ID --> and <!-- /section --> markers; each "css-N" part holds one CSS rule these sections use, and the empty "css" part is for new rules.
+
+Page parts:
+```html
+{regions}
+```
+
+Modification instructions: {edit_instructions}
+
+Return every part listed above, changed or not, with exactly the same markers and ids. Change a CSS rule inside its own "css-N" part (leave the part empty to delete the rule) and put new rules in the "css" part. Do not add other parts. Respond only with the marked parts wrapped in ```html ... ``` block."""
+
+    answer_text = ModelRouter.generate("edit", edit_prompt, "edit_website")
+    answer = _extract_html_code(answer_text) or answer_text
+    updated_html = HtmlSections.splice_regions(current_html, sections, css_rules, answer)
+
+    log_operation("edit_sections", {
+        "sections": [section.id for section in sections],
+        "css_rules": len(css_rules),
+        "page_chars": len(current_html),
+        "prompt_chars": len(edit_prompt),
+        "spliced": updated_html is not None
+    }, "success" if updated_html is not None else "error")
+    return updated_html
+
+
+def _edit_with_gemini(current_html: str, edit_instructions: str) -> dict:
+    """Ask Gemini for the edit, sending only the relevant sections when possible."""
+    gemini_key = os.getenv("GEMINI_API_KEY")
+    if not gemini_key:
+        return {"success": False, "error": "GEMINI_API_KEY not set"}
+    
     try:
-        # Read existing website
-        with open(website_path, "r", encoding="utf-8") as f:
-            current_html = f.read()
-        
-        # Create prompt for editing
-        edit_prompt = f"""You are an experienced web developer. I have an existing website and need you to modify it based on new instructions.
+        updated_html = _edit_sections_with_gemini(current_html, edit_instructions)
+    except ModelRouter.BudgetExceeded as e:
+        # The whole page would be larger still
+        log_operation("edit_sections", {"error": str(e), "page_chars": len(current_html)}, "error")
+        return {"success": False, "error": str(e)}
+    if updated_html:
+        return {"success": True, "updated_html": updated_html}
+    
+    # Create prompt for editing
+    edit_prompt = f"""You are an experienced web developer. I have an existing website and need you to modify it based on new instructions.
 
 Current website HTML:
 ```html
@@ -191,32 +305,82 @@ Modification instructions: {edit_instructions}
 
 Please provide the updated HTML code with all the requested changes. Respond only with the complete HTML code wrapped in ```html ... ``` block. The site should remain functional and beautiful."""
 
-        # Send to Gemini
-        gemini_key = os.getenv("GEMINI_API_KEY")
-        if not gemini_key:
-            return {"success": False, "error": "GEMINI_API_KEY not set"}
-        
-        genai.configure(api_key=gemini_key)
-        model = genai.GenerativeModel("gemini-pro")
-        resp = model.generate_content(edit_prompt)
-        
-        # Extract HTML code
-        updated_html = _extract_html_code(resp.text)
-        
-        if not updated_html:
-            return {"success": False, "error": "No valid HTML returned from Gemini"}
+    try:
+        answer_text = ModelRouter.generate("edit", edit_prompt, "edit_website")
+    except ModelRouter.BudgetExceeded as e:
+        # Caught before sending, instead of timing out on an oversized page
+        log_operation("edit_website", {"error": str(e), "page_chars": len(current_html)}, "error")
+        return {"success": False, "error": str(e)}
+    
+    # Extract HTML code
+    updated_html = _extract_html_code(answer_text)
+    
+    if not updated_html:
+        return {"success": False, "error": "No valid HTML returned from Gemini"}
+    
+    return {"success": True, "updated_html": updated_html}
+
+
+@Tracing.traced()
+def edit_website(website_path: str, edit_instructions: str, workspace, allow_local: bool = True,
+                 optimize: bool = True) -> dict:
+    """Edit existing website, locally for simple instructions and with Gemini otherwise.
+
+    The edited page is written into the session's workspace.
+    """
+    try:
+        # Read existing website
+        with open(website_path, "r", encoding="utf-8") as f:
+            current_html = f.read()
         
-        # Save updated website
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
-        new_filename = f"edited_website_{timestamp}.html"
-        new_path = os.path.join(WEBSITES_FOLDER, new_filename)
+        # Simple instructions (colors, title, font size, hiding sections) are
+        # applied directly; anything not understood goes to Gemini
+        local_result = apply_local_edit(current_html, edit_instructions) if allow_local else None
+        if local_result:
+            updated_html, local_changes = local_result
+            engine = "local"
+        else:
+            gemini_result = _edit_with_gemini(current_html, edit_instructions)
+            if not gemini_result["success"]:
+                return gemini_result
+            updated_html, local_changes = gemini_result["updated_html"], []
+            engine = "gemini"
+
+        optimization = None
+        if optimize and HtmlOptimizer.ENABLED:
+            updated_html, optimization = HtmlOptimizer.optimize(updated_html)
+            log_operation("optimize_html", {"source": "edit", **optimization})
+        
+        # Edits of the session's edited website continue its version chain and
+        # overwrite the working copy in place; anything else starts a new chain
+        original_file = os.path.basename(website_path)
+        chain_id = original_file[:-len(".html")] if original_file.endswith(".html") else original_file
+        is_chain_head = (
+            original_file.startswith("edited_website_")
+            and os.path.abspath(os.path.dirname(website_path)) == os.path.abspath(workspace.folder)
+            and WebsiteHistory.chain_owner(chain_id) == workspace.session_id
+        )
+        if not is_chain_head:
+            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+            chain_id = f"edited_website_{timestamp}"
+            WebsiteHistory.record_version(chain_id, current_html, note=f"base: {original_file}",
+                                          owner=workspace.session_id)
+
+        version = WebsiteHistory.record_version(chain_id, updated_html, note=edit_instructions)
+
+        new_filename = f"{chain_id}.html"
+        new_path = workspace.path(new_filename)
         
         with open(new_path, "w", encoding="utf-8") as f:
             f.write(updated_html)
         
         log_operation("edit_website", {
-            "original_file": os.path.basename(website_path),
+            "original_file": original_file,
             "new_file": new_filename,
+            "version": version["version"],
+            "stored_size": version["stored_size"],
+            "engine": engine,
+            "local_changes": local_changes,
             "edit_instructions": edit_instructions[:100] + "..." if len(edit_instructions) > 100 else edit_instructions
         })
         
@@ -224,6 +388,10 @@ Please provide the updated HTML code with all the requested changes. Respond onl
             "success": True,
             "new_file": new_filename,
             "new_path": new_path,
+            "chain_id": chain_id,
+            "version": version["version"],
+            "engine": engine,
+            "optimization": optimization,
             "updated_html": updated_html
         }
         
@@ -232,23 +400,65 @@ Please provide the updated HTML code with all the requested changes. Respond onl
         return {"success": False, "error": str(e)}
 
 
-def generate_website_from_text_file(text_file_path: str) -> dict:
-    """Generate website using TextToCode.py with the saved text file."""
+@Tracing.traced()
+def generate_website_from_text_file(text_file_path: str, output_path: str = None, on_saved=None,
+                                    optimize: bool = True) -> dict:
+    """Generate website using TextToCode.py with the saved text file.
+
+    The app looks ideas up in the generation cache before calling this, so
+    the generator only stores its result there.
+
+    on_saved is called once the generator has written the page, or has
+    exited without writing it; serving the page may keep it running longer.
+    """
     try:
         # Run TextToCode.py with the text file
         script_path = os.path.join(os.path.dirname(__file__), "TextToCode.py")
-        cmd = [sys.executable, script_path, "--file", text_file_path]
+        cmd = [sys.executable, script_path, "--file", text_file_path, "--no-cache-lookup"]
+        if output_path:
+            # Pages written into a workspace are shown by its live preview
+            cmd += ["--output", output_path, "--no-serve"]
+        if not optimize:
+            cmd.append("--no-optimize")
         
         print(f"Running: {' '.join(cmd)}")
         
+        # The generator continues this request's trace, so its model calls are logged with it
+        env = dict(os.environ)
+        current = Tracing.current_span()
+        if current is not None:
+            env.update(TRACE_ID=current.trace_id, TRACE_PARENT_SPAN_ID=current.span_id)
+        
         # Start the process in background and return immediately
         process = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            stderr=subprocess.STDOUT,
+            text=True,
+            env=env
         )
         
+        def read_output():
+            saved = False
+            try:
+                for line in process.stdout:
+                    if line.startswith(TextToCode.TRACE_MESSAGE):
+                        try:
+                            entry = json.loads(line[len(TextToCode.TRACE_MESSAGE):])
+                            log_operation(entry["operation"], entry["details"], entry["status"])
+                        except (json.JSONDecodeError, KeyError, TypeError):
+                            pass
+                    elif on_saved and not saved and line.startswith(TextToCode.SAVED_MESSAGE):
+                        saved = True
+                        on_saved()
+                process.wait()
+            finally:
+                if on_saved and not saved:
+                    on_saved()
+        # Run in this request's context so the logged traces carry its trace id
+        threading.Thread(target=contextvars.copy_context().run, args=(read_output,),
+                         name=f"generate-{process.pid}", daemon=True).start()
+
         log_operation("generate_website", {
             "text_file": os.path.basename(text_file_path),
             "process_id": process.pid
@@ -256,7 +466,7 @@ def generate_website_from_text_file(text_file_path: str) -> dict:
         
         return {
             "success": True,
-            "message": "Website generation started! Check your browser.",
+            "message": "Website generation started! The preview updates when it is ready.",
             "process_id": process.pid
         }
         
@@ -268,44 +478,49 @@ def generate_website_from_text_file(text_file_path: str) -> dict:
         }
 
 
-def process_audio(file_path: str):
-    log_operation("audio_processing_start", {"file": os.path.basename(file_path)})
-    
-    api_key = os.getenv("ASSEMBLYAI_API_KEY")
-    if not api_key:
-        log_operation("audio_processing", {"error": "AssemblyAI API key not set"}, "error")
-        return {"error": "AssemblyAI API key is not set"}
+# Opt-in: start generating as soon as improved text is saved
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "0") == "1"
 
-    aai.settings.api_key = api_key
 
-    # Model settings - by default we take the best available.
-    config = aai.TranscriptionConfig(speech_model=aai.SpeechModel.best)
+def start_speculative_generation(text_file_path: str, workspace, client_id: str):
+    """Generate into the session's workspace ahead of /generate-website, if a generate slot is free."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return generation_jobs.start(text_file_path, workspace.path(f"generated_website_{timestamp}.html"),
+                                 owner=workspace.session_id, client_id=client_id)
 
-    try:
-        transcript = aai.Transcriber(config=config).transcribe(file_path)
-    except Exception as err:
-        log_operation("audio_processing", {"error": f"AssemblyAI request: {str(err)}"}, "error")
-        return {"error": f"AssemblyAI request error: {err}"}
 
-    if transcript.status == "error":
-        log_operation("audio_processing", {"error": f"Transcription failed: {transcript.error}"}, "error")
-        return {"error": transcript.error}
+@Tracing.traced()
+def process_audio(file_path: str, speculative: bool = False, backend: str = None, workspace=None,
+                  client_id: str = None):
+    log_operation("audio_processing_start", {"file": os.path.basename(file_path)})
+
+    try:
+        with Tracing.span("transcribe", file_size=os.path.getsize(file_path)) as span:
+            original_text, backend = Transcription.transcribe(file_path, backend)
+            span.set(backend=backend)
+    except TranscriptionError as err:
+        log_operation("audio_processing", {"error": str(err), "backend": backend or Transcription.DEFAULT_BACKEND}, "error")
+        return {"error": str(err)}
 
-    original_text = transcript.text
     print("Original dictated text:", original_text)
     
     log_operation("speech_recognition", {
+        "backend": backend,
         "text_length": len(original_text),
         "text_preview": original_text[:100] + "..." if len(original_text) > 100 else original_text
     })
 
     # Improve the text using Gemini
-    improved_text = ask_gemini(original_text)
+    improved_text, cache_hit = ask_gemini(original_text)
     print("Improved text:", improved_text)
 
     # Save only the improved text to file
     saved_file_path = save_improved_text(improved_text)
     
+    # Start generating right away; /generate-website attaches to this job
+    if speculative and saved_file_path and workspace is not None:
+        start_speculative_generation(saved_file_path, workspace, client_id)
+    
     # Delete the audio file after processing
     try:
         if os.path.exists(file_path):
@@ -316,19 +531,6 @@ def process_audio(file_path: str):
         log_operation("audio_cleanup", {"error": str(delete_err)}, "error")
         print(f"Failed to delete audio file: {delete_err}")
     
-    # Clean up old text files, keeping only the last 10
-    try:
-        files = sorted(os.listdir(IMPROVED_TEXTS_FOLDER), reverse=True)
-        for old_file in files[10:]:  # Keep last 10 files
-            old_path = os.path.join(IMPROVED_TEXTS_FOLDER, old_file)
-            if os.path.isfile(old_path):
-                os.remove(old_path)
-        if len(files) > 10:
-            log_operation("text_cleanup", {"deleted_files": len(files) - 10})
-    except Exception as cleanup_err:
-        log_operation("text_cleanup", {"error": str(cleanup_err)}, "error")
-        print(f"Failed to clean improved_texts folder: {cleanup_err}")
-
     log_operation("audio_processing_complete", {
         "original_length": len(original_text),
         "improved_length": len(improved_text),
@@ -341,6 +543,9 @@ def process_audio(file_path: str):
         "saved_file": os.path.basename(saved_file_path) if saved_file_path else "",
         "file_path": saved_file_path,
         "audio_deleted": True,
+        "speculative": bool(speculative and saved_file_path),
+        "backend": backend,
+        "cache_hit": cache_hit,
     }
 
 
@@ -371,33 +576,297 @@ def save_websites_metadata(metadata):
         return False
 
 
-def get_latest_website_file():
-    """Get the path to the most recently generated website."""
+def get_latest_website_file(workspace=None):
+    """Get the path to the current website of the requesting session."""
     try:
-        # Check DIR_TO_SAVE first (from TextToCode.py)
-        if os.path.exists("DIR_TO_SAVE"):
-            files = [f for f in os.listdir("DIR_TO_SAVE") if f.endswith('.html')]
-            if files:
-                files.sort(reverse=True)  # newest first
-                return os.path.join("DIR_TO_SAVE", files[0])
-        
-        # Check generated_websites folder
-        if os.path.exists(WEBSITES_FOLDER):
-            files = [f for f in os.listdir(WEBSITES_FOLDER) if f.endswith('.html')]
-            if files:
-                files.sort(reverse=True)
-                return os.path.join(WEBSITES_FOLDER, files[0])
-        
-        return None
-        
+        workspace = workspace or get_workspace()
+        return workspace.current_site()
     except Exception as e:
         print(f"Error finding latest website: {e}")
         return None
 
 
+SESSION_COOKIE = "session_id"
+
+workspaces = WorkspaceManager(
+    idle_timeout=float(os.getenv("WORKSPACE_IDLE_SECONDS", "7200")),
+    max_workspaces=int(os.getenv("MAX_WORKSPACES", "1000"))
+)
+
+
+def get_workspace():
+    """Return the workspace of the requesting session (X-Session-Id header or cookie).
+
+    Only ids the server issued are accepted; any other id starts a new session,
+    so made-up ids cannot push real sessions out of the workspace cache.
+    """
+    if "workspace" not in g:
+        session_id = request.headers.get("X-Session-Id") or request.cookies.get(SESSION_COOKIE)
+        workspace = workspaces.find(session_id) if is_valid_session_id(session_id) else None
+        if workspace is None:
+            session_id = new_session_id()
+            g.new_session_id = session_id
+            workspace = workspaces.get(session_id)
+        g.workspace = workspace
+    return g.workspace
+
+
+@app.after_request
+def set_session_cookie(response):
+    """Hand new sessions their id so later requests find the same workspace."""
+    if g.get("new_session_id"):
+        response.set_cookie(SESSION_COOKIE, g.new_session_id, httponly=True, samesite="Lax")
+        response.headers["X-Session-Id"] = g.new_session_id
+    return response
+
+
+preview_hub = PreviewHub()
+
+
+def preview_update(workspace, version: int = None):
+    """The session's current website as a preview update, or None when there is none."""
+    path = workspace.current_site()
+    if not path:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        html = f.read()
+    return {"version": version, "file": os.path.basename(path), "html": html}
+
+
+def publish_preview(workspace):
+    """Push the session's current website to its open preview pages."""
+    try:
+        if not preview_hub.has_subscribers(workspace.session_id):
+            preview_hub.mark_changed(workspace.session_id)
+            return
+        update = preview_update(workspace)
+        if update:
+            result = preview_hub.publish(workspace.session_id, update["html"], update["file"])
+            log_operation("preview_push", {"file": update["file"], **result})
+    except Exception as e:
+        log_operation("preview_push", {"error": str(e)}, "error")
+
+
+@app.route("/preview")
+def preview():
+    """A page that shows the session's website and reloads it whenever it changes."""
+    # Sets the session cookie when the preview is the first page a browser opens
+    get_workspace()
+    return render_template("preview.html")
+
+
+@app.route("/preview/events")
+def preview_events():
+    """Server-sent events with the requesting session's website, sent again after every change."""
+    workspace = get_workspace()
+    session_id = workspace.session_id
+    initial = preview_update(workspace, preview_hub.version(session_id))
+    stream = preview_hub.stream(session_id, initial, request.headers.get("Last-Event-ID"))
+    return Response(stream_with_context(stream), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@app.route("/preview/stats")
+def preview_stats():
+    """Open preview pages and the number of updates pushed to them."""
+    return jsonify(preview_hub.stats())
+
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Streams open for as long as a page is; they would only show up as slow traces
+LONG_LIVED_PATHS = {"/preview/events"}
+
+request_profiler = RequestProfiler()
+
+
+def is_admin() -> bool:
+    """Admin endpoints need the X-Admin-Token header to match ADMIN_TOKEN."""
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+@app.before_request
+def start_request_trace():
+    """Open the root span of this request; X-Trace-Id lets a client pick the trace id."""
+    if request.path in LONG_LIVED_PATHS:
+        return
+    trace_id = request.headers.get("X-Trace-Id")
+    g.trace_span, g.trace_token = Tracing.start_span(
+        f"{request.method} {request.path}",
+        trace_id=trace_id if Tracing.is_valid_trace_id(trace_id) else None
+    )
+    if not request.path.startswith(("/admin/", "/static/")):
+        g.profiled = request_profiler.start(f"{request.method} {request.path}")
+
+
+@app.after_request
+def add_trace_header(response):
+    if g.get("trace_span"):
+        g.trace_span.set(status_code=response.status_code)
+        response.headers["X-Trace-Id"] = g.trace_span.trace_id
+    return response
+
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    # Streamed responses (stream_with_context) run teardown a second time once
+    # the stream ends, so everything here happens only once
+    if g.pop("profiled", False):
+        request_profiler.stop()
+    span = g.pop("trace_span", None)
+    token = g.pop("trace_token", None)
+    if span is None:
+        return
+    failed = error is not None or (span.attrs.get("status_code", 200) >= 500
+                                   and not g.get("admission_rejected"))
+    if error is not None:
+        span.set(error=str(error))
+    Tracing.finish_span(span, token, "error" if failed else None)
+
+
+def _admission_limiter(name: str, concurrency: int, queue: int, timeout: float) -> AdmissionLimiter:
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionLimiter(
+        name,
+        max_concurrent=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+        max_queue=int(os.getenv(f"{prefix}_QUEUE", queue)),
+        queue_timeout=float(os.getenv(f"{prefix}_TIMEOUT", timeout))
+    )
+
+
+# Each admitted request starts paid API calls or a generator process
+ADMISSION_LIMITERS = {
+    "process": _admission_limiter("process", 4, 16, 30),
+    "generate": _admission_limiter("generate", 2, 8, 20),
+    "edit": _admission_limiter("edit", 3, 12, 30),
+}
+
+# Speculative generations take a free "generate" slot or do not start
+generation_jobs = GenerationJobs(
+    generate=Tracing.traced("speculative_generate")(TextToCode.generate_html_website_with_cache_info),
+    save=TextToCode.save_generated_website,
+    reporter=log_operation,
+    limiter=ADMISSION_LIMITERS["generate"]
+)
+
+
+def admission_client_id() -> str:
+    """Fair share is per client address; session ids are chosen by the client, so new ones cost nothing."""
+    return request.remote_addr or "unknown"
+
+
+def rejected_response(error: Rejected):
+    # Counted in the admission metrics; not worth a log entry each during a burst
+    g.admission_rejected = True
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.status_code = error.status
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def admission_controlled(name: str):
+    """Run the view only once the named limiter admits the client.
+
+    The slot is released when the view returns unless the view hands the
+    ticket (g.admission_ticket) off to work that outlives the request.
+    """
+    limiter = ADMISSION_LIMITERS[name]
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                ticket = limiter.acquire(admission_client_id())
+            except Rejected as e:
+                return rejected_response(e)
+            g.admission_ticket = ticket
+            try:
+                return view(*args, **kwargs)
+            finally:
+                if not ticket.handed_off:
+                    ticket.release()
+        return wrapper
+    return decorator
+
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    """Static URLs carry a content hash so browsers can cache them for a year."""
+    HttpCache.add_static_version(app.static_folder, endpoint, values)
+
+
+@app.after_request
+def compress_and_cache(response):
+    """Compress large responses and answer unchanged ones with 304."""
+    return HttpCache.finalize_response(response, request, static_folder=app.static_folder)
+
+
+# Housekeeping runs in the background so requests never scan folders
+RETENTION_POLICIES = [
+    RetentionPolicy(IMPROVED_TEXTS_FOLDER, "*.txt",
+                    max_files=int(os.getenv("RETENTION_TEXTS_MAX_FILES", "10"))),
+    # Orphans left behind by requests that crashed before deleting their audio
+    RetentionPolicy(UPLOAD_FOLDER,
+                    max_age_seconds=float(os.getenv("RETENTION_UPLOADS_MAX_AGE_SECONDS", str(60 * 60)))),
+    RetentionPolicy(WEBSITES_FOLDER, "*.html",
+                    max_age_seconds=float(os.getenv("RETENTION_WEBSITES_MAX_AGE_SECONDS", str(7 * 24 * 3600))),
+                    max_bytes=int(os.getenv("RETENTION_WEBSITES_MAX_BYTES", str(200 * 1024 * 1024)))),
+    RetentionPolicy(LOGS_FOLDER, "log_*.json",
+                    max_age_seconds=float(os.getenv("RETENTION_LOGS_MAX_AGE_SECONDS", str(30 * 24 * 3600)))),
+]
+
+def sync_search_index():
+    """Reconcile the search index with files added or removed outside the app."""
+    metadata = get_saved_websites_metadata()
+    result = SearchIndex.sync(IMPROVED_TEXTS_FOLDER, SAVED_WEBSITES_FOLDER, metadata.get("websites", []))
+    if result["indexed"] or result["removed"]:
+        log_operation("search_index_sync", result)
+
+
+def evict_idle_workspaces():
+    """Remove workspaces of sessions that have gone idle."""
+    result = workspaces.evict_idle()
+    if result["evicted_workspaces"]:
+        log_operation("workspace_eviction", result)
+
+
+maintenance = MaintenanceScheduler(
+    RETENTION_POLICIES,
+    interval=float(os.getenv("MAINTENANCE_INTERVAL", "300")),
+    reporter=log_operation,
+    tasks=[("search_index_sync", sync_search_index), ("workspace_eviction", evict_idle_workspaces),
+           # Rollups of a quiet server would otherwise wait for the next log entry
+           ("log_rollups_flush", log_rollups.flush)]
+)
+
+background_lock = threading.Lock()
+background_started = False
+
+
+@app.before_request
+def start_background_work():
+    """Start maintenance and the local model warm-up with the first request this process serves.
+
+    Works the same under app.run, flask run and a WSGI server; with the debug
+    reloader only the serving child gets requests, so the watcher stays idle.
+    """
+    global background_started
+    if background_started:
+        return
+    with background_lock:
+        if background_started:
+            return
+        background_started = True
+    maintenance.start()
+    threading.Thread(target=warm_local_transcription, name="local-asr-warm-up", daemon=True).start()
+
+
 @app.route("/")
 def index():
     """Return the main page."""
+    get_workspace()
     return render_template("index.html")
 
 
@@ -425,13 +894,21 @@ def list_files():
 
 @app.route("/files/<filename>")
 def get_file(filename):
-    """Return content of a specific saved text file."""
+    """Return content of a specific saved text file.
+
+    Texts pruned by retention are still served from the search index, marked as pruned.
+    """
     try:
         safe_filename = secure_filename(filename)
         file_path = os.path.join(IMPROVED_TEXTS_FOLDER, safe_filename)
         
-        if not os.path.exists(file_path) or not file_path.endswith('.txt'):
+        if not file_path.endswith('.txt'):
             return jsonify({"error": "File not found"}), 404
+        if not os.path.exists(file_path):
+            content = SearchIndex.stored_body(f"text:{safe_filename}")
+            if content is None:
+                return jsonify({"error": "File not found"}), 404
+            return jsonify({"filename": safe_filename, "content": content, "pruned": True})
             
         with open(file_path, "r", encoding="utf-8") as f:
             content = f.read()
@@ -441,12 +918,126 @@ def get_file(filename):
         return jsonify({"error": f"Failed to read file: {e}"}), 500
 
 
+@app.route("/files/<filename>", methods=["PUT"])
+def update_file(filename):
+    """Replace the content of an improved text, cancelling any generation started from it."""
+    try:
+        safe_filename = secure_filename(filename)
+        file_path = os.path.join(IMPROVED_TEXTS_FOLDER, safe_filename)
+        if not os.path.exists(file_path) or not file_path.endswith('.txt'):
+            return jsonify({"error": "File not found"}), 404
+        
+        data = request.get_json() or {}
+        content = data.get("content", "").strip()
+        if not content:
+            return jsonify({"error": "Content is required"}), 400
+        
+        cancelled = generation_jobs.cancel(safe_filename)
+        
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        SearchIndex.index_text_file(file_path)
+        
+        speculative = data.get("speculative", SPECULATIVE_GENERATION)
+        if speculative:
+            start_speculative_generation(file_path, get_workspace(), admission_client_id())
+        
+        log_operation("update_text", {
+            "filename": safe_filename,
+            "text_length": len(content),
+            "cancelled_generation": cancelled
+        })
+        
+        return jsonify({"success": True, "filename": safe_filename, "speculative": bool(speculative)})
+    except Exception as e:
+        log_operation("update_text", {"error": str(e), "filename": filename}, "error")
+        return jsonify({"error": f"Failed to update file: {e}"}), 500
+
+
+@app.route("/files/<filename>", methods=["DELETE"])
+def discard_file(filename):
+    """Discard an improved text and cancel any generation started from it."""
+    try:
+        safe_filename = secure_filename(filename)
+        file_path = os.path.join(IMPROVED_TEXTS_FOLDER, safe_filename)
+        
+        cancelled = generation_jobs.cancel(safe_filename)
+        
+        if os.path.exists(file_path) and file_path.endswith('.txt'):
+            os.remove(file_path)
+        elif not cancelled:
+            return jsonify({"error": "File not found"}), 404
+        SearchIndex.remove_document(f"text:{safe_filename}")
+        
+        log_operation("discard_text", {"filename": safe_filename, "cancelled_generation": cancelled})
+        
+        return jsonify({"success": True, "cancelled_generation": cancelled})
+    except Exception as e:
+        log_operation("discard_text", {"error": str(e), "filename": filename}, "error")
+        return jsonify({"error": f"Failed to discard file: {e}"}), 500
+
+
+@app.route("/search")
+def search():
+    """Full-text search over improved texts and saved websites."""
+    try:
+        query = request.args.get("q", "").strip()
+        if not query:
+            return jsonify({"error": "Search query is required"}), 400
+
+        kind = request.args.get("kind") or None
+        if kind not in (None, "text", "site"):
+            return jsonify({"error": "Kind must be 'text' or 'site'"}), 400
+
+        page = max(request.args.get("page", 1, type=int), 1)
+        per_page = min(max(request.args.get("per_page", 20, type=int), 1), 100)
+
+        result = SearchIndex.search(query, kind=kind, page=page, per_page=per_page)
+        for hit in result["results"]:
+            if hit["kind"] == "text":
+                # Still readable through /files/<ref>, from the index
+                hit["pruned"] = not os.path.exists(os.path.join(IMPROVED_TEXTS_FOLDER, hit["ref"]))
+        result["query"] = query
+        return jsonify(result)
+    except Exception as e:
+        log_operation("search", {"error": str(e)}, "error")
+        return jsonify({"error": f"Search failed: {str(e)}"}), 500
+
+
+@app.route("/similar-websites")
+def similar_websites():
+    """Saved websites closest to an idea, and whether generation would start from the best one."""
+    try:
+        idea = request.args.get("idea", "").strip()
+        if not idea:
+            return jsonify({"error": "Idea is required"}), 400
+        limit = min(max(request.args.get("limit", 5, type=int), 1), 20)
+
+        matches = TextToCode.site_index.similar(idea, limit=limit)
+        return jsonify({
+            "idea": idea,
+            "min_similarity": TextToCode.RETRIEVAL_MIN_SIMILARITY,
+            "seeding_enabled": TextToCode.RETRIEVAL_SEEDING,
+            "matches": [{"id": website["id"], "name": website["name"], "similarity": score,
+                         "seed": score >= TextToCode.RETRIEVAL_MIN_SIMILARITY}
+                        for website, score in matches]
+        })
+    except Exception as e:
+        log_operation("similar_websites", {"error": str(e)}, "error")
+        return jsonify({"error": f"Similarity lookup failed: {str(e)}"}), 500
+
+
 @app.route("/process", methods=["POST"])
+@admission_controlled("process")
 def process():
     """Accept audio file from client and return text improvement result."""
     if "audio" not in request.files:
         return jsonify({"error": "Audio file not found in request"}), 400
 
+    backend = request.form.get("backend") or None
+    if backend and backend not in Transcription.BACKENDS:
+        return jsonify({"error": f"Unknown transcription backend: {backend}"}), 400
+
     raw_file = request.files["audio"]
     filename = secure_filename(raw_file.filename)
     if not filename:
@@ -458,18 +1049,101 @@ def process():
 
     raw_file.save(file_path)
 
+    speculative = _parse_speculative(request.form.get("speculative"))
+
     # Process audio and improve text (audio will be deleted inside process_audio)
-    result = process_audio(file_path)
+    result = process_audio(file_path, speculative=speculative, backend=backend, workspace=get_workspace(),
+                           client_id=admission_client_id())
 
     return jsonify(result)
 
 
+chunked_uploads = ChunkedUploads(UPLOAD_FOLDER, process=process_audio, reporter=log_operation)
+
+# How long the final chunk request waits for the transcription before answering 202
+UPLOAD_RESULT_WAIT_SECONDS = 120
+
+
+def _parse_speculative(value):
+    return SPECULATIVE_GENERATION if value is None else value.lower() in ("1", "true", "yes")
+
+
+@app.route("/uploads", methods=["POST"])
+def create_upload():
+    """Start a resumable chunked upload of a recording."""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get("filename", "")) or "recording.webm"
+    upload = chunked_uploads.create(filename)
+    return jsonify(upload.to_dict()), 201
+
+
+@app.route("/uploads/<upload_id>", methods=["GET"])
+def get_upload(upload_id):
+    """Return the offset the server has, and the result once processing finished."""
+    upload = chunked_uploads.get(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(upload.to_dict())
+
+
+@app.route("/uploads/<upload_id>", methods=["PUT"])
+def append_upload(upload_id):
+    """Append the request body at ?offset=N; ?final=1 marks the last chunk and starts processing."""
+    upload = chunked_uploads.get(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+
+    try:
+        offset = int(request.args.get("offset", ""))
+    except ValueError:
+        return jsonify({"error": "offset is required"}), 400
+    final = request.args.get("final", "").lower() in ("1", "true", "yes")
+    backend = request.args.get("backend") or None
+    if backend and backend not in Transcription.BACKENDS:
+        return jsonify({"error": f"Unknown transcription backend: {backend}"}), 400
+
+    # The last chunk starts processing, which counts against the /process limit
+    ticket = None
+    if final and upload.state == "receiving":
+        try:
+            ticket = ADMISSION_LIMITERS["process"].acquire(admission_client_id())
+        except Rejected as e:
+            return rejected_response(e)
+
+    try:
+        chunked_uploads.append(upload, offset, request.stream, final=final, options={
+            "speculative": _parse_speculative(request.args.get("speculative")),
+            "backend": backend,
+            "workspace": get_workspace(),
+            "client_id": admission_client_id()
+        })
+    except UploadError as e:
+        if ticket:
+            ticket.release()
+        return jsonify({"error": str(e), "offset": e.offset}), e.status
+
+    if ticket:
+        # Processing runs in the background; the slot is freed when it finishes
+        threading.Thread(target=lambda: (upload.finished.wait(), ticket.release()),
+                         name=f"upload-slot-{upload_id}", daemon=True).start()
+
+    if not final:
+        return jsonify(upload.to_dict())
+
+    # Answer with the transcription like /process does; slow runs are polled via GET
+    upload.finished.wait(UPLOAD_RESULT_WAIT_SECONDS)
+    return jsonify(upload.to_dict()), 200 if upload.finished.is_set() else 202
+
+
 @app.route("/generate-website", methods=["POST"])
+@admission_controlled("generate")
 def generate_website():
     """Generate website from the latest saved text file."""
     try:
         data = request.get_json() or {}
         filename = data.get("filename")
+        # "optimize": false saves the generated page without HTML optimization
+        optimize = data.get("optimize", True) is not False
         
         if filename:
             # Use specific file
@@ -484,25 +1158,203 @@ def generate_website():
         
         if not os.path.exists(file_path):
             return jsonify({"error": "Text file not found"}), 404
-            
-        result = generate_website_from_text_file(file_path)
+        
+        workspace = get_workspace()
+        with open(file_path, "r", encoding="utf-8") as f:
+            idea = f.read().strip()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = workspace.path(f"generated_website_{timestamp}.html")
+
+        # Reuse a speculative job that is already running or finished
+        job = generation_jobs.attach(file_path, owner=workspace.session_id)
+        if job:
+            workspace.set_pending_job(job, idea)
+            client_id = admission_client_id()
+
+            def follow_job():
+                job.finished.wait()
+                if job.state == "cancelled":
+                    # The text was edited or discarded; a later request generates the new one
+                    return
+                if job.state == "done":
+                    publish_preview(workspace)
+                    return
+                # Generate again the usual way, into the workspace, once a generate slot is free
+                try:
+                    ticket = ADMISSION_LIMITERS["generate"].acquire(client_id)
+                except Rejected as e:
+                    log_operation("generate_website", {"text_file": os.path.basename(file_path),
+                                                       "error": str(e)}, "error")
+                    return
+
+                def generation_finished():
+                    ticket.release()
+                    publish_preview(workspace)
+
+                result = generate_website_from_text_file(file_path, output_path, optimize=optimize,
+                                                         on_saved=generation_finished)
+                if result.get("success"):
+                    workspace.set_current_site(output_path, idea)
+                else:
+                    ticket.release()
+
+            threading.Thread(target=follow_job, name=f"preview-{workspace.session_id}", daemon=True).start()
+            return jsonify({
+                "success": True,
+                "message": "Website generation started! The preview updates when it is ready.",
+                "speculative": True,
+                "job": job.to_dict(),
+                "cache_hit": job.cache_hit,
+                "preview_url": url_for("preview")
+            })
+
+        # The cache is looked up here, once per generation, so the response can carry
+        # the entry id the client needs to report a wrong match
+        cached = TextToCode.generation_cache.get(idea)
+        if cached:
+            html_code, info = cached
+            TextToCode.save_generated_website(html_code, output_path, optimize)
+            workspace.set_current_site(output_path, idea)
+            publish_preview(workspace)
+            log_operation("generate_website", {"text_file": os.path.basename(file_path),
+                                               "cache_hit": info["entry_id"], "similarity": info["similarity"]})
+            return jsonify({
+                "success": True,
+                "message": "Reused a website generated for a near-identical idea.",
+                "cache_hit": {"cache": "generate", **info},
+                "preview_url": url_for("preview")
+            })
+
+        # The generator process keeps the admission slot until the page is written
+        ticket = g.admission_ticket.hand_off()
+
+        def generation_finished():
+            ticket.release()
+            publish_preview(workspace)
+
+        result = generate_website_from_text_file(file_path, output_path, on_saved=generation_finished,
+                                                 optimize=optimize)
+        if result.get("success"):
+            workspace.set_current_site(output_path, idea)
+            result["preview_url"] = url_for("preview")
+        else:
+            ticket.release()
         return jsonify(result)
         
     except Exception as e:
         return jsonify({"error": f"Failed to generate website: {str(e)}"}), 500
 
 
+@app.route("/assets/<name>")
+def site_asset(name):
+    """Serve an image or font moved out of a generated page; names are content hashes."""
+    if not HtmlOptimizer.ASSET_NAME_RE.match(name):
+        return jsonify({"error": "Invalid asset name"}), 400
+    path = os.path.abspath(os.path.join(HtmlOptimizer.ASSETS_FOLDER, name))
+    if not os.path.exists(path):
+        return jsonify({"error": "Asset not found"}), 404
+    response = send_file(path)
+    response.headers["Cache-Control"] = f"public, max-age={HttpCache.STATIC_MAX_AGE}, immutable"
+    # Sandboxed previews and downloaded pages load fonts cross-origin
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    return response
+
+
+@app.route("/admission/stats")
+def admission_stats():
+    """Queue depth, running requests and rejection counts per limited endpoint."""
+    return jsonify({name: limiter.stats() for name, limiter in ADMISSION_LIMITERS.items()})
+
+
+@app.route("/metrics")
+def metrics():
+    """Admission metrics in the Prometheus text format."""
+    return Response(prometheus_text(list(ADMISSION_LIMITERS.values())),
+                    mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/transcription/backends")
+def transcription_backends():
+    """Which transcription backends can be used and which one is the default."""
+    return jsonify({"default": Transcription.DEFAULT_BACKEND, "backends": Transcription.available_backends()})
+
+
+@app.route("/usage")
+def get_usage():
+    """Return today's Gemini token and cost counters per operation."""
+    try:
+        return jsonify(ModelRouter.get_usage(request.args.get("day") or None))
+    except Exception as e:
+        return jsonify({"error": f"Failed to get usage: {str(e)}"}), 500
+
+
+@app.route("/cache/stats")
+def get_cache_stats():
+    """Return hit-rate and false-hit counters of the near-duplicate caches."""
+    return jsonify({
+        "cleanup": cleanup_cache.stats(),
+        "generate": TextToCode.generation_cache.stats()
+    })
+
+
+@app.route("/cache/false-hit", methods=["POST"])
+def report_cache_false_hit():
+    """Drop a cache entry that was reused for a request it did not match."""
+    data = request.get_json() or {}
+    caches = {"cleanup": cleanup_cache, "generate": TextToCode.generation_cache}
+    cache = caches.get(data.get("cache"))
+    if not cache or not data.get("entry_id"):
+        return jsonify({"error": "Cache ('cleanup' or 'generate') and entry_id are required"}), 400
+    if not cache.report_false_hit(data["entry_id"]):
+        return jsonify({"error": "Cache entry not found"}), 404
+    log_operation("cache_false_hit", {"cache": data["cache"], "entry_id": data["entry_id"]})
+    return jsonify({"success": True})
+
+
 @app.route("/logs")
 def get_logs():
-    """Return recent logs."""
+    """Return logs filtered by operation, status, trace id and time range, newest first."""
     try:
-        logs = get_recent_logs(days=7)
-        return jsonify({"logs": logs})
+        since = request.args.get("since")
+        until = request.args.get("until")
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+        try:
+            result = query_logs(
+                LOGS_FOLDER,
+                operation=request.args.get("operation") or None,
+                status=request.args.get("status") or None,
+                since=parse_time(since) if since else None,
+                until=parse_time(until) if until else None,
+                cursor=request.args.get("cursor") or None,
+                limit=limit,
+                trace_id=request.args.get("trace_id") or None
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            return jsonify({"error": f"Invalid query parameter: {str(e)}"}), 400
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": f"Failed to get logs: {str(e)}"}), 500
 
 
+@app.route("/logs/summary")
+def get_logs_summary():
+    """Return hourly counts and error rates per operation from the rollups."""
+    try:
+        since = request.args.get("since")
+        until = request.args.get("until")
+        try:
+            since = parse_time(since) if since else None
+            until = parse_time(until) if until else None
+        except ValueError as e:
+            return jsonify({"error": f"Invalid time range: {str(e)}"}), 400
+        summary = log_rollups.summary(since, until, request.args.get("operation") or None)
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({"error": f"Failed to get log summary: {str(e)}"}), 500
+
+
 @app.route("/edit-website", methods=["POST"])
+@admission_controlled("edit")
 def edit_website_endpoint():
     """Edit existing website with new instructions."""
     try:
@@ -512,70 +1364,38 @@ def edit_website_endpoint():
         
         edit_instructions = data.get("instructions", "").strip()
         website_file = data.get("website_file", "").strip()
+        # "local": false forces the edit through Gemini
+        allow_local = data.get("local", True) is not False
+        # "optimize": false stores the edited page without HTML optimization
+        optimize = data.get("optimize", True) is not False
         
         if not edit_instructions:
             return jsonify({"error": "Edit instructions are required"}), 400
         
+        workspace = get_workspace()
+
         # Find the website file to edit
         if website_file:
-            # Use specific file from generated websites
-            website_path = os.path.join(WEBSITES_FOLDER, secure_filename(website_file))
-            if not os.path.exists(website_path):
-                # Try DIR_TO_SAVE folder
-                website_path = os.path.join("DIR_TO_SAVE", secure_filename(website_file))
+            # Only files in this session's workspace; other sessions' pages are never edited
+            website_path = workspace.path(secure_filename(website_file))
         else:
-            # Use the most recent website
-            try:
-                # Check DIR_TO_SAVE first (from TextToCode.py)
-                if os.path.exists("DIR_TO_SAVE"):
-                    files = [f for f in os.listdir("DIR_TO_SAVE") if f.endswith('.html')]
-                    if files:
-                        files.sort(reverse=True)  # newest first
-                        website_path = os.path.join("DIR_TO_SAVE", files[0])
-                    else:
-                        return jsonify({"error": "No website files found to edit"}), 400
-                else:
-                    return jsonify({"error": "No website files found to edit"}), 400
-            except Exception as e:
-                return jsonify({"error": f"Error finding website files: {str(e)}"}), 400
+            # Use the website this session is working on
+            website_path = workspace.current_site()
+            if not website_path:
+                return jsonify({"error": "No website loaded in this session"}), 400
         
         if not os.path.exists(website_path):
             return jsonify({"error": "Website file not found"}), 404
         
         # Edit the website
-        result = edit_website(website_path, edit_instructions)
+        result = edit_website(website_path, edit_instructions, workspace, allow_local=allow_local,
+                              optimize=optimize)
         
         if result["success"]:
-            # Start local server with the new website
-            try:
-                script_path = os.path.join(os.path.dirname(__file__), "TextToCode.py")
-                # Create a simple launcher for the new website
-                cmd = [sys.executable, "-c", f"""
-import webbrowser
-import http.server
-import socketserver
-import threading
-import time
-import os
-
-def start_server():
-    os.chdir('{WEBSITES_FOLDER}')
-    with socketserver.TCPServer(('', 8001), http.server.SimpleHTTPRequestHandler) as httpd:
-        httpd.serve_forever()
-
-server_thread = threading.Thread(target=start_server, daemon=True)
-server_thread.start()
-time.sleep(1)
-webbrowser.open('http://localhost:8001/{result["new_file"]}')
-server_thread.join()
-                """]
-                
-                subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                
-                result["browser_url"] = f"http://localhost:8001/{result['new_file']}"
-                
-            except Exception as e:
-                print(f"Failed to start server for edited website: {e}")
+            workspace.set_current_site(result["new_path"])
+            # Open preview pages show the edit right away
+            publish_preview(workspace)
+            result["preview_url"] = url_for("preview")
         
         return jsonify(result)
         
@@ -584,6 +1404,91 @@ server_thread.join()
         return jsonify({"error": f"Failed to edit website: {str(e)}"}), 500
 
 
+def session_owns_chain(chain_id: str) -> bool:
+    """Version chains are visible only to the session that started them."""
+    return (WebsiteHistory.has_chain(chain_id)
+            and WebsiteHistory.chain_owner(chain_id) == get_workspace().session_id)
+
+
+@app.route("/website-versions")
+def list_website_chains():
+    """Return the session's edit chains with their version counts."""
+    try:
+        return jsonify({"chains": WebsiteHistory.list_chains(owner=get_workspace().session_id)})
+    except Exception as e:
+        return jsonify({"error": f"Failed to list version chains: {str(e)}"}), 500
+
+
+@app.route("/website-versions/<chain_id>")
+def list_website_versions(chain_id):
+    """Return the version list of an edit chain."""
+    try:
+        chain_id = secure_filename(chain_id)
+        if not session_owns_chain(chain_id):
+            return jsonify({"error": "Version chain not found"}), 404
+        return jsonify({"chain_id": chain_id, "versions": WebsiteHistory.list_versions(chain_id)})
+    except Exception as e:
+        return jsonify({"error": f"Failed to list versions: {str(e)}"}), 500
+
+
+@app.route("/website-versions/<chain_id>/<int:version>")
+def get_website_version(chain_id, version):
+    """Return the HTML of a specific version."""
+    try:
+        chain_id = secure_filename(chain_id)
+        if not session_owns_chain(chain_id):
+            return jsonify({"error": "Version chain not found"}), 404
+        html = WebsiteHistory.get_version(chain_id, version)
+        return jsonify({"chain_id": chain_id, "version": version, "html": html})
+    except KeyError:
+        return jsonify({"error": "Version not found"}), 404
+    except Exception as e:
+        return jsonify({"error": f"Failed to get version: {str(e)}"}), 500
+
+
+@app.route("/website-versions/<chain_id>/rollback", methods=["POST"])
+def rollback_website_version(chain_id):
+    """Make an older version the current one and update the working file."""
+    try:
+        chain_id = secure_filename(chain_id)
+        data = request.get_json() or {}
+        version = data.get("version")
+        if not isinstance(version, int):
+            return jsonify({"error": "Version number is required"}), 400
+        if not session_owns_chain(chain_id):
+            return jsonify({"error": "Version chain not found"}), 404
+
+        html, entry = WebsiteHistory.rollback(chain_id, version)
+
+        workspace = get_workspace()
+        new_filename = f"{chain_id}.html"
+        new_path = workspace.path(new_filename)
+        with open(new_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        workspace.set_current_site(new_path)
+        publish_preview(workspace)
+
+        log_operation("rollback_website", {
+            "chain_id": chain_id,
+            "restored_version": version,
+            "new_version": entry["version"]
+        })
+
+        return jsonify({
+            "success": True,
+            "chain_id": chain_id,
+            "restored_version": version,
+            "version": entry["version"],
+            "new_file": new_filename,
+            "preview_url": url_for("preview")
+        })
+    except KeyError:
+        return jsonify({"error": "Version not found"}), 404
+    except Exception as e:
+        log_operation("rollback_website", {"error": str(e), "chain_id": chain_id}, "error")
+        return jsonify({"error": f"Failed to roll back website: {str(e)}"}), 500
+
+
 @app.route("/saved-websites")
 def get_saved_websites():
     """Return list of saved websites."""
@@ -611,7 +1516,8 @@ def save_website():
             return jsonify({"error": "Website name cannot be empty"}), 400
         
         # Find the latest website file
-        latest_website = get_latest_website_file()
+        workspace = get_workspace()
+        latest_website = get_latest_website_file(workspace)
         if not latest_website or not os.path.exists(latest_website):
             return jsonify({"error": "No website found to save"}), 400
         
@@ -636,10 +1542,19 @@ def save_website():
             "created_at": datetime.utcnow().isoformat(),
             "file_path": f"{website_id}.html"
         }
+        # Kept so later generations of similar ideas can start from this site
+        idea = workspace.current_idea()
+        if idea:
+            new_website["idea"] = idea
         
         metadata["websites"].append(new_website)
         
         if save_websites_metadata(metadata):
+            try:
+                SearchIndex.index_saved_website(new_website, SAVED_WEBSITES_FOLDER)
+            except Exception as index_err:
+                print(f"Failed to index saved website: {index_err}")
+            
             log_operation("save_website", {
                 "website_id": website_id,
                 "name": website_name
@@ -659,19 +1574,6 @@ def save_website():
         return jsonify({"error": f"Failed to save website: {str(e)}"}), 500
 
 
-def find_free_port(start_port=8000, max_port=8100):
-    """Find a free port starting from start_port."""
-    import socket
-    for port in range(start_port, max_port):
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind(('', port))
-                return port
-        except OSError:
-            continue
-    return None
-
-
 @app.route("/load-website/<website_id>")
 def load_website(website_id):
     """Load a saved website."""
@@ -705,90 +1607,33 @@ def load_website(website_id):
             print(f"Website file not found: {website_file}")
             return jsonify({"error": "Website file not found"}), 404
         
-        # Copy website to DIR_TO_SAVE so it can be opened
-        if not os.path.exists("DIR_TO_SAVE"):
-            os.makedirs("DIR_TO_SAVE", exist_ok=True)
+        # Copy website into the session workspace so it can be opened and edited
+        workspace = get_workspace()
         
         # Read saved website
         with open(website_file, "r", encoding="utf-8") as f:
             website_content = f.read()
         
-        # Save to DIR_TO_SAVE with simple name  
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
         new_filename = f"current_website.html"
-        new_path = os.path.join("DIR_TO_SAVE", new_filename)
+        new_path = workspace.path(new_filename)
         
         with open(new_path, "w", encoding="utf-8") as f:
             f.write(website_content)
+        workspace.set_current_site(new_path, website.get("idea", ""))
         
         print(f"Website copied to: {new_path}")
-        
-        # Find free port
-        port = find_free_port()
-        if not port:
-            port = 8000  # fallback
-        
-        print(f"Using port: {port}")
-        
-        # Start server using TextToCode logic
-        try:
-            # Use direct webbrowser opening first
-            import webbrowser
-            file_url = f"file://{os.path.abspath(new_path)}"
-            webbrowser.open(file_url)
-            print(f"Opened file directly: {file_url}")
-            
-            # Also try to start HTTP server
-            server_script = f"""
-import http.server
-import socketserver
-import webbrowser
-import threading
-import time
-import os
-
-os.chdir(r'{os.path.abspath("DIR_TO_SAVE")}')
-
-class Handler(http.server.SimpleHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/" or self.path == "/index.html":
-            self.path = "/{new_filename}"
-        return super().do_GET()
-
-try:
-    with socketserver.TCPServer(("", {port}), Handler) as httpd:
-        print(f"HTTP Server started at http://localhost:{port}")
-        threading.Thread(target=lambda: (time.sleep(2), webbrowser.open(f"http://localhost:{port}")), daemon=True).start()
-        httpd.serve_forever()
-except Exception as e:
-    print(f"Server error: {{e}}")
-"""
-            
-            # Write and run server script
-            script_file = os.path.join("DIR_TO_SAVE", "temp_server.py")
-            with open(script_file, "w", encoding="utf-8") as f:
-                f.write(server_script)
-            
-            subprocess.Popen([sys.executable, script_file], 
-                           stdout=subprocess.PIPE, 
-                           stderr=subprocess.PIPE)
-            
-            print("HTTP server process started")
-            
-        except Exception as e:
-            print(f"Failed to start server: {e}")
+        publish_preview(workspace)
         
         log_operation("load_website", {
             "website_id": website_id,
-            "name": website["name"],
-            "port": port
+            "name": website["name"]
         })
         
         return jsonify({
             "success": True,
             "name": website["name"],
             "id": website_id,
-            "port": port,
+            "preview_url": url_for("preview"),
             "message": f"Website '{website['name']}' loaded successfully"
         })
         
@@ -832,8 +1677,12 @@ def download_website(website_id):
             "name": website["name"]
         })
         
+        # A downloaded page is opened as a file, away from the /assets/ route
+        with open(website_file, "r", encoding="utf-8") as f:
+            html = HtmlOptimizer.inline_assets(f.read())
+        
         return send_file(
-            website_file, 
+            io.BytesIO(html.encode("utf-8")), 
             as_attachment=True, 
             download_name=download_filename,
             mimetype='text/html'
@@ -844,6 +1693,105 @@ def download_website(website_id):
         return jsonify({"error": f"Failed to download website: {str(e)}"}), 500
 
 
+@app.route("/export-websites")
+def export_websites():
+    """Stream an archive of selected (?ids=a,b) or all saved websites plus their metadata."""
+    try:
+        archive_format = request.args.get("format", "zip")
+        if archive_format not in SiteArchive.ARCHIVE_FORMATS:
+            return jsonify({"error": f"Unknown archive format: {archive_format}"}), 400
+
+        websites = get_saved_websites_metadata().get("websites", [])
+        ids = [i for i in request.args.get("ids", "").split(",") if i]
+        if ids:
+            wanted = set(ids)
+            websites = [w for w in websites if w["id"] in wanted]
+            if not websites:
+                return jsonify({"error": "Website not found"}), 404
+
+        mimetype, extension = SiteArchive.ARCHIVE_FORMATS[archive_format]
+        download_filename = f"websites_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+
+        # Pages link their extracted images and fonts, which travel with them
+        assets = set()
+        for website in websites:
+            try:
+                with open(os.path.join(SAVED_WEBSITES_FOLDER, website["file_path"]), "r", encoding="utf-8") as f:
+                    assets |= HtmlOptimizer.asset_names(f.read())
+            except FileNotFoundError:
+                continue
+        asset_paths = [os.path.join(HtmlOptimizer.ASSETS_FOLDER, name) for name in sorted(assets)]
+
+        log_operation("export_websites", {
+            "count": len(websites),
+            "assets": len(asset_paths),
+            "format": archive_format
+        })
+
+        return Response(
+            stream_with_context(SiteArchive.stream_export(websites, SAVED_WEBSITES_FOLDER, archive_format,
+                                                          asset_paths)),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={download_filename}"}
+        )
+
+    except Exception as e:
+        log_operation("export_websites", {"error": str(e)}, "error")
+        return jsonify({"error": f"Failed to export websites: {str(e)}"}), 500
+
+
+@app.route("/import-websites", methods=["POST"])
+def import_websites():
+    """Import an archive made by /export-websites, either as an "archive" upload or the raw body."""
+    try:
+        # Checked before the body is read: a form upload is otherwise parsed to disk whole
+        if (request.content_length or 0) > SiteArchive.MAX_UPLOAD_BYTES:
+            raise SiteArchive.ArchiveTooLarge(f"Archive is larger than {SiteArchive.MAX_UPLOAD_BYTES} bytes")
+        upload = request.files.get("archive")
+        stream = upload.stream if upload else request.stream
+
+        metadata = get_saved_websites_metadata()
+        websites = metadata.setdefault("websites", [])
+        imported, report = SiteArchive.import_archive(stream, SAVED_WEBSITES_FOLDER, websites,
+                                                      HtmlOptimizer.ASSETS_FOLDER)
+
+        # The catalog and the search index are updated once for the whole archive
+        websites.extend(imported)
+        if not save_websites_metadata(metadata):
+            for website in imported:
+                os.remove(os.path.join(SAVED_WEBSITES_FOLDER, website["file_path"]))
+            return jsonify({"error": "Failed to save website metadata"}), 500
+
+        try:
+            SearchIndex.index_saved_websites(imported, SAVED_WEBSITES_FOLDER)
+        except Exception as index_err:
+            print(f"Failed to index imported websites: {index_err}")
+
+        log_operation("import_websites", {
+            "imported": report["imported"],
+            "duplicates": report["duplicates"],
+            "assets": report["assets"],
+            "missing_files": len(report["missing_files"])
+        })
+
+        return jsonify({
+            "success": True,
+            "websites": [{"id": w["id"], "name": w["name"]} for w in imported],
+            **report
+        })
+
+    except SiteArchive.ArchiveTooLarge as e:
+        log_operation("import_websites", {"error": str(e)}, "error")
+        return jsonify({"error": str(e)}), 413
+    except (ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+        log_operation("import_websites", {"error": str(e)}, "error")
+        return jsonify({"error": f"Invalid archive: {str(e)}"}), 400
+    except Exception as e:
+        log_operation("import_websites", {"error": str(e)}, "error")
+        return jsonify({"error": f"Failed to import websites: {str(e)}"}), 500
+
+
 @app.route("/delete-website/<website_id>", methods=["DELETE"])
 def delete_website(website_id):
     """Delete a saved website."""
@@ -874,6 +1822,11 @@ def delete_website(website_id):
         metadata["websites"] = websites
         
         if save_websites_metadata(metadata):
+            try:
+                SearchIndex.remove_document(f"site:{website_id}")
+            except Exception as index_err:
+                print(f"Failed to remove website from search index: {index_err}")
+            
             log_operation("delete_website", {
                 "website_id": website_id,
                 "name": website["name"]
@@ -891,6 +1844,38 @@ def delete_website(website_id):
         return jsonify({"error": f"Failed to delete website: {str(e)}"}), 500
 
 
+@app.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """POST {"requests": N} profiles the next N requests; GET reports progress and the top functions."""
+    if not is_admin():
+        return jsonify({"error": "Admin token required"}), 403
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        count = data.get("requests", 10)
+        if not isinstance(count, int) or not 1 <= count <= 1000:
+            return jsonify({"error": "requests must be between 1 and 1000"}), 400
+        request_profiler.arm(count)
+        log_operation("profile_start", {"requests": count})
+        return jsonify({"success": True, **request_profiler.status()})
+
+    result = request_profiler.status()
+    if result["ready"]:
+        result["top"] = request_profiler.top()
+    return jsonify(result)
+
+
+@app.route("/admin/profile/download")
+def download_profile():
+    """Download the captured profile as a pstats file (open with pstats or snakeviz)."""
+    if not is_admin():
+        return jsonify({"error": "Admin token required"}), 403
+    path = request_profiler.last_file
+    if not path or not os.path.exists(path):
+        return jsonify({"error": "No profile captured yet"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=os.path.basename(path),
+                     mimetype="application/octet-stream")
+
+
 @app.route("/debug/websites")
 def debug_websites():
     """Debug endpoint to check saved websites state."""
@@ -904,12 +1889,13 @@ def debug_websites():
                 "exists": os.path.exists(SAVED_WEBSITES_FOLDER),
                 "files": os.listdir(SAVED_WEBSITES_FOLDER) if os.path.exists(SAVED_WEBSITES_FOLDER) else []
             },
-            "DIR_TO_SAVE": {
-                "path": "DIR_TO_SAVE",
-                "exists": os.path.exists("DIR_TO_SAVE"), 
-                "files": os.listdir("DIR_TO_SAVE") if os.path.exists("DIR_TO_SAVE") else []
+            "workspace": {
+                "path": get_workspace().folder,
+                "files": os.listdir(get_workspace().folder) if os.path.exists(get_workspace().folder) else []
             }
         }
+        debug_info["session"] = get_workspace().to_dict()
+        debug_info["active_workspaces"] = workspaces.count()
         
         # Check metadata
         metadata = get_saved_websites_metadata()
@@ -928,6 +1914,17 @@ def debug_websites():
         return jsonify({"error": str(e)}), 500
 
 
+def warm_local_transcription():
+    """Load the local speech model in the background when it is the default or asked for."""
+    if Transcription.DEFAULT_BACKEND != "local" and os.getenv("LOCAL_ASR_WARM", "0") != "1":
+        return
+    try:
+        Transcription.get_backend("local").warm_up()
+        log_operation("local_asr_warm_up", {"model": Transcription.get_backend("local").model_size})
+    except TranscriptionError as e:
+        log_operation("local_asr_warm_up", {"error": str(e)}, "error")
+
+
 if __name__ == "__main__":
     # debug=True should not be used in production
     app.run(debug=True)
@@ -0,0 +1,178 @@
+import os
+import json
+import difflib
+import threading
+from datetime import datetime
+
+HISTORY_FOLDER = "website_history"
+# Every N-th version is stored in full so rebuilding never replays more than N-1 deltas
+CHECKPOINT_INTERVAL = 10
+
+_lock = threading.Lock()
+
+
+def _chain_dir(chain_id: str) -> str:
+    return os.path.join(HISTORY_FOLDER, chain_id)
+
+
+def _load_index(chain_id: str) -> dict:
+    index_path = os.path.join(_chain_dir(chain_id), "index.json")
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            pass
+    return {"chain_id": chain_id, "versions": []}
+
+
+def _save_index(chain_id: str, index: dict):
+    index_path = os.path.join(_chain_dir(chain_id), "index.json")
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+
+def _make_delta(old_html: str, new_html: str) -> list:
+    """Line-based delta: ["=", start, end] copies old lines, ["+", [lines]] inserts new ones."""
+    old_lines = old_html.splitlines(keepends=True)
+    new_lines = new_html.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif j2 > j1:
+            # "replace" and "insert" both only need the new lines
+            ops.append(["+", new_lines[j1:j2]])
+    return ops
+
+
+def _apply_delta(old_html: str, ops: list) -> str:
+    old_lines = old_html.splitlines(keepends=True)
+    out = []
+    for op in ops:
+        if op[0] == "=":
+            out.extend(old_lines[op[1]:op[2]])
+        else:
+            out.extend(op[1])
+    return "".join(out)
+
+
+def _read_version_file(chain_id: str, entry: dict):
+    with open(os.path.join(_chain_dir(chain_id), entry["file"]), "r", encoding="utf-8") as f:
+        if entry["kind"] == "full":
+            return f.read()
+        return json.load(f)
+
+
+def _rebuild(chain_id: str, index: dict, version: int) -> str:
+    versions = index["versions"]
+    if version < 0 or version >= len(versions):
+        raise KeyError(f"Version {version} not found in chain {chain_id}")
+
+    # Walk back to the nearest full snapshot, then replay deltas forward
+    start = version
+    while versions[start]["kind"] != "full":
+        start -= 1
+
+    html = _read_version_file(chain_id, versions[start])
+    for entry in versions[start + 1:version + 1]:
+        html = _apply_delta(html, _read_version_file(chain_id, entry))
+    return html
+
+
+def has_chain(chain_id: str) -> bool:
+    """Check whether a version chain exists."""
+    return os.path.exists(os.path.join(_chain_dir(chain_id), "index.json"))
+
+
+def chain_owner(chain_id: str):
+    """Return the session id that started the chain, or None for chains without one."""
+    with _lock:
+        return _load_index(chain_id).get("owner")
+
+
+def record_version(chain_id: str, html: str, note: str = "", owner: str = None) -> dict:
+    """Append a new version of the page to the chain and return its entry.
+
+    owner (a session id) is stored when the chain is started.
+    """
+    with _lock:
+        os.makedirs(_chain_dir(chain_id), exist_ok=True)
+        index = _load_index(chain_id)
+        versions = index["versions"]
+        number = len(versions)
+        if not number and owner:
+            index["owner"] = owner
+
+        if number % CHECKPOINT_INTERVAL == 0:
+            kind, filename = "full", f"v{number:05d}.html"
+            payload = html
+        else:
+            previous = _rebuild(chain_id, index, number - 1)
+            kind, filename = "delta", f"v{number:05d}.delta.json"
+            payload = json.dumps(_make_delta(previous, html), ensure_ascii=False)
+
+        with open(os.path.join(_chain_dir(chain_id), filename), "w", encoding="utf-8") as f:
+            f.write(payload)
+
+        entry = {
+            "version": number,
+            "kind": kind,
+            "file": filename,
+            "created_at": datetime.utcnow().isoformat(),
+            "html_size": len(html),
+            "stored_size": len(payload),
+            "note": note[:100]
+        }
+        versions.append(entry)
+        _save_index(chain_id, index)
+        return entry
+
+
+def list_versions(chain_id: str) -> list:
+    """Return version entries of a chain, oldest first."""
+    with _lock:
+        return _load_index(chain_id)["versions"]
+
+
+def list_chains(owner: str = None) -> list:
+    """Return a short summary of every stored chain, or of those owner started."""
+    chains = []
+    if not os.path.exists(HISTORY_FOLDER):
+        return chains
+    with _lock:
+        for chain_id in sorted(os.listdir(HISTORY_FOLDER)):
+            index = _load_index(chain_id)
+            versions = index["versions"]
+            if not versions or (owner and index.get("owner") != owner):
+                continue
+            chains.append({
+                "chain_id": chain_id,
+                "versions": len(versions),
+                "updated_at": versions[-1]["created_at"],
+                "stored_bytes": sum(v["stored_size"] for v in versions)
+            })
+    return chains
+
+
+def get_version(chain_id: str, version: int) -> str:
+    """Rebuild the HTML of a specific version."""
+    with _lock:
+        return _rebuild(chain_id, _load_index(chain_id), version)
+
+
+def get_latest(chain_id: str) -> str:
+    """Rebuild the HTML of the newest version."""
+    with _lock:
+        index = _load_index(chain_id)
+        return _rebuild(chain_id, index, len(index["versions"]) - 1)
+
+
+def rollback(chain_id: str, version: int) -> tuple:
+    """Re-append an older version as the newest one so history is never rewritten."""
+    html = get_version(chain_id, version)
+    entry = record_version(chain_id, html, note=f"rollback to v{version}")
+    return html, entry
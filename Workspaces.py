@@ -0,0 +1,182 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import threading
+from collections import OrderedDict
+
+WORKSPACES_FOLDER = "workspaces"
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def is_valid_session_id(session_id: str) -> bool:
+    return bool(session_id) and bool(SESSION_ID_RE.match(session_id))
+
+
+class Workspace:
+    """Working files and the current-site pointer of one editing session."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.folder = os.path.join(WORKSPACES_FOLDER, session_id)
+        self.last_active = time.time()
+        self.lock = threading.Lock()
+        self._current_site = None
+        self._current_idea = ""  # the dictated idea the current site was generated from
+        self._pending_job = None  # speculative generation whose file is not written yet
+        os.makedirs(self.folder, exist_ok=True)
+        self._load()
+
+    def _state_path(self) -> str:
+        return os.path.join(self.folder, "workspace.json")
+
+    def _load(self):
+        if os.path.exists(self._state_path()):
+            try:
+                with open(self._state_path(), "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                self._current_site = state.get("current_site")
+                self._current_idea = state.get("current_idea", "")
+            except (json.JSONDecodeError, FileNotFoundError):
+                pass
+
+    def _save(self):
+        with open(self._state_path(), "w", encoding="utf-8") as f:
+            json.dump({"session_id": self.session_id, "current_site": self._current_site,
+                       "current_idea": self._current_idea}, f)
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def path(self, filename: str) -> str:
+        """Path of a working file inside this workspace."""
+        return os.path.join(self.folder, filename)
+
+    def set_current_site(self, path: str, idea: str = None):
+        """Point the session at the website it is working on.
+
+        idea replaces the idea the site came from; edits and rollbacks leave it as it is.
+        """
+        with self.lock:
+            self._current_site = path
+            if idea is not None:
+                self._current_idea = idea
+            self._pending_job = None
+            self._save()
+
+    def set_pending_job(self, job, idea: str = ""):
+        """Point the session at a generation job; its file becomes current once written."""
+        with self.lock:
+            self._pending_job = job
+            self._current_site = None
+            self._current_idea = idea
+            self._save()
+
+    def current_site(self):
+        """Return the path of the session's current website, or None."""
+        with self.lock:
+            job = self._pending_job
+            if job is not None and job.html_path:
+                self._current_site = job.html_path
+                self._pending_job = None
+                self._save()
+            if self._current_site and os.path.exists(self._current_site):
+                return self._current_site
+            return None
+
+    def current_idea(self) -> str:
+        """The idea behind the current website, stored with it when the site is saved."""
+        with self.lock:
+            return self._current_idea
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "current_site": self.current_site(),
+            "pending_generation": self._pending_job is not None,
+            "idle_seconds": round(time.time() - self.last_active, 1)
+        }
+
+
+class WorkspaceManager:
+    """O(1) lookup of workspaces by session id with LRU and idle eviction."""
+
+    def __init__(self, idle_timeout: float = 2 * 3600, max_workspaces: int = 1000):
+        self.idle_timeout = idle_timeout
+        self.max_workspaces = max_workspaces
+        self._workspaces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Workspace:
+        """Return the session's workspace, creating it on first use."""
+        with self._lock:
+            workspace = self._workspaces.get(session_id)
+            if workspace is None:
+                workspace = Workspace(session_id)
+                self._workspaces[session_id] = workspace
+                evicted = self._evict_over_capacity()
+            else:
+                self._workspaces.move_to_end(session_id)
+                evicted = []
+        workspace.touch()
+        for old in evicted:
+            shutil.rmtree(old.folder, ignore_errors=True)
+        return workspace
+
+    def find(self, session_id: str):
+        """Return the workspace of a session the server issued, or None; never creates one."""
+        with self._lock:
+            workspace = self._workspaces.get(session_id)
+            if workspace is not None:
+                self._workspaces.move_to_end(session_id)
+                evicted = []
+            elif os.path.isdir(os.path.join(WORKSPACES_FOLDER, session_id)):
+                # Issued before a restart
+                workspace = Workspace(session_id)
+                self._workspaces[session_id] = workspace
+                evicted = self._evict_over_capacity()
+            else:
+                return None
+        workspace.touch()
+        for old in evicted:
+            shutil.rmtree(old.folder, ignore_errors=True)
+        return workspace
+
+    def _evict_over_capacity(self) -> list:
+        evicted = []
+        while len(self._workspaces) > self.max_workspaces:
+            _, old = self._workspaces.popitem(last=False)
+            evicted.append(old)
+        return evicted
+
+    def evict_idle(self) -> dict:
+        """Drop workspaces idle longer than the timeout, including folders left from earlier runs."""
+        now = time.time()
+        with self._lock:
+            idle = [sid for sid, ws in self._workspaces.items() if now - ws.last_active > self.idle_timeout]
+            evicted = [self._workspaces.pop(sid) for sid in idle]
+            active = set(self._workspaces)
+
+        reclaimed = 0
+        for workspace in evicted:
+            shutil.rmtree(workspace.folder, ignore_errors=True)
+            reclaimed += 1
+
+        if os.path.isdir(WORKSPACES_FOLDER):
+            with os.scandir(WORKSPACES_FOLDER) as it:
+                for entry in it:
+                    if entry.is_dir() and entry.name not in active and now - entry.stat().st_mtime > self.idle_timeout:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                        reclaimed += 1
+
+        return {"evicted_workspaces": reclaimed, "active_workspaces": len(active)}
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._workspaces)
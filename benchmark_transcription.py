@@ -0,0 +1,109 @@
+"""Compare transcription latency of the remote and local backends on sample clips.
+
+Usage:
+    python benchmark_transcription.py [clip ...] [--backends assemblyai,local] [--runs 3]
+
+Clips default to everything in samples/, which ships with bursts_3s.wav: three
+seconds of synthetic voiced bursts, enough to time model load, queueing and
+decoding without a network. It has no words, so use real recordings (drop them
+into samples/ or pass them as arguments) to compare transcript quality.
+"""
+import os
+import sys
+import glob
+import time
+import statistics
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import Transcription
+
+SAMPLES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".webm", ".flac")
+
+
+def sample_clips() -> list:
+    return sorted(p for p in glob.glob(os.path.join(SAMPLES_FOLDER, "*")) if p.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def clip_seconds(path: str):
+    """Audio length in seconds, for WAV files or when the local backend's decoder is installed."""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as f:
+            return f.getnframes() / f.getframerate()
+    try:
+        from faster_whisper import decode_audio
+    except ImportError:
+        return None
+    return len(decode_audio(path)) / 16000
+
+
+def timed(backend, path: str) -> tuple:
+    started = time.perf_counter()
+    text = backend.transcribe(path)
+    return time.perf_counter() - started, text
+
+
+def run(clips: list, backend_names: list, runs: int):
+    durations = {clip: clip_seconds(clip) for clip in clips}
+    print(f"{'backend':<11} {'clip':<28} {'audio s':>8} {'first s':>8} {'median s':>9} {'min s':>7} {'RTF':>6}")
+
+    for name in backend_names:
+        backend = Transcription.get_backend(name)
+        if not backend.is_available():
+            print(f"{name:<11} skipped (not configured or not installed)")
+            continue
+
+        if name == "local":
+            # Model loading is reported once and kept out of the per-clip numbers
+            started = time.perf_counter()
+            backend.warm_up()
+            print(f"{name:<11} model load {time.perf_counter() - started:.2f}s")
+
+        for clip in clips:
+            try:
+                first, text = timed(backend, clip)
+                times = [first] + [timed(backend, clip)[0] for _ in range(runs - 1)]
+            except Transcription.TranscriptionError as e:
+                print(f"{name:<11} {os.path.basename(clip):<28} error: {e}")
+                continue
+            median = statistics.median(times)
+            audio = durations[clip]
+            rtf = f"{median / audio:.2f}" if audio else "-"
+            audio_text = f"{audio:.1f}" if audio else "-"
+            print(f"{name:<11} {os.path.basename(clip)[:28]:<28} {audio_text:>8} {first:>8.2f} "
+                  f"{median:>9.2f} {min(times):>7.2f} {rtf:>6}")
+            print(f"{'':<11} {text[:90]!r}")
+
+        if len(clips) > 1:
+            # All clips at once, as when several dictations arrive together
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=len(clips)) as pool:
+                list(pool.map(backend.transcribe, clips))
+            print(f"{name:<11} {len(clips)} clips concurrently: {time.perf_counter() - started:.2f}s")
+
+
+def main():
+    args = sys.argv[1:]
+    backend_names = list(Transcription.BACKENDS)
+    runs = 3
+    if "--backends" in args:
+        i = args.index("--backends")
+        backend_names = [b for b in args[i + 1].split(",") if b]
+        del args[i:i + 2]
+    if "--runs" in args:
+        i = args.index("--runs")
+        runs = max(1, int(args[i + 1]))
+        del args[i:i + 2]
+
+    clips = args or sample_clips()
+    if not clips:
+        sys.exit(f"No audio clips given and none found in {SAMPLES_FOLDER}")
+    run(clips, backend_names, runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,18 @@ let mediaRecorder = null;
 let audioChunks = [];
 let lastSavedFile = null;
 let currentWebsiteId = null;
+let currentUpload = null;
+
+// Recording settings: mono low-bitrate Opus keeps speech clear and uploads small
+const AUDIO_MIME_TYPES = ['audio/webm;codecs=opus', 'audio/ogg;codecs=opus'];
+const AUDIO_BITS_PER_SECOND = 24000;
+// Chunks are uploaded while the user is still speaking
+const UPLOAD_TIMESLICE_MS = 3000;
+const UPLOAD_RETRY_DELAYS_MS = [500, 1000, 2000, 4000, 8000, 15000];
+const UPLOAD_POLL_MS = 2000;
+// Busy answers (429/503) are retried after the server's Retry-After
+const BUSY_RETRIES = 3;
+const MAX_RETRY_AFTER_S = 30;
 
 // DOM elements
 const mainBtn = document.getElementById('main-btn');
@@ -84,18 +96,24 @@ mainBtn.addEventListener('click', async () => {
 // Recording functions
 async function startRecording() {
     try {
-        const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-        mediaRecorder = new MediaRecorder(stream);
+        const stream = await navigator.mediaDevices.getUserMedia({
+            audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true }
+        });
+        mediaRecorder = createRecorder(stream);
         audioChunks = [];
+        currentUpload = await startUpload(recordingFilename(mediaRecorder.mimeType));
 
         mediaRecorder.addEventListener('dataavailable', (event) => {
             if (event.data.size > 0) {
                 audioChunks.push(event.data);
+                if (currentUpload) {
+                    queueUpload(currentUpload, false);
+                }
             }
         });
 
         mediaRecorder.addEventListener('stop', async () => {
-            const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
+            const audioBlob = new Blob(audioChunks, { type: mediaRecorder.mimeType || 'audio/webm' });
             
             if (currentState === STATES.EDIT) {
                 await processEditAudio(audioBlob);
@@ -104,7 +122,7 @@ async function startRecording() {
             }
         });
 
-        mediaRecorder.start();
+        mediaRecorder.start(UPLOAD_TIMESLICE_MS);
         setState(STATES.STOP);
         
     } catch (err) {
@@ -130,24 +148,177 @@ async function startEditRecording() {
     }, 100);
 }
 
-// Audio processing functions
-async function processNewAudio(audioBlob) {
-    try {
-        statusEl.textContent = '⏳ Processing and improving your text...';
-        
-        const formData = new FormData();
-        formData.append('audio', audioBlob, 'recording.webm');
+function createRecorder(stream) {
+    const options = { audioBitsPerSecond: AUDIO_BITS_PER_SECOND };
+    const mimeType = AUDIO_MIME_TYPES.find(type => MediaRecorder.isTypeSupported(type));
+    if (mimeType) {
+        options.mimeType = mimeType;
+    }
+    return new MediaRecorder(stream, options);
+}
+
+function recordingFilename(mimeType) {
+    return (mimeType || '').startsWith('audio/ogg') ? 'recording.ogg' : 'recording.webm';
+}
 
-        const response = await fetch('/process', {
+// Resumable upload: timesliced chunks are PUT at the byte offset the server has.
+// The server answers 409 with its own offset when they disagree, and the
+// client resends from there, so a dropped connection never loses the recording.
+async function startUpload(filename) {
+    try {
+        const response = await fetch('/uploads', {
             method: 'POST',
-            body: formData,
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ filename }),
         });
+        if (!response.ok) {
+            return null;
+        }
+        const data = await response.json();
+        return { id: data.upload_id, offset: data.offset, queue: Promise.resolve() };
+    } catch (err) {
+        console.warn('Chunked upload unavailable, recording will be sent at the end:', err);
+        return null;
+    }
+}
+
+function queueUpload(upload, final, fields = {}) {
+    // Sends run one after another so chunks always arrive in order
+    const send = upload.queue.catch(() => null).then(() => sendPending(upload, final, fields));
+    upload.queue = send;
+    return send;
+}
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
 
+function retryAfterMs(response) {
+    const seconds = parseInt(response.headers.get('Retry-After'), 10);
+    return Math.min(Number.isNaN(seconds) ? 1 : seconds, MAX_RETRY_AFTER_S) * 1000;
+}
+
+// fetch() that waits and retries while the server is over capacity
+async function fetchWithBackpressure(url, options) {
+    for (let attempt = 0; ; attempt++) {
+        const response = await fetch(url, options);
+        if ((response.status !== 429 && response.status !== 503) || attempt >= BUSY_RETRIES) {
+            return response;
+        }
+        const delay = retryAfterMs(response);
+        statusEl.textContent = `⏳ Server is busy, retrying in ${Math.round(delay / 1000)}s...`;
+        await sleep(delay);
+    }
+}
+
+async function sendPending(upload, final, fields) {
+    let attempt = 0;
+    while (true) {
+        const pending = new Blob(audioChunks).slice(upload.offset);
+        if (pending.size === 0 && !final) {
+            return null;
+        }
+
+        const params = new URLSearchParams({ offset: upload.offset, ...fields });
+        if (final) {
+            params.set('final', '1');
+        }
+
+        let response;
+        let data;
+        try {
+            response = await fetch(`/uploads/${upload.id}?${params}`, {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/octet-stream',
+                },
+                body: pending,
+            });
+            data = await response.json();
+        } catch (err) {
+            // Network failure: wait and resend whatever the server does not have yet
+            if (attempt >= UPLOAD_RETRY_DELAYS_MS.length) {
+                throw err;
+            }
+            await sleep(UPLOAD_RETRY_DELAYS_MS[attempt++]);
+            continue;
+        }
+
+        if (response.status === 409 && data.offset !== null && data.offset !== undefined) {
+            upload.offset = data.offset;
+            continue;
+        }
+        if ((response.status === 429 || response.status === 503) && attempt < UPLOAD_RETRY_DELAYS_MS.length) {
+            attempt++;
+            await sleep(retryAfterMs(response));
+            continue;
+        }
+        if (response.status >= 500 && attempt < UPLOAD_RETRY_DELAYS_MS.length) {
+            await sleep(UPLOAD_RETRY_DELAYS_MS[attempt++]);
+            continue;
+        }
         if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+            throw new Error(data.error || `HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
+        upload.offset = data.offset;
+        return final ? waitForUploadResult(upload, data) : null;
+    }
+}
+
+async function waitForUploadResult(upload, data) {
+    // Long recordings may still be transcribing when the last chunk is answered
+    while (data.state === 'processing') {
+        await sleep(UPLOAD_POLL_MS);
+        try {
+            const response = await fetch(`/uploads/${upload.id}`);
+            data = await response.json();
+        } catch (err) {
+            console.warn('Polling upload status failed, retrying:', err);
+        }
+    }
+    if (data.state === 'failed') {
+        throw new Error(data.error || 'Processing failed');
+    }
+    return data.result;
+}
+
+// Finishes the chunked upload, or falls back to sending the whole recording
+async function submitRecording(audioBlob, fields = {}) {
+    const upload = currentUpload;
+    currentUpload = null;
+    if (upload) {
+        try {
+            return await queueUpload(upload, true, fields);
+        } catch (err) {
+            console.warn('Chunked upload failed, sending the whole recording:', err);
+        }
+    }
+
+    const formData = new FormData();
+    formData.append('audio', audioBlob, recordingFilename(audioBlob.type));
+    Object.entries(fields).forEach(([key, value]) => formData.append(key, value));
+
+    const response = await fetchWithBackpressure('/process', {
+        method: 'POST',
+        body: formData,
+    });
+
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return response.json();
+}
+
+// Audio processing functions
+async function processNewAudio(audioBlob) {
+    try {
+        statusEl.textContent = '⏳ Processing and improving your text...';
+        
+        const data = await submitRecording(audioBlob);
 
         if (data.error) {
             throw new Error(data.error);
@@ -170,19 +341,8 @@ async function processEditAudio(audioBlob) {
     try {
         statusEl.textContent = '⏳ Processing edit instructions...';
         
-        const formData = new FormData();
-        formData.append('audio', audioBlob, 'recording.webm');
-
-        const response = await fetch('/process', {
-            method: 'POST',
-            body: formData,
-        });
-
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-
-        const data = await response.json();
+        // Edit instructions must never start a speculative website generation
+        const data = await submitRecording(audioBlob, { speculative: 'false' });
 
         if (data.error) {
             throw new Error(data.error);
@@ -200,9 +360,24 @@ async function processEditAudio(audioBlob) {
     }
 }
 
+// Sites are shown in one named preview tab that updates itself after every change
+const PREVIEW_WINDOW = 'site-preview';
+let previewWindow = null;
+
+function openPreview(url) {
+    if (!url || (previewWindow && !previewWindow.closed)) {
+        return;
+    }
+    previewWindow = window.open(url, PREVIEW_WINDOW);
+}
+
+function previewLink(url) {
+    return url ? `<a href="${url}" target="${PREVIEW_WINDOW}">Open the live preview</a>` : '';
+}
+
 async function generateWebsite() {
     try {
-        const response = await fetch('/generate-website', {
+        const response = await fetchWithBackpressure('/generate-website', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -216,11 +391,22 @@ async function generateWebsite() {
 
         if (data.success) {
             setState(STATES.EDIT);
-            statusEl.innerHTML = `
-🎉 Website generated successfully!<br>
-🌐 Check your browser - the website should open automatically<br><br>
+            openPreview(data.preview_url);
+            statusEl.innerHTML = data.cache_hit ? `
+♻️ Reused a website made for a near-identical idea.<br>
+🌐 ${previewLink(data.preview_url)} <a href="#" id="false-hit-link">Not what I asked for? Generate a new one</a><br><br>
+✏️ You can now edit the website or save it!
+            ` : `
+🎉 Website generation started!<br>
+🌐 The live preview shows it as soon as it is ready. ${previewLink(data.preview_url)}<br><br>
 ✏️ You can now edit the website or save it!
             `;
+            if (data.cache_hit) {
+                document.getElementById('false-hit-link').addEventListener('click', (event) => {
+                    event.preventDefault();
+                    reportFalseHit(data.cache_hit);
+                });
+            }
         } else {
             throw new Error(data.error || 'Failed to generate website');
         }
@@ -232,9 +418,29 @@ async function generateWebsite() {
     }
 }
 
+// Drops the reused entry from the cache, so generating again asks the model
+async function reportFalseHit(cacheHit) {
+    statusEl.textContent = '⏳ Generating a new website...';
+    try {
+        await fetch('/cache/false-hit', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                cache: cacheHit.cache,
+                entry_id: cacheHit.entry_id
+            }),
+        });
+    } catch (err) {
+        console.warn('Could not report the cache entry:', err);
+    }
+    await generateWebsite();
+}
+
 async function editWebsite(instructions) {
     try {
-        const response = await fetch('/edit-website', {
+        const response = await fetchWithBackpressure('/edit-website', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -248,9 +454,10 @@ async function editWebsite(instructions) {
 
         if (data.success) {
             setState(STATES.EDIT);
+            openPreview(data.preview_url);
             statusEl.innerHTML = `
 ✅ Website updated successfully!<br>
-🌐 Check your browser for the updated website<br><br>
+🌐 The live preview already shows the change. ${previewLink(data.preview_url)}<br><br>
 ✏️ You can continue editing or save your changes!
             `;
         } else {
@@ -386,9 +593,10 @@ async function loadWebsite(websiteId) {
         if (data.success) {
             currentWebsiteId = websiteId;
             setState(STATES.EDIT);
+            openPreview(data.preview_url);
             statusEl.innerHTML = `
 🎉 Website "${data.name}" loaded successfully!<br>
-🌐 Check your browser - it should open automatically<br><br>
+🌐 It is shown in the live preview. ${previewLink(data.preview_url)}<br><br>
 ✏️ You can now edit this website!
             `;
             console.log(`Website ${data.name} loaded successfully`);
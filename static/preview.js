@@ -0,0 +1,55 @@
+// Live preview: the server pushes the session's website after every generate, edit or load
+const frame = document.getElementById('preview-frame');
+const emptyEl = document.getElementById('preview-empty');
+const statusEl = document.getElementById('preview-status');
+const dotEl = document.getElementById('preview-dot');
+
+let shownVersion = null;
+let scrollPosition = [0, 0];
+
+// The sandboxed page cannot be read from here, so it reports its scroll position itself
+// and gets it back after each update
+function withScrollKeeper(html) {
+    const [x, y] = scrollPosition;
+    const script = `<script>
+addEventListener('load', () => scrollTo(${x}, ${y}));
+addEventListener('scroll', () => parent.postMessage({ previewScroll: [scrollX, scrollY] }, '*'), { passive: true });
+<\/script>`;
+    const bodyEnd = html.toLowerCase().lastIndexOf('</body>');
+    return bodyEnd === -1 ? html + script : html.slice(0, bodyEnd) + script + html.slice(bodyEnd);
+}
+
+function showUpdate(update) {
+    if (update.version !== null && update.version === shownVersion) {
+        return;
+    }
+    shownVersion = update.version;
+    frame.srcdoc = withScrollKeeper(update.html);
+    frame.hidden = false;
+    emptyEl.hidden = true;
+    statusEl.textContent = `${update.file} · updated ${new Date().toLocaleTimeString()}`;
+}
+
+window.addEventListener('message', (event) => {
+    if (event.source === frame.contentWindow && event.data && Array.isArray(event.data.previewScroll)) {
+        scrollPosition = event.data.previewScroll;
+    }
+});
+
+// The session comes from the cookie; a preview only ever shows its own session
+const events = new EventSource('/preview/events');
+
+events.addEventListener('update', (event) => showUpdate(JSON.parse(event.data)));
+
+events.addEventListener('open', () => {
+    dotEl.classList.add('live');
+    if (shownVersion === null) {
+        statusEl.textContent = 'Live - waiting for a website';
+    }
+});
+
+// EventSource reconnects by itself and resumes from the last version it showed
+events.addEventListener('error', () => {
+    dotEl.classList.remove('live');
+    statusEl.textContent = 'Reconnecting...';
+});
@@ -1,17 +1,22 @@
-# Install the assemblyai package by executing the command "pip install assemblyai"
+# Transcribe one file with a chosen backend:
+#   python test.py [audio_file] [assemblyai|local]
+# The remote backend needs ASSEMBLYAI_API_KEY; the local one needs "pip install faster-whisper"
 
-import assemblyai as aai
+import sys
 
-aai.settings.api_key = "ASSEMBLYAI_API_KEY"
+from dotenv import load_dotenv
+load_dotenv()
 
-# audio_file = "./local_file.mp3"
-audio_file = "https://assembly.ai/wildfires.mp3"
-
-config = aai.TranscriptionConfig(speech_model=aai.SpeechModel.best)
+import Transcription
 
-transcript = aai.Transcriber(config=config).transcribe(audio_file)
+# audio_file = "./local_file.mp3"
+audio_file = sys.argv[1] if len(sys.argv) > 1 else "https://assembly.ai/wildfires.mp3"
+backend = sys.argv[2] if len(sys.argv) > 2 else None
 
-if transcript.status == "error":
-  raise RuntimeError(f"Transcription failed: {transcript.error}")
+try:
+    text, used_backend = Transcription.transcribe(audio_file, backend)
+except Transcription.TranscriptionError as e:
+    raise RuntimeError(f"Transcription failed: {e}")
 
-print(transcript.text)
\ No newline at end of file
+print(f"[{used_backend}]")
+print(text)
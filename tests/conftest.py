@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    """VoiceToText running in an empty folder; the app keeps its folders relative to the working directory."""
+    monkeypatch.chdir(tmp_path)
+    import VoiceToText
+    # No maintenance thread or model warm-up behind the tests' back
+    monkeypatch.setattr(VoiceToText, "background_started", True)
+    # The index was created in the folder of whichever test imported the app first
+    monkeypatch.setattr(VoiceToText.SearchIndex, "SEARCH_DB", str(tmp_path / "search_index.db"))
+    VoiceToText.SearchIndex.init_index()
+    for folder in (VoiceToText.UPLOAD_FOLDER, VoiceToText.IMPROVED_TEXTS_FOLDER, VoiceToText.WEBSITES_FOLDER,
+                   VoiceToText.SAVED_WEBSITES_FOLDER, VoiceToText.WebsiteHistory.HISTORY_FOLDER):
+        os.makedirs(folder, exist_ok=True)
+    return VoiceToText
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from AdmissionControl import AdmissionLimiter, Rejected
+
+
+def _wait_for_queue(limiter, depth):
+    deadline = time.monotonic() + 5
+    while limiter.stats()["queue_depth"] < depth:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_free_slots_go_to_whoever_asks():
+    limiter = AdmissionLimiter("test", max_concurrent=2, max_queue=4, queue_timeout=1)
+    tickets = [limiter.acquire("a"), limiter.acquire("a")]
+    assert limiter.stats()["active"] == 2
+    for ticket in tickets:
+        ticket.release()
+        ticket.release()  # idempotent
+    assert limiter.stats()["active"] == 0
+
+
+def test_client_over_its_queue_share_gets_429_and_full_queue_503():
+    limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=3, queue_timeout=5, max_queued_per_client=1)
+    running = limiter.acquire("a")
+    waiter = threading.Thread(target=lambda: limiter.acquire("a").release())
+    waiter.start()
+    _wait_for_queue(limiter, 1)
+
+    with pytest.raises(Rejected) as client_error:
+        limiter.acquire("a")
+    assert client_error.value.status == 429 and client_error.value.retry_after >= 1
+
+    others = [threading.Thread(target=lambda c=c: limiter.acquire(c).release()) for c in ("b", "c")]
+    for thread in others:
+        thread.start()
+    _wait_for_queue(limiter, 3)
+    with pytest.raises(Rejected) as full_error:
+        limiter.acquire("d")
+    assert full_error.value.status == 503
+
+    running.release()
+    for thread in [waiter] + others:
+        thread.join()
+    assert limiter.stats()["active"] == 0
+
+
+def test_waiting_clients_are_served_fewest_slots_first():
+    limiter = AdmissionLimiter("test", max_concurrent=2, max_queue=4, queue_timeout=5)
+    busy = [limiter.acquire("busy"), limiter.acquire("busy")]
+    order = []
+
+    def wait(client_id):
+        ticket = limiter.acquire(client_id)
+        order.append(client_id)
+        return ticket
+
+    tickets = {}
+    threads = []
+    for client_id in ("busy", "quiet"):
+        thread = threading.Thread(target=lambda c=client_id: tickets.setdefault(c, wait(c)))
+        thread.start()
+        threads.append(thread)
+        _wait_for_queue(limiter, len(threads))
+
+    busy[0].release()
+    threads[1].join()
+    assert order == ["quiet"]
+    busy[1].release()
+    threads[0].join()
+    for ticket in tickets.values():
+        ticket.release()
+
+
+def test_queued_request_times_out_with_503():
+    limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=2, queue_timeout=0.05)
+    running = limiter.acquire("a")
+    with pytest.raises(Rejected) as error:
+        limiter.acquire("b")
+    assert error.value.status == 503 and limiter.stats()["timed_out"] == 1
+    running.release()
+
+
+def test_try_acquire_never_queues():
+    limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=2, queue_timeout=1)
+    ticket = limiter.try_acquire("a")
+    assert ticket is not None
+    assert limiter.try_acquire("b") is None
+    assert limiter.stats()["queue_depth"] == 0
+    ticket.release()
+
+
+def test_endpoint_answers_with_retry_after_when_full(app_dir, monkeypatch):
+    limiter = app_dir.ADMISSION_LIMITERS["edit"]
+    monkeypatch.setattr(limiter, "max_queue", 0)
+    tickets = [limiter.acquire("other") for _ in range(limiter.max_concurrent)]
+    try:
+        response = app_dir.app.test_client().post("/edit-website", json={"instructions": "make the text red"})
+    finally:
+        for ticket in tickets:
+            ticket.release()
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert limiter.stats()["rejected_full"] >= 1
@@ -0,0 +1,21 @@
+import threading
+
+
+def test_background_work_starts_once_with_the_first_requests(app_dir, monkeypatch):
+    started = []
+    monkeypatch.setattr(app_dir, "background_started", False)
+    monkeypatch.setattr(app_dir.maintenance, "start", lambda: started.append("maintenance"))
+    monkeypatch.setattr(app_dir, "warm_local_transcription", lambda: started.append("warm_up"))
+
+    client = app_dir.app.test_client()
+    requests = [threading.Thread(target=client.get, args=("/",)) for _ in range(4)]
+    for thread in requests:
+        thread.start()
+    for thread in requests:
+        thread.join()
+    client.get("/")
+
+    for thread in threading.enumerate():
+        if thread.name == "local-asr-warm-up":
+            thread.join()
+    assert sorted(started) == ["maintenance", "warm_up"]
@@ -0,0 +1,131 @@
+import io
+import os
+import threading
+
+import pytest
+
+import ChunkedUploads
+from ChunkedUploads import ChunkedUploads as Uploads, UploadError
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    processed = []
+
+    def process(path, **options):
+        with open(path, "rb") as f:
+            processed.append((f.read(), options))
+        return {"text": "done"}
+
+    registry = Uploads(str(tmp_path), process=process)
+    registry.processed = processed
+    return registry
+
+
+def test_chunks_are_reassembled_and_processed(uploads):
+    upload = uploads.create("memo.webm")
+    uploads.append(upload, 0, io.BytesIO(b"abc"))
+    uploads.append(upload, 3, io.BytesIO(b"def"))
+    uploads.append(upload, 6, io.BytesIO(b"gh"), final=True, options={"backend": "local"})
+
+    assert upload.finished.wait(5)
+    assert uploads.processed == [(b"abcdefgh", {"backend": "local"})]
+    assert upload.to_dict() == {"upload_id": upload.upload_id, "offset": 8, "state": "done",
+                                "result": {"text": "done"}}
+    assert not os.path.exists(upload.part_path) and not os.path.exists(upload.meta_path)
+
+
+def test_wrong_offset_reports_what_the_server_has(uploads):
+    upload = uploads.create("memo.webm")
+    uploads.append(upload, 0, io.BytesIO(b"abc"))
+
+    # A resent chunk and a chunk from the future are both refused with the offset to resume from
+    for offset in (0, 5):
+        with pytest.raises(UploadError) as error:
+            uploads.append(upload, offset, io.BytesIO(b"xyz"))
+        assert error.value.status == 409 and error.value.offset == 3
+    assert upload.offset() == 3
+
+
+def test_interrupted_upload_resumes_after_restart(tmp_path, uploads):
+    upload = uploads.create("memo.webm")
+    uploads.append(upload, 0, io.BytesIO(b"abc"))
+
+    restarted = Uploads(str(tmp_path), process=uploads.process)
+    resumed = restarted.get(upload.upload_id)
+    assert resumed is not upload and resumed.filename == "memo.webm" and resumed.offset() == 3
+    restarted.append(resumed, 3, io.BytesIO(b"def"), final=True)
+    assert resumed.finished.wait(5)
+    assert uploads.processed[0][0] == b"abcdef"
+
+    assert restarted.get("not-an-id") is None
+    assert restarted.get("0" * 32) is None
+
+
+def test_retried_final_chunk_is_accepted_once(uploads):
+    upload = uploads.create("memo.webm")
+    uploads.append(upload, 0, io.BytesIO(b"abc"), final=True)
+    assert uploads.append(upload, 0, io.BytesIO(b"abc"), final=True) is upload
+    assert upload.finished.wait(5)
+    assert len(uploads.processed) == 1
+
+    with pytest.raises(UploadError) as error:
+        uploads.append(upload, 3, io.BytesIO(b"more"))
+    assert error.value.status == 409
+
+
+def test_oversized_chunk_is_cut_back(uploads, monkeypatch):
+    monkeypatch.setattr(ChunkedUploads, "MAX_CHUNK_BYTES", 4)
+    upload = uploads.create("memo.webm")
+    uploads.append(upload, 0, io.BytesIO(b"abc"))
+
+    with pytest.raises(UploadError) as error:
+        uploads.append(upload, 3, io.BytesIO(b"defgh"))
+    assert error.value.status == 413 and error.value.offset == 3
+    assert upload.offset() == 3
+
+
+def test_empty_recording_is_rejected(uploads):
+    upload = uploads.create("memo.webm")
+    with pytest.raises(UploadError) as error:
+        uploads.append(upload, 0, io.BytesIO(b""), final=True)
+    assert error.value.status == 400
+    assert upload.state == "receiving" and uploads.processed == []
+
+
+def test_processing_failure_is_recorded(tmp_path):
+    def process(path, **options):
+        raise RuntimeError("transcription failed")
+
+    registry = Uploads(str(tmp_path), process=process)
+    upload = registry.create("memo.webm")
+    registry.append(upload, 0, io.BytesIO(b"abc"), final=True)
+    assert upload.finished.wait(5)
+    assert upload.to_dict()["state"] == "failed"
+    assert upload.to_dict()["error"] == "transcription failed"
+
+
+def test_upload_routes_resume_and_answer_with_the_result(app_dir, monkeypatch):
+    received = []
+    monkeypatch.setattr(app_dir.chunked_uploads, "process",
+                        lambda path, **options: received.append(open(path, "rb").read()) or {"text": "hello"})
+    client = app_dir.app.test_client()
+
+    upload_id = client.post("/uploads", json={"filename": "memo.webm"}).get_json()["upload_id"]
+    assert client.put(f"/uploads/{upload_id}?offset=0", data=b"abc").get_json()["offset"] == 3
+
+    response = client.put(f"/uploads/{upload_id}?offset=0", data=b"abc")
+    assert response.status_code == 409 and response.get_json()["offset"] == 3
+    assert client.get(f"/uploads/{upload_id}").get_json()["offset"] == 3
+
+    response = client.put(f"/uploads/{upload_id}?offset=3&final=1", data=b"def")
+    assert response.status_code == 200
+    assert response.get_json()["result"] == {"text": "hello"}
+    assert received == [b"abcdef"]
+    slot = [t for t in threading.enumerate() if t.name == f"upload-slot-{upload_id}"]
+    for thread in slot:
+        thread.join(5)
+    assert app_dir.ADMISSION_LIMITERS["process"].stats()["active"] == 0
+
+    assert client.put(f"/uploads/{upload_id}?offset=x", data=b"").status_code == 400
+    assert client.get("/uploads/" + "0" * 32).status_code == 404
@@ -0,0 +1,70 @@
+import os
+import json
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Bakery</title><style>header { padding: 20px; }</style></head>
+<body><header><h1>Bakery</h1></header><p>Fresh bread every day</p></body>
+</html>
+"""
+
+
+def test_ui_edits_continue_one_chain(app_dir):
+    client = app_dir.app.test_client()
+    client.get("/preview")
+    session_id = client.get_cookie(app_dir.SESSION_COOKIE).value
+    workspace = app_dir.workspaces.find(session_id)
+    site = workspace.path("generated_website_test.html")
+    with open(site, "w", encoding="utf-8") as f:
+        f.write(PAGE)
+    workspace.set_current_site(site, "a bakery")
+
+    # The UI sends only the instructions; the session's current site is edited
+    results = [client.post("/edit-website", json={"instructions": instruction}).get_json()
+               for instruction in ("make the background black", "hide the header", "make the text white")]
+
+    assert all(result["success"] for result in results)
+    assert len({result["chain_id"] for result in results}) == 1
+    assert [result["version"] for result in results] == [1, 2, 3]
+    chains = os.listdir(app_dir.WebsiteHistory.HISTORY_FOLDER)
+    assert chains == [results[0]["chain_id"]]
+    with open(os.path.join(app_dir.WebsiteHistory.HISTORY_FOLDER, chains[0], "index.json"), encoding="utf-8") as f:
+        versions = json.load(f)["versions"]
+    # One base snapshot for the whole chain
+    assert [v["note"] for v in versions].count("base: generated_website_test.html") == 1
+
+
+def _session_with_site(app_dir, client, name="generated_website_test.html"):
+    client.get("/preview")
+    workspace = app_dir.workspaces.find(client.get_cookie(app_dir.SESSION_COOKIE).value)
+    site = workspace.path(name)
+    with open(site, "w", encoding="utf-8") as f:
+        f.write(PAGE)
+    workspace.set_current_site(site, "a bakery")
+    return workspace
+
+
+def test_chains_stay_in_the_session_workspace(app_dir):
+    owner, other = app_dir.app.test_client(), app_dir.app.test_client()
+    workspace = _session_with_site(app_dir, owner)
+    _session_with_site(app_dir, other)
+
+    result = owner.post("/edit-website", json={"instructions": "make the background black"}).get_json()
+    chain_id = result["chain_id"]
+    assert os.path.dirname(result["new_path"]) == workspace.folder
+    assert os.listdir(app_dir.WEBSITES_FOLDER) == []
+
+    # Another session neither sees nor edits the chain
+    assert other.get("/website-versions").get_json()["chains"] == []
+    for response in (other.get(f"/website-versions/{chain_id}"),
+                     other.get(f"/website-versions/{chain_id}/0"),
+                     other.post(f"/website-versions/{chain_id}/rollback", json={"version": 0})):
+        assert response.status_code == 404
+    response = other.post("/edit-website", json={"instructions": "hide the header", "website_file": result["new_file"]})
+    assert response.status_code == 404
+    assert app_dir.WebsiteHistory.list_versions(chain_id)[-1]["version"] == 1
+
+    response = owner.post(f"/website-versions/{chain_id}/rollback", json={"version": 0})
+    assert response.status_code == 200
+    with open(workspace.path(f"{chain_id}.html"), encoding="utf-8") as f:
+        assert f.read() == PAGE
@@ -0,0 +1,87 @@
+import pytest
+
+import FuzzyCache
+
+DICTATION = (
+    "Um, so I want a website for my bakery in Boston that opened in 1985. Please do include a menu page "
+    "with prices, a brown and cream color scheme, a photo gallery of our cakes, opening hours for every "
+    "day of the week, and a contact form so people can order birthday cakes like the ones in the gallery."
+)
+
+
+@pytest.fixture
+def cache_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(FuzzyCache, "CACHE_FOLDER", str(tmp_path))
+    return tmp_path
+
+
+def test_exact_cache_ignores_only_punctuation_case_and_fillers(cache_folder):
+    cache = FuzzyCache.FuzzyCache("cleanup", exact=True)
+    cache.put(DICTATION, "cleaned")
+
+    same = DICTATION.upper().replace(",", "").replace("Um ", "").replace(".", " uh ")
+    assert cache.get(same)[0] == "cleaned"
+
+
+@pytest.mark.parametrize("old, new", [
+    ("do include", "do not include"),
+    ("Boston", "Denver"),
+    ("1985", "1995"),
+    ("brown", "green"),
+])
+def test_exact_cache_misses_when_the_meaning_changes(cache_folder, old, new):
+    cache = FuzzyCache.FuzzyCache("cleanup", exact=True)
+    cache.put(DICTATION, "cleaned")
+
+    changed = DICTATION.replace(old, new)
+    # Close enough as text that the fuzzy cache would reuse it
+    assert FuzzyCache.jaccard(FuzzyCache.shingles(FuzzyCache.normalize(DICTATION)),
+                              FuzzyCache.shingles(FuzzyCache.normalize(changed))) >= 0.9
+    assert cache.get(changed) is None
+
+
+def test_fuzzy_cache_matches_near_duplicates_above_threshold(cache_folder):
+    cache = FuzzyCache.FuzzyCache("generate", threshold=0.9)
+    entry_id = cache.put(DICTATION, "<html></html>")
+
+    value, info = cache.get(DICTATION.replace("cakes", "cake"))
+    assert value == "<html></html>" and info["entry_id"] == entry_id and info["similarity"] >= 0.9
+    assert cache.get("A portfolio for a wedding photographer in Lisbon") is None
+
+
+def test_instances_merge_their_changes(cache_folder):
+    first = FuzzyCache.FuzzyCache("generate")
+    second = FuzzyCache.FuzzyCache("generate")
+    first_id = first.put("a website for a bakery with a menu", "A")
+    second.put("a portfolio for a wedding photographer", "B")
+
+    assert first.get("a portfolio for a wedding photographer")[0] == "B"
+    assert second.report_false_hit(first_id)
+    assert first.get("a website for a bakery with a menu") is None
+
+
+def test_lookups_are_written_in_batches(cache_folder):
+    cache = FuzzyCache.FuzzyCache("generate")
+    cache.put("a website for a bakery with a menu", "A")
+    for _ in range(3):
+        cache.get("a website for a bakery with a menu")
+    assert FuzzyCache.FuzzyCache("generate").stats()["lookups"] == 0
+
+    cache.flush()
+    stats = FuzzyCache.FuzzyCache("generate").stats()
+    assert stats["lookups"] == 3 and stats["hits"] == 3
+
+
+def test_generation_miss_is_looked_up_once(cache_folder, monkeypatch):
+    import ModelRouter
+    import TextToCode
+    cache = FuzzyCache.FuzzyCache("generate")
+    monkeypatch.setattr(TextToCode, "generation_cache", cache)
+    monkeypatch.setattr(TextToCode, "API_KEY", "test")
+    monkeypatch.setattr(TextToCode, "RETRIEVAL_SEEDING", False)
+    monkeypatch.setattr(ModelRouter, "generate", lambda *args: "```html\n<html><body>Bakery</body></html>\n```")
+
+    code, info = TextToCode.generate_html_website_with_cache_info("a website for a bakery with a menu")
+    assert "Bakery" in code and info is None
+    cache.flush()
+    assert cache.stats()["lookups"] == 1
@@ -0,0 +1,143 @@
+import os
+import threading
+
+import pytest
+
+from AdmissionControl import AdmissionLimiter
+from GenerationJobs import GenerationJobs
+
+
+def _save(html, output_path):
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    return output_path
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    path = tmp_path / "improved_text.txt"
+    path.write_text("A website for a bakery", encoding="utf-8")
+    return str(path)
+
+
+def test_jobs_hold_a_free_slot_or_do_not_start(tmp_path, text_file):
+    limiter = AdmissionLimiter("generate", max_concurrent=1, max_queue=2, queue_timeout=1)
+    release = threading.Event()
+    jobs = GenerationJobs(generate=lambda idea: release.wait() and "<html></html>", save=_save, limiter=limiter)
+
+    job = jobs.start(text_file, str(tmp_path / "site.html"), owner="session-a", client_id="1.2.3.4")
+    assert limiter.stats()["active"] == 1
+
+    other = tmp_path / "other.txt"
+    other.write_text("A portfolio", encoding="utf-8")
+    assert jobs.start(str(other), str(tmp_path / "other.html"), owner="session-a") is None
+
+    release.set()
+    assert job.finished.wait(5) and job.state == "done"
+    assert job.html_path == str(tmp_path / "site.html")
+    assert limiter.stats()["active"] == 0
+
+
+def test_only_the_owner_session_attaches(tmp_path, text_file):
+    jobs = GenerationJobs(generate=lambda idea: "<html></html>", save=_save)
+    job = jobs.start(text_file, str(tmp_path / "site.html"), owner="session-a")
+    job.finished.wait(5)
+
+    assert jobs.attach(text_file, owner="session-b") is None
+    assert jobs.attach(text_file, owner="session-a") is job
+
+
+def test_cancelled_job_is_not_published(app_dir, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(app_dir.generation_jobs, "generate", lambda idea: release.wait() and "<html></html>")
+    published = []
+    monkeypatch.setattr(app_dir, "publish_preview", published.append)
+    client = app_dir.app.test_client()
+    client.get("/preview")
+    workspace = app_dir.workspaces.find(client.get_cookie(app_dir.SESSION_COOKIE).value)
+
+    text_path = os.path.join(app_dir.IMPROVED_TEXTS_FOLDER, "improved_text_1.txt")
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.write("A website for a bakery")
+    job = app_dir.start_speculative_generation(text_path, workspace, "127.0.0.1")
+    assert os.path.dirname(job.output_path) == workspace.folder
+
+    response = client.post("/generate-website", json={"filename": "improved_text_1.txt"}).get_json()
+    assert response["speculative"]
+    follower = [t for t in threading.enumerate() if t.name == f"preview-{workspace.session_id}"][0]
+
+    assert client.delete("/files/improved_text_1.txt").get_json()["cancelled_generation"]
+    release.set()
+    follower.join(5)
+    assert job.state == "cancelled" and published == []
+    assert not os.path.exists(job.output_path)
+    assert os.listdir(app_dir.WEBSITES_FOLDER) == []
+
+
+def test_attaching_before_finish_launches_once_ready(tmp_path, text_file):
+    release = threading.Event()
+    launched = []
+    jobs = GenerationJobs(generate=lambda idea: release.wait() and ("<html></html>", {"similarity": 0.97}),
+                          save=_save, launch=launched.append)
+    job = jobs.start(text_file, str(tmp_path / "site.html"))
+
+    assert jobs.attach(text_file) is job
+    assert launched == []
+    release.set()
+    assert job.finished.wait(5)
+    assert launched == [str(tmp_path / "site.html")]
+    assert job.to_dict()["cache_hit"] == {"similarity": 0.97}
+
+    # A second request for the same text reuses the finished page without relaunching it
+    assert jobs.attach(text_file) is job
+    assert launched == [str(tmp_path / "site.html")]
+
+
+def test_finished_job_launches_on_attach(tmp_path, text_file):
+    launched = []
+    jobs = GenerationJobs(generate=lambda idea: "<html></html>", save=_save, launch=launched.append)
+    job = jobs.start(text_file, str(tmp_path / "site.html"))
+    job.finished.wait(5)
+
+    assert launched == []
+    jobs.attach(text_file)
+    assert launched == [job.html_path]
+    assert jobs.start(text_file, str(tmp_path / "again.html")) is job
+
+
+def test_failed_job_falls_back_only_when_attached(tmp_path, text_file):
+    release = threading.Event()
+    fallbacks = []
+
+    def generate(idea):
+        release.wait()
+        raise RuntimeError("model unavailable")
+
+    jobs = GenerationJobs(generate=generate, save=_save, fallback=fallbacks.append)
+    job = jobs.start(text_file, str(tmp_path / "site.html"))
+    jobs.attach(text_file)
+    release.set()
+    assert job.finished.wait(5)
+    assert job.state == "failed" and job.error == "model unavailable"
+    assert fallbacks == [text_file]
+
+    # Unattached failures are only logged; the next start retries
+    fallbacks.clear()
+    retry = jobs.start(text_file, str(tmp_path / "site.html"))
+    assert retry is not job
+    assert retry.finished.wait(5) and retry.state == "failed"
+    assert fallbacks == []
+
+
+def test_cancel_removes_an_unclaimed_page(tmp_path, text_file):
+    events = []
+    jobs = GenerationJobs(generate=lambda idea: "<html></html>", save=_save,
+                          reporter=lambda op, details, status: events.append(op))
+    job = jobs.start(text_file, str(tmp_path / "site.html"))
+    job.finished.wait(5)
+    assert os.path.exists(job.html_path)
+
+    assert jobs.cancel(text_file)
+    assert not os.path.exists(job.html_path)
+    assert jobs.get(text_file) is None and not jobs.cancel(text_file)
+    assert events == ["speculative_generation_start", "speculative_generation", "speculative_generation_cancel"]
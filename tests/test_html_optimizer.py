@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HtmlOptimizer
+import LocalEdit
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Bakery</title>
+    <style>
+        /* layout */
+        header { padding: 20px; }
+        .hero { color: #333; }
+        .unused { color: red; }
+        .hero { color: #333; }
+    </style>
+</head>
+<body>
+    <header id="top"><h1>Bakery</h1></header>
+    <section class="hero"><p>Fresh bread every day</p></section>
+</body>
+</html>
+"""
+
+
+def _edit_and_optimize(page, instruction):
+    result = LocalEdit.apply_local_edit(page, instruction)
+    assert result is not None, instruction
+    page, _ = HtmlOptimizer.optimize(result[0])
+    return page
+
+
+def test_local_edits_survive_repeated_optimization():
+    page, _ = HtmlOptimizer.optimize(PAGE)
+    page = _edit_and_optimize(page, "make the background black")
+    page = _edit_and_optimize(page, "hide the header")
+    assert set(LocalEdit._read_overrides(page)) == {"background", "hide:header"}
+
+    page = _edit_and_optimize(page, "make the background white")
+    overrides = LocalEdit._read_overrides(page)
+    assert overrides["background"] == "html, body { background: white !important; }"
+    assert "hide:header" in overrides
+
+    # Only possible while the hide override is still keyed in the page
+    page = _edit_and_optimize(page, "show the header")
+    assert set(LocalEdit._read_overrides(page)) == {"background"}
+
+
+def test_optimizer_still_prunes_generated_styles():
+    page, _ = HtmlOptimizer.optimize(LocalEdit.apply_local_edit(PAGE, "hide the header")[0])
+    assert ".unused" not in page
+    assert page.count(".hero{") == 1
+    assert "/* hide:header */ header { display: none !important; }" in page
@@ -0,0 +1,101 @@
+import gzip
+
+import pytest
+from flask import Flask, Response, jsonify, request, url_for
+
+import HttpCache
+
+BIG = {"items": ["a generated page title"] * 200}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "app.js").write_text("console.log('app');\n" * 100, encoding="utf-8")
+    # Brotli may be installed; these tests pin the gzip path every install has
+    monkeypatch.setattr(HttpCache, "brotli", None)
+
+    app = Flask(__name__, static_folder=str(static))
+
+    @app.url_defaults
+    def add_static_version(endpoint, values):
+        HttpCache.add_static_version(app.static_folder, endpoint, values)
+
+    @app.after_request
+    def compress_and_cache(response):
+        return HttpCache.finalize_response(response, request, static_folder=app.static_folder)
+
+    @app.route("/data")
+    def data():
+        return jsonify(BIG)
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/stream")
+    def stream():
+        return Response((chunk for chunk in [b"x" * 2048]), mimetype="text/plain")
+
+    @app.route("/static-url")
+    def static_url():
+        return url_for("static", filename="app.js")
+
+    return app.test_client()
+
+
+def test_large_json_is_gzipped_with_its_own_etag(client):
+    plain = client.get("/data")
+    zipped = client.get("/data", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.data) == plain.data
+    assert zipped.headers["ETag"] != plain.headers["ETag"]
+    assert zipped.headers["ETag"].endswith('-gzip"')
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+    assert zipped.headers["Cache-Control"] == "no-cache"
+
+
+def test_unchanged_body_answers_304(client):
+    first = client.get("/data", headers={"Accept-Encoding": "gzip"})
+    again = client.get("/data", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
+
+    # The identity validator does not match the gzip representation
+    plain_etag = client.get("/data").headers["ETag"]
+    other = client.get("/data", headers={"Accept-Encoding": "gzip", "If-None-Match": plain_etag})
+    assert other.status_code == 200
+
+
+def test_small_and_streamed_bodies_are_not_compressed(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers and "ETag" in small.headers
+
+    stream = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in stream.headers and "ETag" not in stream.headers
+
+
+def test_versioned_static_urls_are_immutable(client):
+    url = client.get("/static-url").get_data(as_text=True)
+    assert "?v=" in url
+
+    versioned = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert versioned.headers["Cache-Control"].endswith("immutable")
+    assert versioned.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(versioned.data).startswith(b"console.log")
+
+    stale = client.get("/static/app.js?v=000000000000")
+    assert stale.headers["Cache-Control"] == "no-cache"
+
+
+def test_static_digest_follows_file_changes(tmp_path):
+    path = tmp_path / "style.css"
+    path.write_text("body {}", encoding="utf-8")
+    first = HttpCache.static_digest(str(path))
+    assert HttpCache.static_digest(str(path)) == first
+
+    path.write_text("body { color: red }", encoding="utf-8")
+    assert HttpCache.static_digest(str(path)) != first
+    assert HttpCache.static_digest(str(tmp_path / "missing.css")) is None
@@ -0,0 +1,19 @@
+import LocalEdit
+
+PAGE = """<html><head><title>Bakery</title></head><body>
+<div class="hero-title big">Fresh bread</div>
+<div data-id="gallery" class="photos">Cakes</div>
+</body></html>"""
+
+
+def test_hide_matches_whole_class_tokens():
+    page = PAGE.replace('class="photos"', 'class="photos  Hero"')
+    html, changes = LocalEdit.apply_local_edit(page, "hide the hero section")
+    assert changes == ["hide .Hero"]
+    assert ".Hero { display: none !important; }" in html
+
+
+def test_hide_is_not_handled_without_an_exact_match():
+    # hero-title and data-id="gallery" only contain the spoken name
+    assert LocalEdit.apply_local_edit(PAGE, "hide the hero section") is None
+    assert LocalEdit.apply_local_edit(PAGE, "hide the gallery") is None
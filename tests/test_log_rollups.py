@@ -0,0 +1,39 @@
+import json
+import os
+
+import LogQuery
+
+
+def _stored(folder):
+    path = os.path.join(folder, "rollups.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_rollups_are_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(LogQuery, "ROLLUP_FLUSH_EVERY", 3)
+    monkeypatch.setattr(LogQuery, "ROLLUP_FLUSH_SECONDS", 3600)
+    rollups = LogQuery.LogRollups(str(tmp_path))
+
+    rollups.record("2026-10-18 10:15:00", "generate_website", "success")
+    rollups.record("2026-10-18 10:20:00", "generate_website", "error")
+    assert _stored(tmp_path) is None
+
+    rollups.record("2026-10-18 10:25:00", "generate_website", "success")
+    assert _stored(tmp_path)["2026-10-18 10:00"]["generate_website"] == {"total": 3, "errors": 1}
+
+
+def test_flush_writes_to_the_folder_given_at_start(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rollups = LogQuery.LogRollups("logs")
+    rollups.record("2026-10-18 10:15:00", "edit_website", "success")
+
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+    rollups.flush()
+
+    assert _stored(tmp_path / "logs")["2026-10-18 10:00"]["edit_website"]["total"] == 1
+    assert not (elsewhere / "logs").exists()
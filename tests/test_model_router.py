@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+import ModelRouter
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDER = """
+import sys
+import ModelRouter
+ModelRouter.USAGE_FILE = sys.argv[1]
+for _ in range(25):
+    ModelRouter._record("generate_website", ModelRouter.MODEL_TIERS[0], 100, 10, 0.5)
+"""
+
+
+def test_processes_recording_usage_keep_every_call(tmp_path, monkeypatch):
+    usage_file = str(tmp_path / "logs" / "token_usage.json")
+    workers = [subprocess.Popen([sys.executable, "-c", RECORDER, usage_file], cwd=REPO)
+               for _ in range(4)]
+    for worker in workers:
+        assert worker.wait(timeout=60) == 0
+
+    monkeypatch.setattr(ModelRouter, "USAGE_FILE", usage_file)
+    counters = ModelRouter.get_usage()["operations"]["generate_website"]
+    assert counters["calls"] == 100 and counters["prompt_tokens"] == 10000
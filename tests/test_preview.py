@@ -0,0 +1,84 @@
+import json
+
+from Preview import PreviewHub, format_event
+
+
+def _events(chunks):
+    return [json.loads(chunk.split("data: ", 1)[1]) for chunk in chunks if "event: update" in chunk]
+
+
+def test_publish_reaches_only_the_sessions_own_pages():
+    hub = PreviewHub()
+    mine = hub.subscribe("session-a")
+    other = hub.subscribe("session-b")
+
+    assert hub.publish("session-a", "<html>1</html>", "site.html") == {"version": 1, "subscribers": 1}
+    assert mine.get_nowait() == {"version": 1, "file": "site.html", "html": "<html>1</html>"}
+    assert other.empty()
+    assert hub.stats() == {"sessions": 2, "subscribers": 2, "published": 1}
+
+    hub.unsubscribe("session-a", mine)
+    assert not hub.has_subscribers("session-a")
+    assert hub.publish("session-a", "<html>2</html>", "site.html")["subscribers"] == 0
+
+
+def test_slow_page_only_gets_the_newest_version():
+    hub = PreviewHub()
+    mailbox = hub.subscribe("session-a")
+    for n in range(1, 4):
+        hub.publish("session-a", f"<html>{n}</html>", "site.html")
+
+    assert mailbox.get_nowait()["version"] == 3
+    assert mailbox.empty()
+
+
+def test_unwatched_changes_still_bump_the_version():
+    hub = PreviewHub()
+    assert hub.mark_changed("session-a") == 1
+    assert hub.mark_changed("session-a") == 2
+    assert hub.publish("session-a", "<html></html>", "site.html")["version"] == 3
+    assert hub.version("session-b") == 0
+
+
+def test_stream_skips_the_version_a_reconnecting_page_shows():
+    hub = PreviewHub()
+    initial = {"version": 4, "file": "site.html", "html": "<html>4</html>"}
+
+    fresh = hub.stream("session-a", initial)
+    assert next(fresh).startswith("retry:")
+    assert next(fresh) == format_event(initial)
+    fresh.close()
+    assert not hub.has_subscribers("session-a")
+
+    # The stream subscribes on its first step; the initial event is not resent
+    reconnect = hub.stream("session-a", initial, last_event_id="4")
+    next(reconnect)
+    hub.publish("session-a", "<html>5</html>", "site.html")
+    assert _events([next(reconnect)]) == [{"version": 1, "file": "site.html", "html": "<html>5</html>"}]
+    reconnect.close()
+
+
+def test_events_route_streams_the_current_site_then_updates(app_dir):
+    client = app_dir.app.test_client()
+    client.get("/preview")
+    workspace = app_dir.workspaces.find(client.get_cookie(app_dir.SESSION_COOKIE).value)
+    site = workspace.path("website_1.html")
+    with open(site, "w", encoding="utf-8") as f:
+        f.write("<html>first</html>")
+    workspace.set_current_site(site)
+
+    response = client.get("/preview/events", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b"retry:")
+    first = _events([next(chunks).decode("utf-8")])[0]
+    assert first["file"] == "website_1.html" and first["html"] == "<html>first</html>"
+
+    with open(site, "w", encoding="utf-8") as f:
+        f.write("<html>second</html>")
+    app_dir.publish_preview(workspace)
+    second = _events([next(chunks).decode("utf-8")])[0]
+    assert second["html"] == "<html>second</html>" and second["version"] > first["version"]
+
+    response.close()
+    assert not app_dir.preview_hub.has_subscribers(workspace.session_id)
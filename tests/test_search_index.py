@@ -0,0 +1,31 @@
+import os
+
+
+def test_pruned_text_is_still_served_from_the_index(app_dir):
+    file_path = os.path.join(app_dir.IMPROVED_TEXTS_FOLDER, "bakery.txt")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("A website for a bakery with a menu and opening hours")
+    app_dir.SearchIndex.index_text_file(file_path)
+    client = app_dir.app.test_client()
+
+    assert client.get("/search?q=bakery").get_json()["results"][0]["pruned"] is False
+
+    os.remove(file_path)  # as retention does
+    app_dir.sync_search_index()
+
+    hit = client.get("/search?q=bakery").get_json()["results"][0]
+    assert hit["ref"] == "bakery.txt" and hit["pruned"] is True
+    body = client.get(f"/files/{hit['ref']}").get_json()
+    assert body["pruned"] is True and "opening hours" in body["content"]
+
+
+def test_discarded_text_is_gone(app_dir):
+    file_path = os.path.join(app_dir.IMPROVED_TEXTS_FOLDER, "bakery.txt")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("A website for a bakery")
+    app_dir.SearchIndex.index_text_file(file_path)
+    client = app_dir.app.test_client()
+
+    assert client.delete("/files/bakery.txt").status_code == 200
+    assert client.get("/files/bakery.txt").status_code == 404
+    assert client.get("/search?q=bakery").get_json()["total"] == 0
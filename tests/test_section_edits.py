@@ -0,0 +1,29 @@
+import HtmlSections
+
+FILLER = "<p>" + "Fresh bread and cakes every morning. " * 80 + "</p>"
+PAGE = f"""<html><head><style>.hero {{ color: red; }} .menu {{ color: blue; }}</style></head><body>
+<header class="top"><h1>Bakery</h1></header>
+<section id="w-1/2" class="hero"><h2>Our cakes</h2>{FILLER}</section>
+<section id="menu list" class="menu"><h2>Menu</h2>{FILLER}</section>
+</body></html>"""
+
+
+def test_sections_with_unusual_ids_round_trip():
+    sections = HtmlSections.parse_sections(PAGE)
+    assert [s.id for s in sections] == ["header.top", "section#w-1/2", "section#menu_list"]
+
+    prompt = HtmlSections.build_region_prompt(sections[1:], [])
+    answer = prompt.replace("<h2>Our cakes</h2>", "<h2>Our pies</h2>").replace("<h2>Menu</h2>", "<h2>Prices</h2>")
+    page = HtmlSections.splice_regions(PAGE, sections[1:], [], answer)
+    assert "<h2>Our pies</h2>" in page and "<h2>Prices</h2>" in page
+
+
+def test_section_edit_over_budget_is_a_clean_error(app_dir, monkeypatch):
+    def over_budget(*args, **kwargs):
+        raise app_dir.ModelRouter.BudgetExceeded("Prompt needs 9000 tokens, the edit budget is 8000")
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setattr(app_dir.ModelRouter, "generate", over_budget)
+
+    result = app_dir._edit_with_gemini(PAGE, "make the cakes heading bigger")
+    assert result == {"success": False, "error": "Prompt needs 9000 tokens, the edit budget is 8000"}
@@ -0,0 +1,93 @@
+import io
+import json
+import os
+import tarfile
+import threading
+import zipfile
+
+import pytest
+
+import SiteArchive
+
+
+def _zip(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _tar(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+MANIFEST = json.dumps({"format": 1, "websites": [{"id": "site_one", "name": "One", "file_path": "site_one.html"}]})
+
+
+@pytest.mark.parametrize("pack", [_zip, _tar])
+def test_import_reads_an_export(tmp_path, pack):
+    data = pack({SiteArchive.MANIFEST_NAME: MANIFEST.encode(), "sites/site_one.html": b"<html>one</html>"})
+    imported, report = SiteArchive.import_archive(io.BytesIO(data), str(tmp_path), [])
+    assert [w["id"] for w in imported] == ["site_one"] and report["imported"] == 1
+    assert (tmp_path / "site_one.html").read_bytes() == b"<html>one</html>"
+
+
+@pytest.mark.parametrize("pack", [_zip, _tar])
+def test_import_refuses_too_many_members(tmp_path, monkeypatch, pack):
+    monkeypatch.setattr(SiteArchive, "MAX_IMPORT_MEMBERS", 3)
+    files = {f"sites/site_{i}.html": b"<html></html>" for i in range(5)}
+    with pytest.raises(ValueError, match="more than 3 entries"):
+        SiteArchive.import_archive(io.BytesIO(pack(files)), str(tmp_path), [])
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("pack", [_zip, _tar])
+def test_import_refuses_archives_that_unpack_too_large(tmp_path, monkeypatch, pack):
+    monkeypatch.setattr(SiteArchive, "MAX_IMPORT_BYTES", 100_000)
+    # Compresses to a few hundred bytes
+    files = {SiteArchive.MANIFEST_NAME: MANIFEST.encode(), "sites/site_one.html": b"a" * 200_000}
+    with pytest.raises(ValueError, match="unpacks to more than"):
+        SiteArchive.import_archive(io.BytesIO(pack(files)), str(tmp_path), [])
+    assert os.listdir(tmp_path) == []
+
+
+def test_import_route_refuses_large_uploads(app_dir, monkeypatch):
+    monkeypatch.setattr(app_dir.SiteArchive, "MAX_UPLOAD_BYTES", 1000)
+    data = _zip({SiteArchive.MANIFEST_NAME: MANIFEST.encode(), "sites/site_one.html": os.urandom(4000)})
+    client = app_dir.app.test_client()
+
+    response = client.post("/import-websites", data={"archive": (io.BytesIO(data), "sites.zip")})
+    assert response.status_code == 413
+    response = client.post("/import-websites", data=data, content_type="application/zip")
+    assert response.status_code == 413
+    assert os.listdir(app_dir.SAVED_WEBSITES_FOLDER) == []
+
+
+@pytest.mark.parametrize("pack", [_zip, _tar])
+def test_import_stops_reading_past_the_upload_limit(tmp_path, monkeypatch, pack):
+    # A body without Content-Length is cut off while it is read
+    monkeypatch.setattr(SiteArchive, "MAX_UPLOAD_BYTES", 1000)
+    data = pack({SiteArchive.MANIFEST_NAME: MANIFEST.encode(), "sites/site_one.html": os.urandom(4000)})
+    with pytest.raises(SiteArchive.ArchiveTooLarge):
+        SiteArchive.import_archive(io.BytesIO(data), str(tmp_path), [])
+    assert os.listdir(tmp_path) == []
+
+
+def test_abandoned_tar_export_stops_its_writer(tmp_path):
+    websites = []
+    for i in range(20):
+        (tmp_path / f"site_{i}.html").write_bytes(os.urandom(256 * 1024))
+        websites.append({"id": f"site_{i}", "name": str(i), "file_path": f"site_{i}.html"})
+
+    stream = SiteArchive.stream_export(websites, str(tmp_path), "tar")
+    next(stream)
+    stream.close()
+
+    assert not [t for t in threading.enumerate() if t.name == "tar-export"]
@@ -0,0 +1,42 @@
+import base64
+import io
+import os
+import shutil
+import zipfile
+
+import HtmlOptimizer
+from test_tracing import _save_site
+
+IMAGE = os.urandom(8 * 1024)
+PAGE = f'<html><body><img src="data:image/png;base64,{base64.b64encode(IMAGE).decode()}"></body></html>'
+
+
+def test_assets_are_linked_from_the_app_root(app_dir):
+    page = HtmlOptimizer.extract_assets(PAGE)
+    (name,) = HtmlOptimizer.asset_names(page)
+    assert f'src="/assets/{name}"' in page
+    assert app_dir.app.test_client().get(f"/assets/{name}").data == IMAGE
+
+
+def test_downloads_carry_their_assets_inline(app_dir):
+    _save_site(app_dir, "site_one", HtmlOptimizer.extract_assets(PAGE))
+    response = app_dir.app.test_client().get("/download-website/site_one")
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == PAGE
+
+
+def test_export_and_import_keep_assets(app_dir):
+    page = HtmlOptimizer.extract_assets(PAGE)
+    (name,) = HtmlOptimizer.asset_names(page)
+    _save_site(app_dir, "site_one", page)
+    client = app_dir.app.test_client()
+
+    data = client.get("/export-websites?format=zip").get_data()
+    assert zipfile.ZipFile(io.BytesIO(data)).read(f"assets/{name}") == IMAGE
+
+    # Imported into an app that has neither the site nor its asset
+    client.delete("/delete-website/site_one")
+    shutil.rmtree(HtmlOptimizer.ASSETS_FOLDER)
+    response = client.post("/import-websites", data={"archive": (io.BytesIO(data), "sites.zip")})
+    assert response.status_code == 200 and response.get_json()["assets"] == 1
+    assert client.get(f"/assets/{name}").data == IMAGE
@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+import TextToCode
+from SiteIndex import SiteIndex, tokenize
+
+BAKERY = """<html><head><title>Bakery</title><style>.hero{color:red}</style></head><body>
+<header class="hero"><h1>Fresh bread every morning</h1></header>
+<section id="menu"><p>Croissants, sourdough and rye loaves</p></section></body></html>"""
+GARAGE = """<html><head><title>Garage</title></head><body>
+<header><h1>Car repairs</h1></header><section><p>Brakes, tyres and oil changes</p></section></body></html>"""
+
+
+def _catalog(folder, websites):
+    with open(os.path.join(folder, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump({"websites": websites}, f)
+
+
+def _add_site(folder, site_id, name, idea, html):
+    path = os.path.join(folder, f"{site_id}.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    return {"id": site_id, "name": name, "idea": idea, "file_path": f"{site_id}.html"}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "saved_websites"
+    folder.mkdir()
+    _catalog(str(folder), [
+        _add_site(str(folder), "bakery", "Corner Bakery", "a bakery selling sourdough bread", BAKERY),
+        _add_site(str(folder), "garage", "Quick Garage", "a car repair garage", GARAGE),
+    ])
+    return str(folder)
+
+
+def test_tokenize_drops_stop_words():
+    assert tokenize("Please make a website for my Bakery in 2024") == ["bakery", "2024"]
+
+
+def test_closest_site_ranks_first(tmp_path, folder):
+    index = SiteIndex(folder, str(tmp_path / "index.json"))
+    matches = index.similar("a bakery with sourdough bread and croissants")
+    assert [website["id"] for website, _ in matches] == ["bakery"]
+    assert 0 < matches[0][1] <= 1
+
+    assert index.similar("a website please") == []
+    assert index.similar("quantum physics lectures") == []
+
+
+def test_best_match_respects_the_threshold(tmp_path, folder):
+    index = SiteIndex(folder, str(tmp_path / "index.json"))
+    website, html, score = index.best_match("sourdough bakery", 0.1)
+    assert website["id"] == "bakery" and html == BAKERY
+    assert index.best_match("sourdough bakery", min(score + 0.01, 1.01)) is None
+
+
+def test_refresh_follows_catalog_changes(tmp_path, folder):
+    index_file = str(tmp_path / "index.json")
+    index = SiteIndex(folder, index_file)
+    index.refresh()
+    with open(index_file, "r", encoding="utf-8") as f:
+        assert set(json.load(f)) == {"bakery", "garage"}
+
+    # A renamed site is re-weighted, a removed one disappears
+    _catalog(folder, [{"id": "garage", "name": "Bike Garage", "idea": "bicycle repairs",
+                       "file_path": "garage.html"}])
+    assert [w["id"] for w, _ in index.similar("bicycle")] == ["garage"]
+    assert index.similar("sourdough bakery") == []
+
+    # A new index reuses the stored term counts
+    reloaded = SiteIndex(folder, index_file)
+    assert [w["id"] for w, _ in reloaded.similar("bicycle")] == ["garage"]
+
+
+def test_close_idea_is_generated_from_the_saved_site(tmp_path, folder, monkeypatch):
+    monkeypatch.setattr(TextToCode, "API_KEY", "test-key")
+    monkeypatch.setattr(TextToCode, "RETRIEVAL_SEEDING", True)
+    monkeypatch.setattr(TextToCode, "RETRIEVAL_MIN_SIMILARITY", 0.1)
+    monkeypatch.setattr(TextToCode, "site_index", SiteIndex(folder, str(tmp_path / "index.json")))
+    monkeypatch.setattr(TextToCode.generation_cache, "put", lambda idea, code: None)
+    calls = []
+
+    def generate(operation, prompt, label):
+        calls.append(operation)
+        return """```html
+<!-- section: header.hero -->
+<header class="hero"><h1>Fresh pastries</h1></header>
+<!-- /section -->
+<!-- section: section#menu -->
+<section id="menu"><p>Pain au chocolat</p></section>
+<!-- /section -->
+<!-- section: css -->
+<!-- /section -->
+<!-- section: title -->
+Patisserie
+<!-- /section -->
+```"""
+
+    monkeypatch.setattr(TextToCode.ModelRouter, "generate", generate)
+    page = TextToCode.generate_html_website("a sourdough bakery with pastries", cache_lookup=False)
+
+    assert calls == ["edit"]
+    assert "<title>Patisserie</title>" in page
+    assert "Pain au chocolat" in page and "Croissants" not in page
+    # The stylesheet is kept as it was
+    assert "<style>.hero{color:red}</style>" in page
+
+
+def test_distant_idea_is_generated_from_scratch(tmp_path, folder, monkeypatch):
+    monkeypatch.setattr(TextToCode, "API_KEY", "test-key")
+    monkeypatch.setattr(TextToCode, "RETRIEVAL_SEEDING", True)
+    monkeypatch.setattr(TextToCode, "RETRIEVAL_MIN_SIMILARITY", 0.5)
+    monkeypatch.setattr(TextToCode, "site_index", SiteIndex(folder, str(tmp_path / "index.json")))
+    monkeypatch.setattr(TextToCode.generation_cache, "put", lambda idea, code: None)
+    calls = []
+    monkeypatch.setattr(TextToCode.ModelRouter, "generate",
+                        lambda operation, prompt, label: calls.append(operation) or "```html\n<html></html>\n```")
+
+    assert TextToCode.generate_html_website("a dentist office", cache_lookup=False) == "<html></html>"
+    assert calls == ["generate"]
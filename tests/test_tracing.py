@@ -0,0 +1,71 @@
+import io
+import os
+import json
+import tarfile
+import threading
+import zipfile
+
+import pytest
+
+import Tracing
+
+
+def _save_site(app_dir, site_id: str, html: str):
+    with open(os.path.join(app_dir.SAVED_WEBSITES_FOLDER, f"{site_id}.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+    metadata = app_dir.get_saved_websites_metadata()
+    metadata.setdefault("websites", []).append({"id": site_id, "name": site_id, "file_path": f"{site_id}.html"})
+    app_dir.save_websites_metadata(metadata)
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "tar"])
+def test_streamed_export_is_complete(app_dir, archive_format):
+    # Large enough to take several chunks of the stream
+    html = "<html><body>" + "".join(f"<p>{i} {os.urandom(8).hex()}</p>" for i in range(20000)) + "</body></html>"
+    _save_site(app_dir, "site_one", html)
+
+    response = app_dir.app.test_client().get(f"/export-websites?format={archive_format}")
+
+    assert response.status_code == 200
+    assert response.headers["X-Trace-Id"]
+    data = io.BytesIO(response.get_data())
+    if archive_format == "zip":
+        with zipfile.ZipFile(data) as archive:
+            assert archive.read("sites/site_one.html").decode("utf-8") == html
+            assert json.loads(archive.read("metadata.json"))["websites"][0]["id"] == "site_one"
+    else:
+        with tarfile.open(fileobj=data, mode="r:gz") as archive:
+            assert archive.extractfile("sites/site_one.html").read().decode("utf-8") == html
+
+
+def test_finishing_a_span_twice_does_not_raise():
+    span, token = Tracing.start_span("request")
+    Tracing.finish_span(span, token)
+    Tracing.finish_span(span, token)
+    assert Tracing.current_span() is None
+
+
+def test_generator_process_joins_the_request_trace(app_dir, monkeypatch):
+    # Empty rather than unset so a developer .env cannot supply a key
+    monkeypatch.setenv("GEMINI_API_KEY", "")
+    monkeypatch.setattr(app_dir.TextToCode, "API_KEY", None)
+    text_file = os.path.join(app_dir.IMPROVED_TEXTS_FOLDER, "idea.txt")
+    with open(text_file, "w", encoding="utf-8") as f:
+        f.write("A website for a bakery")
+    logged = []
+    monkeypatch.setattr(app_dir, "log_operation",
+                        lambda operation, details=None, status="success":
+                        logged.append((operation, details, status, Tracing.current_trace_id())))
+    done = threading.Event()
+
+    with Tracing.span("request") as request_span:
+        result = app_dir.generate_website_from_text_file(text_file, on_saved=done.set)
+    assert result["success"] and done.wait(60)
+
+    traces = [entry for entry in logged if entry[0] == "trace"]
+    assert len(traces) == 1
+    _, details, status, trace_id = traces[0]
+    # Generation fails here without an API key, which the trace records
+    assert status == "error" and trace_id == details["trace_id"] == request_span.trace_id
+    assert details["root"]["name"] == "text_to_code"
+    assert details["root"]["attrs"]["parent_span_id"]